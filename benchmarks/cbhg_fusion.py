@@ -0,0 +1,61 @@
+"""
+Compares the speed of the CBHGs of the Tacotron encoder and postnet in eval mode against the
+InferenceCBHGs built from them by Tacotron.fuse_cbhgs(), with and without merging the
+convolution bank, on batches of typical text and spectrogram lengths. Also reports the largest
+difference between their outputs.
+
+Usage:
+    python -m benchmarks.cbhg_fusion [--syn_model models/default/synthesizer.pt]
+"""
+from synthesizer.hparams import hparams
+from synthesizer.inference import Synthesizer
+from synthesizer.models.tacotron import InferenceCBHG
+from pathlib import Path
+from time import perf_counter
+import argparse
+import torch
+
+
+def timed(module, x, repeat):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        y = module(x)
+        times.append(perf_counter() - start)
+    return y, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fused CBHGs.")
+    parser.add_argument("--syn_model", type=Path, default=Path("models/default/synthesizer.pt"))
+    parser.add_argument("--batch_size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    # Keep the original CBHGs to compare against
+    hparams.tts_fuse_cbhg = False
+    synthesizer = Synthesizer(args.syn_model, verbose=False, device=args.device)
+    synthesizer.load()
+    model = synthesizer._model
+    device = torch.device(args.device)
+
+    print("%-8s %7s %12s %22s %22s   max abs diff" % ("cbhg", "length", "original", "fused",
+                                                         "fused, merged bank"))
+    with torch.inference_mode():
+        for name, cbhg, channels in (("encoder", model.encoder.cbhg, hparams.tts_encoder_dims),
+                                     ("postnet", model.postnet, hparams.num_mels)):
+            for length in (50, 200, 800):
+                x = torch.randn(args.batch_size, channels, length, device=device)
+                ref, original_time = timed(cbhg, x, args.repeat)
+                line = "%-8s %7d %10.2fms" % (name, length, original_time * 1000)
+                diffs = []
+                for merge_bank in (False, True):
+                    y, fused_time = timed(InferenceCBHG(cbhg, merge_bank), x, args.repeat)
+                    line += " %10.2fms (%5.2fx)" % (fused_time * 1000, original_time / fused_time)
+                    diffs.append((y - ref).abs().max().item())
+                print(line + "   %.1e, %.1e" % tuple(diffs))
+
+
+if __name__ == "__main__":
+    main()
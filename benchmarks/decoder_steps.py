@@ -0,0 +1,143 @@
+"""
+Compares the decoding speed of Tacotron.generate() in decoder steps per second, with its decoder
+loop in eager mode and compiled with TorchScript, against the original implementation, which
+tracked gradients, projected mels for max_r frames at each step before slicing r of them and
+gathered its outputs in lists. The stop token is disabled so that every run decodes the same
+number of steps.
+
+Usage:
+    python -m benchmarks.decoder_steps [--syn_model models/default/synthesizer.pt]
+"""
+from synthesizer.hparams import hparams
+from synthesizer.inference import Synthesizer
+from synthesizer.utils.text import text_to_sequence_array
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import argparse
+import torch
+import torch.nn.functional as F
+
+
+def legacy_decoder_step(decoder, encoder_seq, encoder_seq_proj, prenet_in,
+                        hidden_states, cell_states, context_vec, t, chars):
+    batch_size = encoder_seq.size(0)
+    attn_hidden, rnn1_hidden, rnn2_hidden = hidden_states
+    rnn1_cell, rnn2_cell = cell_states
+
+    prenet_out = decoder.prenet(prenet_in)
+    attn_rnn_in = torch.cat([context_vec, prenet_out], dim=-1)
+    attn_hidden = decoder.attn_rnn(attn_rnn_in.squeeze(1), attn_hidden)
+
+    attn_net = decoder.attn_net
+    if t == 0:
+        device = next(attn_net.parameters()).device
+        b, n, c = encoder_seq_proj.size()
+        attn_net.cumulative = torch.zeros(b, n, device=device)
+        attn_net.attention = torch.zeros(b, n, device=device)
+    processed_query = attn_net.W(attn_hidden).unsqueeze(1)
+    location = attn_net.cumulative.unsqueeze(1)
+    processed_loc = attn_net.L(attn_net.conv(location).transpose(1, 2))
+    u = attn_net.v(torch.tanh(processed_query + encoder_seq_proj + processed_loc))
+    u = u.squeeze(-1)
+    u = u * (chars != 0).float()
+    scores = F.softmax(u, dim=1)
+    attn_net.attention = scores
+    attn_net.cumulative = attn_net.cumulative + attn_net.attention
+    scores = scores.unsqueeze(-1).transpose(1, 2)
+
+    context_vec = scores @ encoder_seq
+    context_vec = context_vec.squeeze(1)
+    x = torch.cat([context_vec, attn_hidden], dim=1)
+    x = decoder.rnn_input(x)
+    rnn1_hidden, rnn1_cell = decoder.res_rnn1(x, (rnn1_hidden, rnn1_cell))
+    x = x + rnn1_hidden
+    rnn2_hidden, rnn2_cell = decoder.res_rnn2(x, (rnn2_hidden, rnn2_cell))
+    x = x + rnn2_hidden
+
+    mels = decoder.mel_proj(x)
+    mels = mels.view(batch_size, decoder.n_mels, decoder.max_r)[:, :, :decoder.r]
+    s = torch.cat((x, context_vec), dim=1)
+    stop_tokens = torch.sigmoid(decoder.stop_proj(s))
+    return mels, scores, (attn_hidden, rnn1_hidden, rnn2_hidden), (rnn1_cell, rnn2_cell), \
+        context_vec, stop_tokens
+
+
+def legacy_generate(model, x, speaker_embedding, steps):
+    model.eval()
+    device = next(model.parameters()).device
+    batch_size, _ = x.size()
+    hidden_states, cell_states, go_frame, context_vec = \
+        model._init_decoder_states(batch_size, device)
+    encoder_seq = model.encoder(x, speaker_embedding)
+    encoder_seq_proj = model.encoder_proj(encoder_seq)
+
+    mel_outputs, attn_scores, stop_outputs = [], [], []
+    for t in range(0, steps, model.r):
+        prenet_in = mel_outputs[-1][:, :, -1] if t > 0 else go_frame
+        mel_frames, scores, hidden_states, cell_states, context_vec, stop_tokens = \
+            legacy_decoder_step(model.decoder, encoder_seq, encoder_seq_proj, prenet_in,
+                                hidden_states, cell_states, context_vec, t, x)
+        mel_outputs.append(mel_frames)
+        attn_scores.append(scores)
+        stop_outputs.extend([stop_tokens] * model.r)
+        if (stop_tokens > 0.5).all() and t > 10: break
+
+    mel_outputs = torch.cat(mel_outputs, dim=2)
+    postnet_out = model.postnet(mel_outputs)
+    linear = model.post_proj(postnet_out).transpose(1, 2)
+    attn_scores = torch.cat(attn_scores, 1)
+    stop_outputs = torch.cat(stop_outputs, 1)
+    model.train()
+    return mel_outputs, linear, attn_scores
+
+
+def timed(generate, model, chars, embeds, steps, repeat):
+    times = []
+    for i in range(repeat):
+        torch.manual_seed(i)
+        start = perf_counter()
+        _, linear, _ = generate(model, chars, embeds, steps)
+        times.append(perf_counter() - start)
+    return linear, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Tacotron decoder steps.")
+    parser.add_argument("--syn_model", type=Path, default=Path("models/default/synthesizer.pt"))
+    parser.add_argument("--steps", type=int, default=1000, help="Number of frames to decode")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    synthesizer = Synthesizer(args.syn_model, verbose=False, device=args.device)
+    synthesizer.load()
+    model = synthesizer._model
+    model.decoder.stop_proj.bias.data.fill_(-1e4)
+    device = torch.device(args.device)
+    text = "The quick brown fox jumps over the lazy dog, then naps in the warm afternoon sun."
+    decoder_steps = (args.steps + model.r - 1) // model.r
+
+    print("%-6s %14s %24s %24s   max abs diff" % ("batch", "legacy", "eager", "scripted"))
+    with TemporaryDirectory() as cache_dir:
+        for batch_size in (1, 4, 16):
+            chars = torch.tensor(text_to_sequence_array(text, hparams.tts_cleaner_names)[None])
+            chars = chars.long().repeat(batch_size, 1).to(device)
+            embeds = torch.rand(batch_size, hparams.speaker_embedding_size, device=device)
+
+            ref_linear, legacy_time = timed(legacy_generate, model, chars, embeds, args.steps,
+                                            args.repeat)
+            line = "%-6d %9.0f st/s" % (batch_size, decoder_steps / legacy_time)
+            diffs = []
+            for script_cache_fpath in (None, Path(cache_dir, "decoder.pt")):
+                model.prepare_inference(script_cache_fpath)
+                linear, new_time = timed(lambda m, *a: m.generate(*a), model, chars, embeds,
+                                         args.steps, args.repeat)
+                line += " %9.0f st/s (%5.2fx)" % (decoder_steps / new_time,
+                                                   legacy_time / new_time)
+                diffs.append((linear - ref_linear).abs().max().item())
+            print(line + "   %.1e, %.1e" % tuple(diffs))
+
+
+if __name__ == "__main__":
+    main()
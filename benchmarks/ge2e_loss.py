@@ -0,0 +1,94 @@
+"""
+Compares the GE2E similarity matrix and loss of encoder.model.SpeakerEncoder against the
+original implementation, which looped over speakers and built one-hot labels one utterance at a
+time. Times a forward and backward pass of the loss on random embeddings.
+
+Usage:
+    python -m benchmarks.ge2e_loss [--device cpu] [--repeat 20]
+"""
+from encoder.model import SpeakerEncoder
+from scipy.interpolate import interp1d
+from sklearn.metrics import roc_curve
+from scipy.optimize import brentq
+from time import perf_counter
+import argparse
+import numpy as np
+import torch
+
+
+def legacy_similarity_matrix(model, embeds):
+    speakers_per_batch, utterances_per_speaker = embeds.shape[:2]
+    centroids_incl = torch.mean(embeds, dim=1, keepdim=True)
+    centroids_incl = centroids_incl.clone() / (torch.norm(centroids_incl, dim=2, keepdim=True) + 1e-5)
+    centroids_excl = (torch.sum(embeds, dim=1, keepdim=True) - embeds)
+    centroids_excl /= (utterances_per_speaker - 1)
+    centroids_excl = centroids_excl.clone() / (torch.norm(centroids_excl, dim=2, keepdim=True) + 1e-5)
+
+    sim_matrix = torch.zeros(speakers_per_batch, utterances_per_speaker,
+                             speakers_per_batch).to(model.loss_device)
+    # np.int in the original, which recent numpy versions removed
+    mask_matrix = 1 - np.eye(speakers_per_batch, dtype=int)
+    for j in range(speakers_per_batch):
+        mask = np.where(mask_matrix[j])[0]
+        sim_matrix[mask, :, j] = (embeds[mask] * centroids_incl[j]).sum(dim=2)
+        sim_matrix[j, :, j] = (embeds[j] * centroids_excl[j]).sum(dim=1)
+    return sim_matrix * model.similarity_weight + model.similarity_bias
+
+
+def legacy_loss(model, embeds):
+    speakers_per_batch, utterances_per_speaker = embeds.shape[:2]
+    sim_matrix = legacy_similarity_matrix(model, embeds)
+    sim_matrix = sim_matrix.reshape((speakers_per_batch * utterances_per_speaker,
+                                     speakers_per_batch))
+    ground_truth = np.repeat(np.arange(speakers_per_batch), utterances_per_speaker)
+    target = torch.from_numpy(ground_truth).long().to(model.loss_device)
+    loss = model.loss_fn(sim_matrix, target)
+    with torch.no_grad():
+        inv_argmax = lambda i: np.eye(1, speakers_per_batch, i, dtype=int)[0]
+        labels = np.array([inv_argmax(i) for i in ground_truth])
+        preds = sim_matrix.detach().cpu().numpy()
+        fpr, tpr, thresholds = roc_curve(labels.flatten(), preds.flatten())
+        eer = brentq(lambda x: 1. - x - interp1d(fpr, tpr)(x), 0., 1.)
+    return loss, eer
+
+
+def timed_step(loss_fn, embeds, repeat):
+    times = []
+    for _ in range(repeat):
+        embeds.grad = None
+        start = perf_counter()
+        loss, eer = loss_fn(embeds)
+        loss.backward()
+        if embeds.is_cuda:
+            torch.cuda.synchronize()
+        times.append(perf_counter() - start)
+    return loss.item(), eer, embeds.grad.clone(), min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GE2E loss.")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    model = SpeakerEncoder(device, device)
+    torch.manual_seed(0)
+
+    print("%-10s %12s %12s %8s   max abs diff (loss, eer, grad)" % ("batch", "legacy", "vectorized",
+                                                                     "speedup"))
+    for speakers, utterances in ((16, 5), (32, 10), (64, 10), (64, 20)):
+        embeds = torch.nn.functional.normalize(torch.randn(speakers, utterances, 256), dim=2)
+        embeds = embeds.to(device).requires_grad_()
+
+        ref_loss, ref_eer, ref_grad, legacy_time = timed_step(
+            lambda e: legacy_loss(model, e), embeds, args.repeat)
+        loss, eer, grad, new_time = timed_step(model.loss, embeds, args.repeat)
+        print("%-10s %9.2f ms %9.2f ms %7.1fx   %.1e, %.1e, %.1e" % (
+            "%dx%d" % (speakers, utterances), legacy_time * 1000, new_time * 1000,
+            legacy_time / new_time, abs(loss - ref_loss), abs(eer - ref_eer),
+            (grad - ref_grad).abs().max().item()))
+
+
+if __name__ == "__main__":
+    main()
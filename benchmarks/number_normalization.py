@@ -0,0 +1,105 @@
+"""
+Checks synthesizer.utils.numbers.normalize_numbers() against the original implementation, which
+called inflect for every number, on a golden set of numbers, ordinals, years, amounts and
+prompts, then compares their speed and import time.
+
+Usage:
+    python -m benchmarks.number_normalization [--texts 5000]
+"""
+from benchmarks.text_corpus import unique_texts
+from synthesizer.utils import numbers
+from time import perf_counter
+import argparse
+import numpy as np
+import re
+import subprocess
+import sys
+
+
+_legacy_inflect = None
+
+
+def _legacy_expand_ordinal(m):
+    return _legacy_inflect.number_to_words(m.group(0))
+
+
+def _legacy_expand_number(m):
+    num = int(m.group(0))
+    if num > 1000 and num < 3000:
+        if num == 2000:
+            return "two thousand"
+        elif num > 2000 and num < 2010:
+            return "two thousand " + _legacy_inflect.number_to_words(num % 100)
+        elif num % 100 == 0:
+            return _legacy_inflect.number_to_words(num // 100) + " hundred"
+        else:
+            return _legacy_inflect.number_to_words(num, andword="", zero="oh",
+                                                   group=2).replace(", ", " ")
+    else:
+        return _legacy_inflect.number_to_words(num, andword="")
+
+
+def legacy_normalize_numbers(text):
+    text = re.sub(numbers._comma_number_re, numbers._remove_commas, text)
+    text = re.sub(numbers._pounds_re, r"\1 pounds", text)
+    text = re.sub(numbers._dollars_re, numbers._expand_dollars, text)
+    text = re.sub(numbers._decimal_number_re, numbers._expand_decimal_point, text)
+    text = re.sub(numbers._ordinal_re, _legacy_expand_ordinal, text)
+    text = re.sub(numbers._number_re, _legacy_expand_number, text)
+    return text
+
+
+def golden_inputs(seed=0):
+    rng = np.random.default_rng(seed)
+    inputs = [str(n) for n in range(0, 12000)]
+    inputs += [str(n) for n in rng.integers(0, 10 ** 18, 5000, dtype=np.uint64)]
+    inputs += [str(int(n) * 10 ** 17 + int(m)) for n, m in
+               zip(rng.integers(0, 10 ** 18, 1000, dtype=np.uint64),
+                   rng.integers(0, 10 ** 4, 1000))]
+    inputs += [str(10 ** e + d) for e in range(3, 36) for d in (0, 1, 7, 21, 100, 101, 1000)]
+    inputs += ["%d%s" % (n, s) for n in range(0, 3000) for s in ("st", "nd", "rd", "th")]
+    inputs += ["%dth" % n for n in rng.integers(0, 10 ** 12, 2000)]
+    inputs += ["$%d" % n for n in range(0, 3000, 7)] + ["$%d.%02d" % (n, c) for n, c in
+                                                       zip(range(0, 3000, 3), range(1000))]
+    inputs += ["$1.2.3", "$.5", "$1,000,000.01", "£3", "£1,200", "3.14", "1,234.56", "0.01"]
+    inputs += unique_texts(3000)
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark number normalization.")
+    parser.add_argument("--texts", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Import time, in fresh interpreters
+    for name, statement in (("inflect", "import inflect; inflect.engine()"),
+                            ("numbers", "import synthesizer.utils.numbers")):
+        start = perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        print("Interpreter start + %-8s import: %6.0f ms" % (name, (perf_counter() - start) * 1000))
+
+    global _legacy_inflect
+    import inflect
+    _legacy_inflect = inflect.engine()
+
+    inputs = golden_inputs()
+    mismatches = [(x, legacy_normalize_numbers(x), numbers.normalize_numbers(x)) for x in inputs]
+    mismatches = [m for m in mismatches if m[1] != m[2]]
+    print("Golden set: %d inputs, %d mismatches" % (len(inputs), len(mismatches)))
+    for x, expected, actual in mismatches[:10]:
+        print("  %r: expected %r, got %r" % (x, expected, actual))
+
+    texts = unique_texts(args.texts, seed=1)
+    for name, fn in (("legacy", legacy_normalize_numbers), ("new", numbers.normalize_numbers)):
+        start = perf_counter()
+        for text in texts:
+            fn(text)
+        elapsed = perf_counter() - start
+        if name == "legacy":
+            legacy_time = elapsed
+        print("%-8s %8.1f ms for %d prompts  %5.1fx" % (name, elapsed * 1000, len(texts),
+                                                        legacy_time / elapsed))
+
+
+if __name__ == "__main__":
+    main()
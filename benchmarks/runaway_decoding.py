@@ -0,0 +1,54 @@
+"""
+Times Tacotron.generate() on texts whose stop token never fires, as when the attention fails
+to reach the end of the text, with the fixed budget of decoder steps and with a per-character
+frame budget and the attention checks, which are off in the default hparams. Reports the
+frames decoded, the seconds of audio they amount to and the time taken.
+
+Usage:
+    python -m benchmarks.runaway_decoding [--syn_model models/default/synthesizer.pt]
+"""
+from synthesizer.hparams import hparams
+from synthesizer.inference import Synthesizer
+from synthesizer.utils.text import text_to_sequence_array
+from pathlib import Path
+from time import perf_counter
+import argparse
+import torch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decoding of runaway texts.")
+    parser.add_argument("--syn_model", type=Path, default=Path("models/default/synthesizer.pt"))
+    parser.add_argument("--steps", type=int, default=2000, help="Maximum number of frames")
+    parser.add_argument("--max_frames_per_char", type=float, default=15)
+    parser.add_argument("--stall_frames", type=int, default=100)
+    parser.add_argument("--max_backtrack", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    synthesizer = Synthesizer(args.syn_model, verbose=False, device=args.device)
+    synthesizer.load()
+    model = synthesizer._model
+    model.decoder.stop_proj.bias.data.fill_(-1e4)
+    model.prepare_inference()
+    device = torch.device(args.device)
+    frame_duration = hparams.hop_size / hparams.sample_rate
+    adaptive = dict(synthesizer._decoding_kwargs(), max_frames_per_char=args.max_frames_per_char,
+                    stall_frames=args.stall_frames, max_backtrack=args.max_backtrack)
+
+    print("%-52s %-8s %7s %8s %8s" % ("text", "mode", "frames", "audio", "time"))
+    for text in ("Hi.", "Okay?!", "The quick brown fox jumps over the lazy dog."):
+        chars = text_to_sequence_array(text, hparams.tts_cleaner_names)
+        chars = torch.tensor(chars[None]).long().to(device)
+        embed = torch.rand(1, hparams.speaker_embedding_size, device=device)
+        for mode, kwargs in (("fixed", {}), ("adaptive", adaptive)):
+            start = perf_counter()
+            *_, info = model.generate(chars, embed, args.steps, return_info=True, **kwargs)
+            elapsed = perf_counter() - start
+            frames = info["lengths"][0]
+            print("%-52s %-8s %7d %7.1fs %7.2fs" % (text, mode, frames, frames * frame_duration,
+                                                    elapsed))
+
+
+if __name__ == "__main__":
+    main()
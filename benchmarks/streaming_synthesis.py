@@ -0,0 +1,84 @@
+"""
+Compares the chunks of Tacotron.generate_stream() against the one-shot spectrogram of
+Tacotron.generate() for a few postnet context and cross-fade sizes, and times the first chunk
+against the whole synthesis. Both runs are seeded alike so that their decoder outputs are the
+same and only the chunked postnet differs.
+
+Usage:
+    python -m benchmarks.streaming_synthesis [--syn_model models/default/synthesizer.pt]
+"""
+from benchmarks.text_corpus import unique_texts
+from synthesizer.hparams import hparams
+from synthesizer.inference import Synthesizer
+from synthesizer.utils.text import text_to_sequence_array
+from pathlib import Path
+from time import perf_counter
+import argparse
+import numpy as np
+import torch
+
+
+def one_shot(model, chars, embed, steps, seed):
+    torch.manual_seed(seed)
+    start = perf_counter()
+    _, linear, _ = model.generate(chars, embed, steps)
+    return linear[0].detach().cpu().numpy(), perf_counter() - start
+
+
+def streamed(model, chars, embed, steps, seed, **stream_kwargs):
+    torch.manual_seed(seed)
+    start = perf_counter()
+    chunks = []
+    for chunk in model.generate_stream(chars, embed, steps, **stream_kwargs):
+        if not chunks:
+            first_chunk_time = perf_counter() - start
+        chunks.append(chunk[0].detach().cpu().numpy())
+    return np.concatenate(chunks, axis=1), first_chunk_time, perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming synthesis.")
+    parser.add_argument("--syn_model", type=Path, default=Path("models/default/synthesizer.pt"))
+    parser.add_argument("--texts", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--chunk_steps", type=int, default=20)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    synthesizer = Synthesizer(args.syn_model, verbose=False, device=args.device)
+    synthesizer.load()
+    model = synthesizer._model
+    device = torch.device(args.device)
+    embed = torch.nn.functional.normalize(torch.rand(1, hparams.speaker_embedding_size), dim=1)
+    embed = embed.to(device)
+
+    configs = [(0, 0, 0), (10, 10, 0), (10, 10, 5), (20, 20, 10), (40, 40, 20)]
+    print("Distortion in normalized mel units (range %g), mean and max absolute error" %
+          (2 * hparams.max_abs_value))
+    print("%-26s %10s %10s %12s %12s %8s" % ("context (left, right, fade)", "mean err",
+                                             "max err", "first chunk", "stream", "one shot"))
+    with torch.no_grad():
+        texts = unique_texts(args.texts, seed=2)
+        for left, right, fade in configs:
+            errors, max_errors, first_times, stream_times, one_shot_times = [], [], [], [], []
+            for seed, text in enumerate(texts):
+                chars = text_to_sequence_array(text, hparams.tts_cleaner_names)
+                chars = torch.tensor(chars[None]).long().to(device)
+                reference, one_shot_time = one_shot(model, chars, embed, args.steps, seed)
+                mel, first_time, stream_time = streamed(
+                    model, chars, embed, args.steps, seed, chunk_steps=args.chunk_steps,
+                    left_context=left, right_context=right, crossfade=fade)
+                error = np.abs(mel - reference)
+                errors.append(error.mean())
+                max_errors.append(error.max())
+                first_times.append(first_time)
+                stream_times.append(stream_time)
+                one_shot_times.append(one_shot_time)
+            print("%-26s %10.4f %10.4f %9.0f ms %9.0f ms %5.0f ms" % (
+                "%d, %d, %d" % (left, right, fade), np.mean(errors), np.max(max_errors),
+                np.mean(first_times) * 1000, np.mean(stream_times) * 1000,
+                np.mean(one_shot_times) * 1000))
+
+
+if __name__ == "__main__":
+    main()
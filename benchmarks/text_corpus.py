@@ -0,0 +1,72 @@
+"""
+A synthetic but realistic stream of synthesis prompts for the text front end benchmarks: prose,
+abbreviations, times, prices, quantities, dates and phone menu prompts. Like real traffic, the
+stream repeats some prompts far more often than others.
+"""
+import numpy as np
+
+
+_prose = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Thank you for calling, please listen carefully as our menu options have changed.",
+    "Your appointment with Dr. Smith has been confirmed.",
+    "Mr. and Mrs. Johnson will arrive at St. Mary's hospital tomorrow morning.",
+    "Please hold while we transfer you to the next available representative.",
+    "Capt. Rogers and Lt. Hayes reported to Gen. Walker at Ft. Bragg.",
+    "The meeting has been moved to the main conference room on the third floor.",
+    "Acme Co. Ltd. announced record profits for the quarter.",
+    "Welcome back! It's great to hear from you again.",
+    "Rev. Thomas will lead the service, followed by Hon. Judge Miller.",
+]
+
+_templates = [
+    "Your total comes to ${d}.{c:02d}.",
+    "The invoice of ${d},{t:03d}.{c:02d} is due on the {o} of the month.",
+    "Press {s} for billing, {s2} for support, or {s3} to speak with an operator.",
+    "Your train departs at {h}:{m:02d} from platform {s}.",
+    "We have shipped {n} items, {n2} of which arrive by the {o}.",
+    "The package weighs {d}.{c} kilograms and costs £{d2}.",
+    "In {y}, the company had {n},{t:03d} employees.",
+    "You are caller number {o2} in the queue.",
+    "Please enter your {s}-digit pin followed by the pound key.",
+    "Temperatures will reach {d} degrees, about {s}.{c} percent above normal.",
+]
+
+
+def _fill(template, rng):
+    return template.format(
+        d=rng.integers(1, 1000), d2=rng.integers(1, 100), c=rng.integers(0, 100),
+        t=rng.integers(0, 1000), s=rng.integers(1, 10), s2=rng.integers(1, 10),
+        s3=rng.integers(1, 10), h=rng.integers(1, 13), m=rng.integers(0, 60),
+        n=rng.integers(2, 5000), n2=rng.integers(1, 100), y=rng.integers(1900, 2030),
+        o="%dst" % rng.integers(1, 31) if rng.random() < 0.3 else "%dth" % rng.integers(4, 20),
+        o2="%dnd" % rng.integers(1, 10) if rng.random() < 0.5 else "%drd" % rng.integers(1, 10))
+
+
+def unique_texts(n_unique=2000, seed=0):
+    """
+    Returns n_unique distinct prompts.
+    """
+    rng = np.random.default_rng(seed)
+    texts = list(_prose)
+    seen = set(texts)
+    while len(texts) < n_unique:
+        text = _fill(_templates[rng.integers(len(_templates))], rng)
+        if rng.random() < 0.3:
+            text = _prose[rng.integers(len(_prose))] + " " + text
+        if text not in seen:
+            seen.add(text)
+            texts.append(text)
+    return texts
+
+
+def text_stream(n_texts=20000, n_unique=2000, zipf_a=1.2, seed=0):
+    """
+    Returns n_texts prompts drawn from n_unique distinct ones with a Zipf distribution.
+    """
+    texts = unique_texts(n_unique, seed)
+    rng = np.random.default_rng(seed + 1)
+    ranks = np.arange(1, len(texts) + 1)
+    p = ranks ** -zipf_a
+    indices = rng.choice(len(texts), n_texts, p=p / p.sum())
+    return [texts[i] for i in indices]
@@ -0,0 +1,82 @@
+"""
+Compares the throughput of synthesizer.utils.text.text_to_sequence() against the original
+implementation, which resolved the cleaners by name and ran one regex pass per abbreviation on
+every call, with no caching.
+
+Usage:
+    python -m benchmarks.text_frontend [--texts 20000] [--unique 2000]
+"""
+from benchmarks.text_corpus import text_stream
+from synthesizer.hparams import hparams
+from synthesizer.utils import cleaners, text
+from time import perf_counter
+import argparse
+import re
+
+
+_legacy_abbreviations = [(re.compile("\\b%s\\." % x[0], re.IGNORECASE), x[1])
+                         for x in cleaners._abbreviations]
+
+
+def legacy_english_cleaners(t):
+    t = cleaners.convert_to_ascii(t)
+    t = cleaners.lowercase(t)
+    t = cleaners.expand_numbers(t)
+    for regex, replacement in _legacy_abbreviations:
+        t = re.sub(regex, replacement, t)
+    t = cleaners.collapse_whitespace(t)
+    return t
+
+
+def legacy_text_to_sequence(t, cleaner_names):
+    # The original text_to_sequence(), minus ARPAbet handling which the corpus doesn't use
+    for name in cleaner_names:
+        cleaner = getattr(cleaners, name)
+        if not cleaner:
+            raise Exception("Unknown cleaner: %s" % name)
+        t = legacy_english_cleaners(t)
+    return text._symbols_to_sequence(t) + [text._symbol_to_id["~"]]
+
+
+def timed(fn, texts):
+    start = perf_counter()
+    sequences = [fn(t, hparams.tts_cleaner_names) for t in texts]
+    return sequences, perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the text front end.")
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--unique", type=int, default=2000)
+    args = parser.parse_args()
+
+    texts = text_stream(args.texts, args.unique)
+    n_chars = sum(len(t) for t in texts)
+    print("%d prompts (%d distinct), %d characters" % (len(texts), len(set(texts)), n_chars))
+
+    reference, legacy_time = timed(legacy_text_to_sequence, texts)
+    print("%-24s %8.1f ms  %10.0f prompts/s" % ("legacy", legacy_time * 1000,
+                                                len(texts) / legacy_time))
+
+    # Without repetitions, only the single pass abbreviation regex and the cleaner resolution help
+    distinct = list(dict.fromkeys(texts))
+    distinct_legacy_time = min(timed(legacy_text_to_sequence, distinct)[1] for _ in range(3))
+    distinct_time = float("inf")
+    for _ in range(3):
+        text._cached_sequence.cache_clear()
+        distinct_time = min(distinct_time, timed(text.text_to_sequence, distinct)[1])
+    print("%-24s %8.1f ms  %10.0f prompts/s  %5.1fx" % (
+        "distinct prompts only", distinct_time * 1000, len(distinct) / distinct_time,
+        distinct_legacy_time / distinct_time))
+
+    for name, fn in (("text_to_sequence", text.text_to_sequence),
+                     ("text_to_sequence_array", text.text_to_sequence_array)):
+        text._cached_sequence.cache_clear()
+        sequences, new_time = timed(fn, texts)
+        identical = all(list(s) == r for s, r in zip(sequences, reference))
+        print("%-24s %8.1f ms  %10.0f prompts/s  %5.1fx  identical: %s" % (
+            name, new_time * 1000, len(texts) / new_time, legacy_time / new_time, identical))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares the VAD backends of encoder.audio.trim_long_silences() against the original
+implementation, which packed the PCM buffer sample by sample with struct.pack().
+
+Usage:
+    python -m benchmarks.vad_backends [--wav sample/Recording.mp3] [--repeat 10]
+"""
+from encoder import audio
+from encoder.params_data import *
+from pathlib import Path
+from time import perf_counter
+import argparse
+import numpy as np
+import struct
+
+
+def legacy_audio_mask(wav):
+    # The original trim_long_silences(), up to the per-window audio mask
+    import webrtcvad
+    samples_per_window = (vad_window_length * sampling_rate) // 1000
+    wav = wav[:len(wav) - (len(wav) % samples_per_window)]
+    pcm_wave = struct.pack("%dh" % len(wav), *(np.round(wav * audio.int16_max)).astype(np.int16))
+    voice_flags = []
+    vad = webrtcvad.Vad(mode=3)
+    for window_start in range(0, len(wav), samples_per_window):
+        window_end = window_start + samples_per_window
+        voice_flags.append(vad.is_speech(pcm_wave[window_start * 2:window_end * 2],
+                                         sample_rate=sampling_rate))
+    return audio.compute_audio_mask(np.array(voice_flags))
+
+
+def audio_mask(wav, backend):
+    samples_per_window = (vad_window_length * sampling_rate) // 1000
+    wav = wav[:len(wav) - (len(wav) % samples_per_window)]
+    return audio.compute_audio_mask(audio.compute_voice_flags(wav, backend))
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = fn()
+        times.append(perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the VAD backends.")
+    parser.add_argument("--wav", type=Path, default=Path("sample/Recording.mp3"))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    wav = audio.preprocess_wav(args.wav, trim_silence=False)
+    print("Input: %s, %.1f s" % (args.wav, len(wav) / sampling_rate))
+
+    reference, legacy_time = timed(lambda: legacy_audio_mask(wav), args.repeat)
+    print("%-8s %8.2f ms" % ("legacy", legacy_time * 1000))
+    for backend in ("webrtc", "numpy"):
+        mask, backend_time = timed(lambda: audio_mask(wav, backend), args.repeat)
+        agreement = np.mean(mask == reference) * 100
+        print("%-8s %8.2f ms  %5.1fx  mask agreement with legacy: %5.1f%%, kept %5.1f%% (legacy "
+              "%5.1f%%)" % (backend, backend_time * 1000, legacy_time / backend_time, agreement,
+                            np.mean(mask) * 100, np.mean(reference) * 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares the decoding speed of Tacotron.generate() in decoder steps per second with windowed
+attention against attention over the whole text, for texts of increasing length, and reports
+how far the spectrograms drift apart. The stop token is disabled so that every run decodes the
+same number of steps, and dropout is disabled so that both runs are comparable.
+
+Usage:
+    python -m benchmarks.windowed_attention [--syn_model models/default/synthesizer.pt]
+"""
+from synthesizer.hparams import hparams
+from synthesizer.inference import Synthesizer
+from synthesizer.utils.text import text_to_sequence_array
+from pathlib import Path
+from time import perf_counter
+import argparse
+import torch
+
+
+def timed(model, chars, embeds, steps, attention_window, repeat):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        _, linear, _ = model.generate(chars, embeds, steps, attention_window=attention_window)
+        times.append(perf_counter() - start)
+    return linear, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark windowed attention on long texts.")
+    parser.add_argument("--syn_model", type=Path, default=Path("models/default/synthesizer.pt"))
+    parser.add_argument("--window", type=int, default=64, help="Attention window in characters")
+    parser.add_argument("--steps", type=int, default=1000, help="Number of frames to decode")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    synthesizer = Synthesizer(args.syn_model, verbose=False, device=args.device)
+    synthesizer.load()
+    model = synthesizer._model
+    model.decoder.stop_proj.bias.data.fill_(-1e4)
+    model.decoder.prenet.p = 0.
+    model.encoder.pre_net.p = 0.
+    model.prepare_inference()
+    device = torch.device(args.device)
+    sentence = "The quick brown fox jumps over the lazy dog, then naps in the warm afternoon sun. "
+    decoder_steps = (args.steps + model.r - 1) // model.r
+
+    print("%-6s %14s %24s   max abs diff" % ("chars", "full", "windowed"))
+    for repeats in (1, 4, 16):
+        chars = text_to_sequence_array(sentence * repeats, hparams.tts_cleaner_names)
+        chars = torch.tensor(chars[None]).long().to(device)
+        embeds = torch.rand(1, hparams.speaker_embedding_size, device=device)
+
+        ref_linear, full_time = timed(model, chars, embeds, args.steps, 0, args.repeat)
+        linear, window_time = timed(model, chars, embeds, args.steps, args.window, args.repeat)
+        print("%-6d %9.0f st/s %9.0f st/s (%5.2fx)   %.1e" % (
+            chars.size(1), decoder_steps / full_time, decoder_steps / window_time,
+            full_time / window_time, (linear - ref_linear).abs().max().item()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,117 +1,212 @@
-from scipy.ndimage.morphology import binary_dilation
-from encoder.params_data import *
-from pathlib import Path
-from typing import Optional, Union
-from warnings import warn
-import numpy as np
-import librosa
-import struct
-
-try:
-    import webrtcvad
-except:
-    warn("Unable to import 'webrtcvad'. This package enables noise removal and is recommended.")
-    webrtcvad=None
-
-int16_max = (2 ** 15) - 1
-
-
-def preprocess_wav(fpath_or_wav: Union[str, Path, np.ndarray],
-                   source_sr: Optional[int] = None,
-                   normalize: Optional[bool] = True,
-                   trim_silence: Optional[bool] = True):
-    """
-    Applies the preprocessing operations used in training the Speaker Encoder to a waveform 
-    either on disk or in memory. The waveform will be resampled to match the data hyperparameters.
-
-    :param fpath_or_wav: either a filepath to an audio file (many extensions are supported, not 
-    just .wav), either the waveform as a numpy array of floats.
-    :param source_sr: if passing an audio waveform, the sampling rate of the waveform before 
-    preprocessing. After preprocessing, the waveform's sampling rate will match the data 
-    hyperparameters. If passing a filepath, the sampling rate will be automatically detected and 
-    this argument will be ignored.
-    """
-    # Load the wav from disk if needed
-    if isinstance(fpath_or_wav, str) or isinstance(fpath_or_wav, Path):
-        wav, source_sr = librosa.load(str(fpath_or_wav), sr=None)
-    else:
-        wav = fpath_or_wav
-    
-    # Resample the wav if needed
-    if source_sr is not None and source_sr != sampling_rate:
-        wav = librosa.resample(wav, source_sr, sampling_rate)
-        
-    # Apply the preprocessing: normalize volume and shorten long silences 
-    if normalize:
-        wav = normalize_volume(wav, audio_norm_target_dBFS, increase_only=True)
-    if webrtcvad and trim_silence:
-        wav = trim_long_silences(wav)
-    
-    return wav
-
-
-def wav_to_mel_spectrogram(wav):
-    """
-    Derives a mel spectrogram ready to be used by the encoder from a preprocessed audio waveform.
-    Note: this not a log-mel spectrogram.
-    """
-    frames = librosa.feature.melspectrogram(
-        y=wav,
-        sr=sampling_rate,
-        n_fft=int(sampling_rate * mel_window_length / 1000),
-        hop_length=int(sampling_rate * mel_window_step / 1000),
-        n_mels=mel_n_channels
-    )
-    return frames.astype(np.float32).T
-
-
-def trim_long_silences(wav):
-    """
-    Ensures that segments without voice in the waveform remain no longer than a 
-    threshold determined by the VAD parameters in params.py.
-
-    :param wav: the raw waveform as a numpy array of floats 
-    :return: the same waveform with silences trimmed away (length <= original wav length)
-    """
-    # Compute the voice detection window size
-    samples_per_window = (vad_window_length * sampling_rate) // 1000
-    
-    # Trim the end of the audio to have a multiple of the window size
-    wav = wav[:len(wav) - (len(wav) % samples_per_window)]
-    
-    # Convert the float waveform to 16-bit mono PCM
-    pcm_wave = struct.pack("%dh" % len(wav), *(np.round(wav * int16_max)).astype(np.int16))
-    
-    # Perform voice activation detection
-    voice_flags = []
-    vad = webrtcvad.Vad(mode=3)
-    for window_start in range(0, len(wav), samples_per_window):
-        window_end = window_start + samples_per_window
-        voice_flags.append(vad.is_speech(pcm_wave[window_start * 2:window_end * 2],
-                                         sample_rate=sampling_rate))
-    voice_flags = np.array(voice_flags)
-    
-    # Smooth the voice detection with a moving average
-    def moving_average(array, width):
-        array_padded = np.concatenate((np.zeros((width - 1) // 2), array, np.zeros(width // 2)))
-        ret = np.cumsum(array_padded, dtype=float)
-        ret[width:] = ret[width:] - ret[:-width]
-        return ret[width - 1:] / width
-    
-    audio_mask = moving_average(voice_flags, vad_moving_average_width)
-    audio_mask = np.round(audio_mask).astype(bool)
-    
-    # Dilate the voiced regions
-    audio_mask = binary_dilation(audio_mask, np.ones(vad_max_silence_length + 1))
-    audio_mask = np.repeat(audio_mask, samples_per_window)
-    
-    return wav[audio_mask == True]
-
-
-def normalize_volume(wav, target_dBFS, increase_only=False, decrease_only=False):
-    if increase_only and decrease_only:
-        raise ValueError("Both increase only and decrease only are set")
-    dBFS_change = target_dBFS - 10 * np.log10(np.mean(wav ** 2))
-    if (dBFS_change < 0 and increase_only) or (dBFS_change > 0 and decrease_only):
-        return wav
-    return wav * (10 ** (dBFS_change / 20))
+from scipy.ndimage import binary_dilation
+from encoder.params_data import *
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+from utils.audio_ingest import load_audio, resample
+from warnings import warn
+import numpy as np
+import scipy.fft
+import librosa
+
+try:
+    import webrtcvad
+except:
+    warn("Unable to import 'webrtcvad'. This package enables noise removal and is recommended.")
+    webrtcvad=None
+
+int16_max = (2 ** 15) - 1
+
+
+def preprocess_wav(fpath_or_wav: Union[str, Path, bytes, BinaryIO, np.ndarray],
+                   source_sr: Optional[int] = None,
+                   normalize: Optional[bool] = True,
+                   trim_silence: Optional[bool] = True,
+                   vad: Optional[str] = None):
+    """
+    Applies the preprocessing operations used in training the Speaker Encoder to a waveform 
+    either on disk or in memory. The waveform will be resampled to match the data hyperparameters.
+
+    :param fpath_or_wav: either a filepath to an audio file (many extensions are supported, not 
+    just .wav), the content of such a file as bytes or a binary file object, either the waveform 
+    as a numpy array of floats.
+    :param source_sr: if passing an audio waveform, the sampling rate of the waveform before 
+    preprocessing. After preprocessing, the waveform's sampling rate will match the data 
+    hyperparameters. If passing a file, the sampling rate will be automatically detected and 
+    this argument will be ignored.
+    :param vad: the VAD backend used to trim silences, see trim_long_silences(). Defaults to 
+    vad_backend in params_data.py.
+    """
+    # Load the wav if needed, decoding straight to the target sampling rate
+    if isinstance(fpath_or_wav, np.ndarray):
+        wav = fpath_or_wav
+    else:
+        wav, source_sr = load_audio(fpath_or_wav, sampling_rate)
+    
+    # Resample the wav if needed
+    if source_sr is not None and source_sr != sampling_rate:
+        wav = resample(wav, source_sr, sampling_rate)
+        
+    # Apply the preprocessing: normalize volume and shorten long silences 
+    if normalize:
+        wav = normalize_volume(wav, audio_norm_target_dBFS, increase_only=True)
+    vad = vad or vad_backend
+    if trim_silence and (webrtcvad or vad == "numpy"):
+        wav = trim_long_silences(wav, vad)
+    
+    return wav
+
+
+def wav_to_mel_spectrogram(wav):
+    """
+    Derives a mel spectrogram ready to be used by the encoder from a preprocessed audio waveform.
+    Note: this not a log-mel spectrogram.
+    """
+    frames = librosa.feature.melspectrogram(
+        y=wav,
+        sr=sampling_rate,
+        n_fft=int(sampling_rate * mel_window_length / 1000),
+        hop_length=int(sampling_rate * mel_window_step / 1000),
+        n_mels=mel_n_channels
+    )
+    return frames.astype(np.float32).T
+
+
+def wav_to_mel_frames(wav, start, stop):
+    """
+    Computes frames [start, stop) of wav_to_mel_spectrogram(wav) from only the samples these
+    frames depend on, so that the cost does not grow with the length of the waveform.
+
+    If wav is a suffix of a longer waveform, starting at a multiple of the hop length, frames can
+    still be computed as long as <start> is at least mel_context_frames() into it.
+    """
+    hop_length = int(sampling_rate * mel_window_step / 1000)
+    half_window = int(sampling_rate * mel_window_length / 1000) // 2
+    context = mel_context_frames()
+
+    # Compute the spectrogram of a segment holding the frames with enough context on both sides
+    # for the segment's own padding not to affect them, and discard that context
+    first = max(0, start - context)
+    segment = wav[first * hop_length:stop * hop_length + half_window]
+    return wav_to_mel_spectrogram(segment)[start - first:stop - first]
+
+
+def mel_context_frames():
+    """
+    Number of frames on each side of a mel frame whose samples overlap with it.
+    """
+    hop_length = int(sampling_rate * mel_window_step / 1000)
+    half_window = int(sampling_rate * mel_window_length / 1000) // 2
+    return -(-half_window // hop_length)
+
+
+def compute_voice_flags(wav, backend: Optional[str] = None):
+    """
+    Runs voice activity detection over consecutive windows of <vad_window_length> ms.
+
+    :param wav: the raw waveform as a numpy array of floats, whose length is a multiple of the
+    window size
+    :param backend: "webrtc" or "numpy", see params_data.py. Defaults to vad_backend in
+    params_data.py.
+    :return: a boolean numpy array with one flag per window, True where voice was detected
+    """
+    backend = backend or vad_backend
+    samples_per_window = (vad_window_length * sampling_rate) // 1000
+    n_windows = len(wav) // samples_per_window
+    wav = wav[:n_windows * samples_per_window]
+
+    if backend == "numpy":
+        return _numpy_voice_flags(wav.reshape(n_windows, samples_per_window))
+    if backend != "webrtc":
+        raise ValueError("Unknown VAD backend: %s" % backend)
+    if webrtcvad is None:
+        raise ImportError("The webrtc VAD backend requires the 'webrtcvad' package.")
+
+    # Convert the float waveform to 16-bit mono PCM. The windows are handed to webrtcvad as
+    # views on this buffer, without building any per-sample Python object.
+    pcm_wave = memoryview(np.round(wav * int16_max).astype(np.int16)).cast("B")
+    window_bytes = samples_per_window * 2
+    vad = webrtcvad.Vad(mode=3)
+    voice_flags = np.empty(n_windows, dtype=bool)
+    for i in range(n_windows):
+        voice_flags[i] = vad.is_speech(pcm_wave[i * window_bytes:(i + 1) * window_bytes],
+                                       sample_rate=sampling_rate)
+    return voice_flags
+
+
+def _numpy_voice_flags(windows):
+    """
+    Energy and spectral flux voice detector, vectorized over all windows at once.
+    """
+    # Shorter inputs than a window have no window to estimate the noise floor from
+    if len(windows) == 0:
+        return np.zeros(0, dtype=bool)
+    eps = 1e-10
+    windows = windows.astype(np.float32, copy=False)
+    energy = 10 * np.log10(np.einsum("ij,ij->i", windows, windows) / windows.shape[1] + eps)
+    noise_floor = np.percentile(energy, vad_noise_percentile)
+
+    # Positive spectral flux between consecutive windows, normalized by the window magnitude so
+    # that it reflects a change of spectral shape rather than of loudness
+    window_fn = np.hanning(windows.shape[1]).astype(np.float32)
+    spectrum = np.abs(scipy.fft.rfft(windows * window_fn, axis=1))
+    spectrum /= spectrum.sum(axis=1, keepdims=True) + eps
+    flux = np.zeros(len(windows))
+    flux[1:] = np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1)
+
+    loud = energy > noise_floor + vad_energy_margin
+    changing = (energy > noise_floor + vad_energy_margin / 2) & (flux > np.median(flux))
+    return loud | changing
+
+
+def compute_audio_mask(voice_flags):
+    """
+    Smooths per-window voice flags and dilates the voiced regions, so that silences shorter than
+    <vad_max_silence_length> windows are kept.
+
+    :return: a boolean numpy array with one value per window, True for the windows to keep
+    """
+    # Smooth the voice detection with a moving average
+    def moving_average(array, width):
+        array_padded = np.concatenate((np.zeros((width - 1) // 2), array, np.zeros(width // 2)))
+        ret = np.cumsum(array_padded, dtype=float)
+        ret[width:] = ret[width:] - ret[:-width]
+        return ret[width - 1:] / width
+    
+    audio_mask = moving_average(voice_flags, vad_moving_average_width)
+    audio_mask = np.round(audio_mask).astype(bool)
+    
+    # Dilate the voiced regions
+    return binary_dilation(audio_mask, np.ones(vad_max_silence_length + 1))
+
+
+def trim_long_silences(wav, backend: Optional[str] = None):
+    """
+    Ensures that segments without voice in the waveform remain no longer than a 
+    threshold determined by the VAD parameters in params.py.
+
+    :param wav: the raw waveform as a numpy array of floats 
+    :param backend: the VAD backend, "webrtc" or "numpy", see params_data.py. Defaults to
+    vad_backend in params_data.py.
+    :return: the same waveform with silences trimmed away (length <= original wav length)
+    """
+    # Compute the voice detection window size
+    samples_per_window = (vad_window_length * sampling_rate) // 1000
+    
+    # Trim the end of the audio to have a multiple of the window size
+    wav = wav[:len(wav) - (len(wav) % samples_per_window)]
+    
+    # Perform voice activation detection
+    voice_flags = compute_voice_flags(wav, backend)
+    audio_mask = compute_audio_mask(voice_flags)
+    audio_mask = np.repeat(audio_mask, samples_per_window)
+    
+    return wav[audio_mask]
+
+
+def normalize_volume(wav, target_dBFS, increase_only=False, decrease_only=False):
+    if increase_only and decrease_only:
+        raise ValueError("Both increase only and decrease only are set")
+    dBFS_change = target_dBFS - 10 * np.log10(np.mean(wav ** 2))
+    if (dBFS_change < 0 and increase_only) or (dBFS_change > 0 and decrease_only):
+        return wav
+    return wav * (10 ** (dBFS_change / 20))
@@ -0,0 +1,159 @@
+from encoder import params_data
+from encoder.params_model import model_embedding_size
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+import numpy as np
+import hashlib
+import os
+
+
+# One record per cache slot. A slot with last_used == 0 is free.
+_record_dtype = np.dtype([
+    ("key", "u1", (32,)),
+    ("last_used", "<i8"),
+    ("embed", "<f4", (model_embedding_size,)),
+])
+
+_caches = {}
+
+
+@lru_cache(maxsize=None)
+def _params_digest():
+    """
+    Digest of the data hyperparameters. Changing any of them changes the preprocessing, so it
+    invalidates all cached embeddings.
+    """
+    params = {k: v for k, v in vars(params_data).items()
+              if not k.startswith("_") and isinstance(v, (int, float, str))}
+    return hashlib.sha256(repr(sorted(params.items())).encode()).digest()
+
+
+@lru_cache(maxsize=16)
+def _checkpoint_digest(fpath: Path, size: int, mtime_ns: int):
+    h = hashlib.sha256()
+    with fpath.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.digest()
+
+
+def checkpoint_digest(weights_fpath: Path):
+    """
+    Identifies an encoder checkpoint by its content. The digest is only recomputed when the file
+    changes on disk.
+    """
+    weights_fpath = Path(weights_fpath).resolve()
+    stat = weights_fpath.stat()
+    return _checkpoint_digest(weights_fpath, stat.st_size, stat.st_mtime_ns)
+
+
+class EmbeddingCache:
+    """
+    A content-addressed on-disk cache of utterance embeddings, with LRU eviction.
+
+    Entries are keyed by a hash of the raw bytes of the reference audio file, of the data
+    hyperparameters in params_data.py and of the encoder checkpoint, so a hit is exactly the
+    embedding embed_utterance() would have produced. The embeddings live in a single
+    memory-mapped file of fixed capacity, derived from the size budget. A cache directory should
+    only be written to by one process at a time.
+    """
+    def __init__(self, cache_dir: Path, max_bytes=64 * 1024 ** 2):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.fpath = self.cache_dir.joinpath("embeddings.npy")
+        capacity = max(1, max_bytes // _record_dtype.itemsize)
+
+        records = None
+        kept = np.empty(0, dtype=_record_dtype)
+        if self.fpath.exists():
+            records = np.load(self.fpath, mmap_mode="r+")
+            if records.dtype != _record_dtype:
+                records = None
+            elif len(records) != capacity:
+                # Keep the most recently used entries that fit in the new capacity, in memory, and
+                # release the mapping before the file is replaced
+                order = np.argsort(records["last_used"])[::-1][:capacity]
+                kept = np.array(records[order])
+                records = None
+        if records is None:
+            records = self._create(capacity, kept)
+        self._records = records
+
+        used = np.flatnonzero(records["last_used"])
+        self._slots = {records["key"][i].tobytes(): int(i) for i in used}
+        self._clock = int(records["last_used"].max(initial=0))
+
+    def _create(self, capacity, kept):
+        # Writes the records to a temporary file that then replaces the cache file, so that the
+        # file is never truncated while it is mapped, which Windows forbids
+        tmp_fpath = self.fpath.with_name(self.fpath.name + ".tmp")
+        records = np.lib.format.open_memmap(tmp_fpath, mode="w+", dtype=_record_dtype,
+                                            shape=(capacity,))
+        records[:len(kept)] = kept
+        records.flush()
+        del records
+        os.replace(tmp_fpath, self.fpath)
+        return np.load(self.fpath, mmap_mode="r+")
+
+    @staticmethod
+    def key(audio_bytes: bytes, encoder_fpath: Path) -> bytes:
+        """
+        Computes the cache key of a reference audio file.
+
+        :param audio_bytes: the raw content of the audio file, before any decoding
+        :param encoder_fpath: the path to the encoder checkpoint the embedding is computed with
+        """
+        h = hashlib.sha256(audio_bytes)
+        h.update(_params_digest())
+        h.update(checkpoint_digest(encoder_fpath))
+        return h.digest()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key: bytes):
+        return key in self._slots
+
+    def _touch(self, slot):
+        self._clock += 1
+        self._records["last_used"][slot] = self._clock
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """
+        :return: a copy of the cached embedding, or None on a miss
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        self._touch(slot)
+        return np.array(self._records["embed"][slot])
+
+    def put(self, key: bytes, embed: np.ndarray):
+        """
+        Stores an embedding, evicting the least recently used entry if the cache is full.
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            if len(self._slots) < len(self._records):
+                slot = int(np.argmin(self._records["last_used"] != 0))
+            else:
+                slot = int(np.argmin(self._records["last_used"]))
+                del self._slots[self._records["key"][slot].tobytes()]
+            self._records["key"][slot] = np.frombuffer(key, dtype=np.uint8)
+            self._slots[key] = slot
+        self._records["embed"][slot] = embed
+        self._touch(slot)
+
+    def flush(self):
+        self._records.flush()
+
+
+def open_cache(cache_dir: Path, max_bytes=64 * 1024 ** 2) -> EmbeddingCache:
+    """
+    Returns the process-wide EmbeddingCache for this directory, opening it on first use.
+    """
+    cache_dir = Path(cache_dir).resolve()
+    if cache_dir not in _caches:
+        _caches[cache_dir] = EmbeddingCache(cache_dir, max_bytes)
+    return _caches[cache_dir]
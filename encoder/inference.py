@@ -1,178 +1,540 @@
-from encoder.params_data import *
-from encoder.model import SpeakerEncoder
-from encoder.audio import preprocess_wav   # We want to expose this function from here
-from matplotlib import cm
-from encoder import audio
-from pathlib import Path
-import numpy as np
-import torch
-
-_model = None # type: SpeakerEncoder
-_device = None # type: torch.device
-
-
-def load_model(weights_fpath: Path, device=None):
-    """
-    Loads the model in memory. If this function is not explicitely called, it will be run on the
-    first call to embed_frames() with the default weights file.
-
-    :param weights_fpath: the path to saved model weights.
-    :param device: either a torch device or the name of a torch device (e.g. "cpu", "cuda"). The
-    model will be loaded and will run on this device. Outputs will however always be on the cpu.
-    If None, will default to your GPU if it"s available, otherwise your CPU.
-    """
-    # TODO: I think the slow loading of the encoder might have something to do with the device it
-    #   was saved on. Worth investigating.
-    global _model, _device
-    if device is None:
-        _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    elif isinstance(device, str):
-        _device = torch.device(device)
-    _model = SpeakerEncoder(_device, torch.device("cpu"))
-    checkpoint = torch.load(weights_fpath, _device)
-    _model.load_state_dict(checkpoint["model_state"])
-    _model.eval()
-    print("Loaded encoder \"%s\" trained to step %d" % (weights_fpath.name, checkpoint["step"]))
-
-
-def is_loaded():
-    return _model is not None
-
-
-def embed_frames_batch(frames_batch):
-    """
-    Computes embeddings for a batch of mel spectrogram.
-
-    :param frames_batch: a batch mel of spectrogram as a numpy array of float32 of shape
-    (batch_size, n_frames, n_channels)
-    :return: the embeddings as a numpy array of float32 of shape (batch_size, model_embedding_size)
-    """
-    if _model is None:
-        raise Exception("Model was not loaded. Call load_model() before inference.")
-
-    frames = torch.from_numpy(frames_batch).to(_device)
-    embed = _model.forward(frames).detach().cpu().numpy()
-    return embed
-
-
-def compute_partial_slices(n_samples, partial_utterance_n_frames=partials_n_frames,
-                           min_pad_coverage=0.75, overlap=0.5):
-    """
-    Computes where to split an utterance waveform and its corresponding mel spectrogram to obtain
-    partial utterances of <partial_utterance_n_frames> each. Both the waveform and the mel
-    spectrogram slices are returned, so as to make each partial utterance waveform correspond to
-    its spectrogram. This function assumes that the mel spectrogram parameters used are those
-    defined in params_data.py.
-
-    The returned ranges may be indexing further than the length of the waveform. It is
-    recommended that you pad the waveform with zeros up to wave_slices[-1].stop.
-
-    :param n_samples: the number of samples in the waveform
-    :param partial_utterance_n_frames: the number of mel spectrogram frames in each partial
-    utterance
-    :param min_pad_coverage: when reaching the last partial utterance, it may or may not have
-    enough frames. If at least <min_pad_coverage> of <partial_utterance_n_frames> are present,
-    then the last partial utterance will be considered, as if we padded the audio. Otherwise,
-    it will be discarded, as if we trimmed the audio. If there aren't enough frames for 1 partial
-    utterance, this parameter is ignored so that the function always returns at least 1 slice.
-    :param overlap: by how much the partial utterance should overlap. If set to 0, the partial
-    utterances are entirely disjoint.
-    :return: the waveform slices and mel spectrogram slices as lists of array slices. Index
-    respectively the waveform and the mel spectrogram with these slices to obtain the partial
-    utterances.
-    """
-    assert 0 <= overlap < 1
-    assert 0 < min_pad_coverage <= 1
-
-    samples_per_frame = int((sampling_rate * mel_window_step / 1000))
-    n_frames = int(np.ceil((n_samples + 1) / samples_per_frame))
-    frame_step = max(int(np.round(partial_utterance_n_frames * (1 - overlap))), 1)
-
-    # Compute the slices
-    wav_slices, mel_slices = [], []
-    steps = max(1, n_frames - partial_utterance_n_frames + frame_step + 1)
-    for i in range(0, steps, frame_step):
-        mel_range = np.array([i, i + partial_utterance_n_frames])
-        wav_range = mel_range * samples_per_frame
-        mel_slices.append(slice(*mel_range))
-        wav_slices.append(slice(*wav_range))
-
-    # Evaluate whether extra padding is warranted or not
-    last_wav_range = wav_slices[-1]
-    coverage = (n_samples - last_wav_range.start) / (last_wav_range.stop - last_wav_range.start)
-    if coverage < min_pad_coverage and len(mel_slices) > 1:
-        mel_slices = mel_slices[:-1]
-        wav_slices = wav_slices[:-1]
-
-    return wav_slices, mel_slices
-
-
-def embed_utterance(wav, using_partials=True, return_partials=False, **kwargs):
-    """
-    Computes an embedding for a single utterance.
-
-    # TODO: handle multiple wavs to benefit from batching on GPU
-    :param wav: a preprocessed (see audio.py) utterance waveform as a numpy array of float32
-    :param using_partials: if True, then the utterance is split in partial utterances of
-    <partial_utterance_n_frames> frames and the utterance embedding is computed from their
-    normalized average. If False, the utterance is instead computed from feeding the entire
-    spectogram to the network.
-    :param return_partials: if True, the partial embeddings will also be returned along with the
-    wav slices that correspond to the partial embeddings.
-    :param kwargs: additional arguments to compute_partial_splits()
-    :return: the embedding as a numpy array of float32 of shape (model_embedding_size,). If
-    <return_partials> is True, the partial utterances as a numpy array of float32 of shape
-    (n_partials, model_embedding_size) and the wav partials as a list of slices will also be
-    returned. If <using_partials> is simultaneously set to False, both these values will be None
-    instead.
-    """
-    # Process the entire utterance if not using partials
-    if not using_partials:
-        frames = audio.wav_to_mel_spectrogram(wav)
-        embed = embed_frames_batch(frames[None, ...])[0]
-        if return_partials:
-            return embed, None, None
-        return embed
-
-    # Compute where to split the utterance into partials and pad if necessary
-    wave_slices, mel_slices = compute_partial_slices(len(wav), **kwargs)
-    max_wave_length = wave_slices[-1].stop
-    if max_wave_length >= len(wav):
-        wav = np.pad(wav, (0, max_wave_length - len(wav)), "constant")
-
-    # Split the utterance into partials
-    frames = audio.wav_to_mel_spectrogram(wav)
-    frames_batch = np.array([frames[s] for s in mel_slices])
-    partial_embeds = embed_frames_batch(frames_batch)
-
-    # Compute the utterance embedding from the partial embeddings
-    raw_embed = np.mean(partial_embeds, axis=0)
-    embed = raw_embed / np.linalg.norm(raw_embed, 2)
-
-    if return_partials:
-        return embed, partial_embeds, wave_slices
-    return embed
-
-
-def embed_speaker(wavs, **kwargs):
-    raise NotImplemented()
-
-
-def plot_embedding_as_heatmap(embed, ax=None, title="", shape=None, color_range=(0, 0.30)):
-    import matplotlib.pyplot as plt
-    if ax is None:
-        ax = plt.gca()
-
-    if shape is None:
-        height = int(np.sqrt(len(embed)))
-        shape = (height, -1)
-    embed = embed.reshape(shape)
-
-    cmap = cm.get_cmap()
-    mappable = ax.imshow(embed, cmap=cmap)
-    cbar = plt.colorbar(mappable, ax=ax, fraction=0.046, pad=0.04)
-    sm = cm.ScalarMappable(cmap=cmap)
-    sm.set_clim(*color_range)
-
-    ax.set_xticks([]), ax.set_yticks([])
-    ax.set_title(title)
+from encoder.params_data import *
+from encoder.params_model import model_embedding_size
+from encoder.model import SpeakerEncoder
+from encoder.audio import preprocess_wav   # We want to expose this function from here
+from matplotlib import cm
+from encoder import audio
+from numpy.lib.stride_tricks import as_strided
+from pathlib import Path
+import numpy as np
+import torch
+
+_model = None # type: SpeakerEncoder
+_device = None # type: torch.device
+
+
+def load_model(weights_fpath: Path, device=None):
+    """
+    Loads the model in memory. If this function is not explicitely called, it will be run on the
+    first call to embed_frames() with the default weights file.
+
+    :param weights_fpath: the path to saved model weights.
+    :param device: either a torch device or the name of a torch device (e.g. "cpu", "cuda"). The
+    model will be loaded and will run on this device. Outputs will however always be on the cpu.
+    If None, will default to your GPU if it"s available, otherwise your CPU.
+    """
+    # TODO: I think the slow loading of the encoder might have something to do with the device it
+    #   was saved on. Worth investigating.
+    global _model, _device
+    if device is None:
+        _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    elif isinstance(device, str):
+        _device = torch.device(device)
+    else:
+        _device = device
+    _model = SpeakerEncoder(_device, torch.device("cpu"))
+    checkpoint = torch.load(weights_fpath, _device)
+    _model.load_state_dict(checkpoint["model_state"])
+    _model.eval()
+    print("Loaded encoder \"%s\" trained to step %d" % (weights_fpath.name, checkpoint["step"]))
+    return _model
+
+
+def set_model(model: SpeakerEncoder, device: torch.device):
+    """
+    Makes an already loaded model the one used for inference, without reading its weights from
+    disk again. This is how utils.model_registry swaps between warm encoders.
+    """
+    global _model, _device
+    _model = model
+    _device = device
+
+
+def is_loaded():
+    return _model is not None
+
+
+def embed_frames_batch(frames_batch):
+    """
+    Computes embeddings for a batch of mel spectrogram.
+
+    :param frames_batch: a batch mel of spectrogram as a numpy array of float32 of shape
+    (batch_size, n_frames, n_channels)
+    :return: the embeddings as a numpy array of float32 of shape (batch_size, model_embedding_size)
+    """
+    if _model is None:
+        raise Exception("Model was not loaded. Call load_model() before inference.")
+
+    frames = torch.from_numpy(frames_batch).to(_device)
+    embed = _model.forward(frames).detach().cpu().numpy()
+    return embed
+
+
+def compute_partial_slices(n_samples, partial_utterance_n_frames=partials_n_frames,
+                           min_pad_coverage=0.75, overlap=0.5):
+    """
+    Computes where to split an utterance waveform and its corresponding mel spectrogram to obtain
+    partial utterances of <partial_utterance_n_frames> each. Both the waveform and the mel
+    spectrogram slices are returned, so as to make each partial utterance waveform correspond to
+    its spectrogram. This function assumes that the mel spectrogram parameters used are those
+    defined in params_data.py.
+
+    The returned ranges may be indexing further than the length of the waveform. It is
+    recommended that you pad the waveform with zeros up to wave_slices[-1].stop.
+
+    :param n_samples: the number of samples in the waveform
+    :param partial_utterance_n_frames: the number of mel spectrogram frames in each partial
+    utterance
+    :param min_pad_coverage: when reaching the last partial utterance, it may or may not have
+    enough frames. If at least <min_pad_coverage> of <partial_utterance_n_frames> are present,
+    then the last partial utterance will be considered, as if we padded the audio. Otherwise,
+    it will be discarded, as if we trimmed the audio. If there aren't enough frames for 1 partial
+    utterance, this parameter is ignored so that the function always returns at least 1 slice.
+    :param overlap: by how much the partial utterance should overlap. If set to 0, the partial
+    utterances are entirely disjoint.
+    :return: the waveform slices and mel spectrogram slices as lists of array slices. Index
+    respectively the waveform and the mel spectrogram with these slices to obtain the partial
+    utterances.
+    """
+    samples_per_frame = int((sampling_rate * mel_window_step / 1000))
+    starts, _ = _partial_starts(n_samples, partial_utterance_n_frames, min_pad_coverage, overlap)
+    mel_slices = [slice(start, start + partial_utterance_n_frames) for start in starts.tolist()]
+    wav_slices = [slice(s.start * samples_per_frame, s.stop * samples_per_frame)
+                  for s in mel_slices]
+    return wav_slices, mel_slices
+
+
+def _partial_starts(n_samples, partial_utterance_n_frames=partials_n_frames,
+                    min_pad_coverage=0.75, overlap=0.5):
+    """
+    Computes the first frame of each partial utterance, see compute_partial_slices().
+
+    :return: the first frames as a numpy array of ints, and the step in frames between them
+    """
+    assert 0 <= overlap < 1
+    assert 0 < min_pad_coverage <= 1
+
+    samples_per_frame = int((sampling_rate * mel_window_step / 1000))
+    n_frames = int(np.ceil((n_samples + 1) / samples_per_frame))
+    frame_step = max(int(np.round(partial_utterance_n_frames * (1 - overlap))), 1)
+
+    # Compute the slices
+    steps = max(1, n_frames - partial_utterance_n_frames + frame_step + 1)
+    starts = np.arange(0, steps, frame_step)
+
+    # Evaluate whether extra padding is warranted or not
+    coverage = (n_samples - starts[-1] * samples_per_frame) / \
+               (partial_utterance_n_frames * samples_per_frame)
+    if coverage < min_pad_coverage and len(starts) > 1:
+        starts = starts[:-1]
+
+    return starts, frame_step
+
+
+def compute_partial_frames(wav, **kwargs):
+    """
+    Computes the mel spectrograms of the partial utterances of a waveform, as embed_utterance()
+    does before feeding them to the network.
+
+    :param wav: a preprocessed (see audio.py) utterance waveform as a numpy array of float32
+    :param kwargs: additional arguments to compute_partial_splits()
+    :return: the partial utterances as a numpy array of float32 of shape (n_partials,
+    partial_utterance_n_frames, mel_n_channels) and the wav partials as a list of slices. The
+    partial utterances are a view on the spectrogram, copy them before modifying them.
+    """
+    # Compute where to split the utterance into partials and pad if necessary
+    wave_slices, mel_slices = compute_partial_slices(len(wav), **kwargs)
+    max_wave_length = wave_slices[-1].stop
+    if max_wave_length >= len(wav):
+        wav = np.pad(wav, (0, max_wave_length - len(wav)), "constant")
+
+    # Split the utterance into partials. The partials overlap, so rather than copying each of
+    # them, they are taken as a strided view on the spectrogram.
+    frames = audio.wav_to_mel_spectrogram(wav)
+    n_partial_frames = mel_slices[0].stop - mel_slices[0].start
+    frame_step = mel_slices[1].start - mel_slices[0].start if len(mel_slices) > 1 else 1
+    frame_stride, channel_stride = frames.strides
+    frames_batch = as_strided(frames, shape=(len(mel_slices), n_partial_frames, frames.shape[1]),
+                              strides=(frame_step * frame_stride, frame_stride, channel_stride))
+    return frames_batch, wave_slices
+
+
+def embed_partial_frames(partials, max_batch_size=64):
+    """
+    Computes utterance embeddings from the partial utterances of several utterances at once. The
+    partials of all utterances are packed together into batches of up to <max_batch_size>
+    partials, so the number of forward passes depends on the total number of partials rather
+    than on the number of utterances.
+
+    :param partials: a list of N arrays of partial utterances, as returned by
+    compute_partial_frames()
+    :param max_batch_size: the maximum number of partials per forward pass. Lower it if you run
+    out of memory, raise it for more throughput on GPU.
+    :return: the embeddings as a numpy array of float32 of shape (N, model_embedding_size)
+    """
+    if len(partials) == 0:
+        raise ValueError("Cannot compute embeddings without any utterance")
+    counts = np.array([len(p) for p in partials])
+    if not counts.all():
+        raise ValueError("Utterance %d has no partial utterances" % np.argmin(counts))
+    frames = np.concatenate(partials)
+    partial_embeds = np.concatenate([embed_frames_batch(frames[i:i + max_batch_size])
+                                     for i in range(0, len(frames), max_batch_size)])
+
+    # Each utterance embedding is the normalized average of its partial embeddings
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    raw_embeds = np.add.reduceat(partial_embeds, starts, axis=0) / counts[:, None].astype(np.float32)
+    return raw_embeds / np.linalg.norm(raw_embeds, 2, axis=1, keepdims=True)
+
+
+def embed_utterance(wav, using_partials=True, return_partials=False, **kwargs):
+    """
+    Computes an embedding for a single utterance. See embed_utterances() to embed several
+    utterances at once.
+
+    :param wav: a preprocessed (see audio.py) utterance waveform as a numpy array of float32
+    :param using_partials: if True, then the utterance is split in partial utterances of
+    <partial_utterance_n_frames> frames and the utterance embedding is computed from their
+    normalized average. If False, the utterance is instead computed from feeding the entire
+    spectogram to the network.
+    :param return_partials: if True, the partial embeddings will also be returned along with the
+    wav slices that correspond to the partial embeddings.
+    :param kwargs: additional arguments to compute_partial_splits()
+    :return: the embedding as a numpy array of float32 of shape (model_embedding_size,). If
+    <return_partials> is True, the partial utterances as a numpy array of float32 of shape
+    (n_partials, model_embedding_size) and the wav partials as a list of slices will also be
+    returned. If <using_partials> is simultaneously set to False, both these values will be None
+    instead.
+    """
+    # Process the entire utterance if not using partials
+    if not using_partials:
+        frames = audio.wav_to_mel_spectrogram(wav)
+        embed = embed_frames_batch(frames[None, ...])[0]
+        if return_partials:
+            return embed, None, None
+        return embed
+
+    # Split the utterance into partials and embed them
+    frames_batch, wave_slices = compute_partial_frames(wav, **kwargs)
+    partial_embeds = embed_frames_batch(frames_batch)
+
+    # Compute the utterance embedding from the partial embeddings
+    raw_embed = np.mean(partial_embeds, axis=0)
+    embed = raw_embed / np.linalg.norm(raw_embed, 2)
+
+    if return_partials:
+        return embed, partial_embeds, wave_slices
+    return embed
+
+
+def embed_utterance_until_converged(wav, tolerance=1e-3, max_partials=None, step_partials=4,
+                                    **kwargs):
+    """
+    Computes an embedding for a single utterance like embed_utterance(), but embeds the partial
+    utterances a few at a time and stops as soon as the embedding stops changing. On long
+    recordings this only processes the beginning of the audio, and the memory used does not
+    depend on the length of the recording.
+
+    :param wav: a preprocessed (see audio.py) utterance waveform as a numpy array of float32
+    :param tolerance: the embedding is considered converged once adding <step_partials> more
+    partials changes it by less than this cosine distance. If 0, all partials are used.
+    :param max_partials: if not None, the maximum number of partials to use
+    :param step_partials: how many partials to embed between two convergence checks
+    :param kwargs: additional arguments to compute_partial_splits()
+    :return: the embedding as a numpy array of float32 of shape (model_embedding_size,) and the
+    number of partial utterances it was computed from
+    """
+    wave_slices, mel_slices = compute_partial_slices(len(wav), **kwargs)
+    if max_partials is not None:
+        mel_slices = mel_slices[:max_partials]
+    samples_per_frame = int((sampling_rate * mel_window_step / 1000))
+    half_window = int(sampling_rate * mel_window_length / 1000) // 2
+    padded_length = max(len(wav), wave_slices[-1].stop)
+
+    embed_sum = np.zeros(model_embedding_size, dtype=np.float64)
+    embed = None
+    n_partials = 0
+    while n_partials < len(mel_slices):
+        step_slices = mel_slices[n_partials:n_partials + step_partials]
+
+        # Only compute the spectrogram of the audio these partials cover, zero-padding the end of
+        # the audio like embed_utterance() does
+        first_frame = max(0, step_slices[0].start - audio.mel_context_frames())
+        start = first_frame * samples_per_frame
+        end = min(step_slices[-1].stop * samples_per_frame + half_window, padded_length)
+        segment = wav[start:end]
+        if len(segment) < end - start:
+            segment = np.pad(segment, (0, end - start - len(segment)), "constant")
+        frames_batch = np.array([audio.wav_to_mel_frames(segment, s.start - first_frame,
+                                                         s.stop - first_frame)
+                                 for s in step_slices])
+
+        embed_sum += embed_frames_batch(frames_batch).sum(axis=0)
+        n_partials += len(step_slices)
+        previous_embed = embed
+        embed = (embed_sum / np.linalg.norm(embed_sum, 2)).astype(np.float32)
+        # The dot product of unit vectors can round above 1: a tolerance of 0 never stops early
+        if tolerance > 0 and previous_embed is not None and \
+                1 - np.dot(embed, previous_embed) < tolerance:
+            break
+
+    return embed, n_partials
+
+
+def embed_utterances(wavs, max_batch_size=64, **kwargs):
+    """
+    Computes an embedding for each of several utterances, batching the partial utterances of all
+    of them together. The embeddings are the same as those of embed_utterance().
+
+    :param wavs: a list of N preprocessed (see audio.py) utterance waveforms as numpy arrays of
+    float32
+    :param max_batch_size: the maximum number of partial utterances per forward pass
+    :param kwargs: additional arguments to compute_partial_splits()
+    :return: the embeddings as a numpy array of float32 of shape (N, model_embedding_size)
+    """
+    partials = [compute_partial_frames(wav, **kwargs)[0] for wav in wavs]
+    return embed_partial_frames(partials, max_batch_size)
+
+
+def embed_speaker(wavs, max_batch_size=64, return_utterances=False, **kwargs):
+    """
+    Computes a speaker embedding from several utterances of the same speaker, as the normalized
+    centroid of their utterance embeddings.
+
+    :param wavs: a list of preprocessed (see audio.py) utterance waveforms as numpy arrays of
+    float32
+    :param max_batch_size: the maximum number of partial utterances per forward pass
+    :param return_utterances: if True, the utterance embeddings will also be returned
+    :param kwargs: additional arguments to compute_partial_splits()
+    :return: the speaker embedding as a numpy array of float32 of shape (model_embedding_size,).
+    If <return_utterances> is True, the utterance embeddings as a numpy array of float32 of
+    shape (n_utterances, model_embedding_size) will also be returned.
+    """
+    utterance_embeds = embed_utterances(wavs, max_batch_size, **kwargs)
+    raw_embed = np.mean(utterance_embeds, axis=0)
+    embed = raw_embed / np.linalg.norm(raw_embed, 2)
+
+    if return_utterances:
+        return embed, utterance_embeds
+    return embed
+
+
+class StreamingSpeakerEmbedder:
+    """
+    Computes an utterance embedding incrementally from chunks of audio as they arrive, e.g. from
+    a microphone. Voice detection and mel extraction run on each chunk as it is pushed, and each
+    partial utterance is embedded as soon as all of its frames are available, so the embedding
+    is ready as soon as the speaker stops talking.
+
+    Without silence trimming, once finish() is called, the embedding is the one
+    embed_utterance() computes on the preprocessed concatenation of the chunks, except for the
+    volume normalization which can only be based on the audio received so far. With silence
+    trimming, the VAD only sees the last <vad_history> windows before each chunk, so the audio
+    it keeps, and thus the partial utterances and the embedding, only approximate those of
+    embed_utterance() and depend on how the audio is split into chunks. The numpy backend
+    estimates its noise floor over that history, so it differs more than the webrtc one.
+
+    Usage:
+        embedder = StreamingSpeakerEmbedder()
+        for chunk in chunks:
+            embedder.push(chunk)
+            current_embed = embedder.embedding
+        embed = embedder.finish()
+    """
+    def __init__(self, normalize=True, trim_silence=True, vad=None, overlap=0.5,
+                 min_pad_coverage=0.75, vad_history=100):
+        """
+        :param normalize: whether to normalize the volume, as preprocess_wav() does
+        :param trim_silence: whether to trim long silences, as preprocess_wav() does
+        :param vad: the VAD backend, see audio.trim_long_silences()
+        :param overlap: the overlap between partial utterances, see compute_partial_slices()
+        :param min_pad_coverage: see compute_partial_slices()
+        :param vad_history: the number of past VAD windows to run the VAD over again with new
+        audio, so that it has some context
+        """
+        self.normalize = normalize
+        self.vad = vad or vad_backend
+        self.trim_silence = trim_silence and (audio.webrtcvad is not None or self.vad == "numpy")
+        self.overlap = overlap
+        self.min_pad_coverage = min_pad_coverage
+        self.vad_history = vad_history
+
+        self._samples_per_window = (vad_window_length * sampling_rate) // 1000
+        self._hop_length = int(sampling_rate * mel_window_step / 1000)
+        self._half_window = int(sampling_rate * mel_window_length / 1000) // 2
+        self._frame_step = max(int(np.round(partials_n_frames * (1 - overlap))), 1)
+
+        # The mask of a VAD window depends on the flags of the windows around it, through the
+        # moving average and the dilation in audio.compute_audio_mask()
+        dilation = vad_max_silence_length + 1
+        self._mask_lookbehind = (vad_moving_average_width - 1) // 2 + dilation // 2
+        self._mask_lookahead = vad_moving_average_width // 2 + (dilation - 1) // 2
+        self.reset()
+
+    def reset(self):
+        """
+        Discards all audio received so far, to start a new enrollment.
+        """
+        # Volume statistics of all the audio received
+        self._sum_squares = 0.
+        self._n_samples = 0
+
+        # Voice detection: samples short of a full window, recent windows kept as context for the
+        # VAD, and the flags and samples of windows whose mask isn't known yet
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._history = np.zeros(0, dtype=np.float32)
+        self._flags = np.zeros(0, dtype=bool)
+        self._n_flags_context = 0
+        self._undecided = np.zeros(0, dtype=np.float32)
+
+        # Voiced samples from <_voiced_offset> frames into the voiced audio, and the first frame of
+        # the next partial utterance
+        self._voiced = np.zeros(0, dtype=np.float32)
+        self._voiced_offset = 0
+        self._next_partial = 0
+
+        self._embed_sum = np.zeros(model_embedding_size, dtype=np.float64)
+        self.n_partials = 0
+        self.finished = False
+
+    @property
+    def embedding(self):
+        """
+        The embedding of the partial utterances processed so far, or None if there are none yet.
+        """
+        if self.n_partials == 0:
+            return None
+        return (self._embed_sum / np.linalg.norm(self._embed_sum, 2)).astype(np.float32)
+
+    def push(self, chunk):
+        """
+        Processes a chunk of audio.
+
+        :param chunk: the next samples of the utterance as a numpy array of floats, at the
+        sampling rate defined in params_data.py
+        :return: the number of partial utterances embedded from this chunk
+        """
+        if self.finished:
+            raise RuntimeError("Call reset() before pushing audio again.")
+        chunk = np.asarray(chunk, dtype=np.float32)
+        self._sum_squares += float(np.dot(chunk, chunk))
+        self._n_samples += len(chunk)
+
+        if not self.trim_silence:
+            self._add_voiced(chunk)
+        else:
+            self._pending = np.concatenate((self._pending, chunk))
+            n_new = (len(self._pending) // self._samples_per_window) * self._samples_per_window
+            if n_new:
+                self._detect_voice(self._pending[:n_new])
+                self._pending = self._pending[n_new:]
+                self._decide_windows(final=False)
+        return self._embed_partials(final=False)
+
+    def finish(self):
+        """
+        Processes the end of the utterance. The samples short of a full VAD window are dropped,
+        as in audio.trim_long_silences().
+
+        :return: the final embedding, or None if no voice was detected
+        """
+        if not self.finished:
+            if self.trim_silence:
+                self._decide_windows(final=True)
+            self._embed_partials(final=True)
+            self.finished = True
+        return self.embedding
+
+    def _gain(self):
+        # The volume normalization of audio.preprocess_wav(), based on the audio received so far
+        if not self.normalize or self._sum_squares == 0:
+            return 1.
+        dBFS_change = audio_norm_target_dBFS - 10 * np.log10(self._sum_squares / self._n_samples)
+        return 10 ** (dBFS_change / 20) if dBFS_change > 0 else 1.
+
+    def _detect_voice(self, windows):
+        # Run the VAD again over a few past windows so that it has some context
+        n_new = len(windows) // self._samples_per_window
+        wav = np.concatenate((self._history, windows))
+        flags = audio.compute_voice_flags(wav * self._gain(), self.vad)[-n_new:]
+        self._history = wav[-self.vad_history * self._samples_per_window:]
+
+        self._flags = np.concatenate((self._flags, flags))
+        self._undecided = np.concatenate((self._undecided, windows))
+
+    def _decide_windows(self, final):
+        # Computes the audio mask of the windows for which enough flags are known
+        n_undecided = len(self._flags) - self._n_flags_context
+        n_decided = n_undecided if final else max(0, n_undecided - self._mask_lookahead)
+        if n_decided == 0:
+            return
+        mask = audio.compute_audio_mask(self._flags)
+        mask = mask[self._n_flags_context:self._n_flags_context + n_decided]
+        n_samples = n_decided * self._samples_per_window
+        windows = self._undecided[:n_samples].reshape(n_decided, self._samples_per_window)
+        self._add_voiced(windows[mask].ravel())
+
+        self._undecided = self._undecided[n_samples:]
+        n_context = min(self._n_flags_context + n_decided, self._mask_lookbehind)
+        self._flags = self._flags[self._n_flags_context + n_decided - n_context:]
+        self._n_flags_context = n_context
+
+    def _add_voiced(self, samples):
+        self._voiced = np.concatenate((self._voiced, samples))
+
+    def _embed_partials(self, final):
+        n_voiced = self._voiced_offset * self._hop_length + len(self._voiced)
+        if final:
+            # Same partials as embed_utterance(), padding the end of the audio if necessary
+            if n_voiced == 0:
+                return 0
+            wave_slices, mel_slices = compute_partial_slices(n_voiced, partials_n_frames,
+                                                             self.min_pad_coverage, self.overlap)
+            starts = [s.start for s in mel_slices if s.start >= self._next_partial]
+            pad = wave_slices[-1].stop - n_voiced
+            if pad > 0:
+                self._voiced = np.pad(self._voiced, (0, pad), "constant")
+        else:
+            # Partials whose frames only depend on samples already received
+            n_frames_ready = (n_voiced - self._half_window) // self._hop_length + 1
+            n_ready = (n_frames_ready - partials_n_frames - self._next_partial) // self._frame_step + 1
+            starts = [self._next_partial + i * self._frame_step for i in range(max(0, n_ready))]
+        if not starts:
+            return 0
+
+        offset = self._voiced_offset
+        frames_batch = np.array([audio.wav_to_mel_frames(self._voiced, start - offset,
+                                                         start - offset + partials_n_frames)
+                                 for start in starts])
+        # The mel spectrogram is a power spectrogram, so the volume gain applies squared
+        frames_batch *= self._gain() ** 2
+        partial_embeds = embed_frames_batch(frames_batch)
+        self._embed_sum += partial_embeds.sum(axis=0)
+        self.n_partials += len(starts)
+
+        # Drop the samples that no future partial depends on
+        self._next_partial = starts[-1] + self._frame_step
+        new_offset = max(offset, self._next_partial - audio.mel_context_frames())
+        self._voiced = self._voiced[(new_offset - offset) * self._hop_length:]
+        self._voiced_offset = new_offset
+        return len(starts)
+
+
+def plot_embedding_as_heatmap(embed, ax=None, title="", shape=None, color_range=(0, 0.30)):
+    import matplotlib.pyplot as plt
+    if ax is None:
+        ax = plt.gca()
+
+    if shape is None:
+        height = int(np.sqrt(len(embed)))
+        shape = (height, -1)
+    embed = embed.reshape(shape)
+
+    cmap = cm.get_cmap()
+    mappable = ax.imshow(embed, cmap=cmap)
+    cbar = plt.colorbar(mappable, ax=ax, fraction=0.046, pad=0.04)
+    sm = cm.ScalarMappable(cmap=cmap)
+    sm.set_clim(*color_range)
+
+    ax.set_xticks([]), ax.set_yticks([])
+    ax.set_title(title)
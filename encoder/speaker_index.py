@@ -0,0 +1,226 @@
+from encoder.params_model import model_embedding_size
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+
+class SpeakerIndex:
+    """
+    A similarity index over speaker embeddings, to find which stored voices are closest to a new
+    one (e.g. to dedupe uploads to a voice library).
+
+    Scores are cosine similarities. Search is exact by default: one matrix product of the
+    queries with all stored embeddings. After train(), the embeddings are also partitioned into
+    lists around k-means centroids (IVF), and search(..., n_probe=n) only scores the embeddings
+    of the n lists whose centroids are closest to each query, which is sub-linear in the number
+    of voices at the cost of possibly missing some neighbours.
+
+    Usage:
+        index = SpeakerIndex()
+        index.add(["alice", "bob"], np.stack([embed_alice, embed_bob]))
+        ids, scores = index.search(embed_query[None], k=1)
+        index.save(Path("voices_index"))
+        index = SpeakerIndex.load(Path("voices_index"))
+    """
+    def __init__(self, dim=model_embedding_size):
+        self.dim = dim
+        self._embeds = np.zeros((0, dim), dtype=np.float32)
+        self._ids = []
+        self._rows = {}         # id -> row in self._embeds
+        self._size = 0
+        self._centroids = None  # (n_lists, dim) after train()
+        self._lists = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, id):
+        return id in self._rows
+
+    @property
+    def ids(self) -> List:
+        return list(self._ids)
+
+    @property
+    def is_trained(self):
+        return self._centroids is not None
+
+    @staticmethod
+    def _normalize(embeds):
+        embeds = np.asarray(embeds, dtype=np.float32)
+        if embeds.ndim == 1:
+            embeds = embeds[None]
+        return embeds / (np.linalg.norm(embeds, axis=1, keepdims=True) + 1e-12)
+
+    def _reserve(self, size):
+        # Grow the storage geometrically. This also makes a memory-mapped index writable.
+        if size <= len(self._embeds) and self._embeds.flags.writeable:
+            return
+        capacity = max(size, 2 * len(self._embeds), 1024)
+        embeds = np.zeros((capacity, self.dim), dtype=np.float32)
+        embeds[:self._size] = self._embeds[:self._size]
+        lists = np.zeros(capacity, dtype=np.int32)
+        lists[:self._size] = self._lists[:self._size]
+        self._embeds, self._lists = embeds, lists
+
+    def add(self, ids: List, embeds: np.ndarray):
+        """
+        Adds embeddings to the index. Ids that are already present have their embedding replaced,
+        and so do ids repeated in <ids>: the last of their embeddings is kept.
+
+        :param ids: a list of N ids (e.g. voice names). Use either only strings or only ints, so
+        that the index can be saved.
+        :param embeds: the embeddings as a numpy array of shape (N, dim)
+        """
+        embeds = self._normalize(embeds)
+        if len(ids) != len(embeds):
+            raise ValueError("Got %d ids for %d embeddings" % (len(ids), len(embeds)))
+        last_rows = {id: i for i, id in enumerate(ids)}
+        if len(last_rows) != len(ids):
+            rows = sorted(last_rows.values())
+            ids, embeds = [ids[i] for i in rows], embeds[rows]
+        self.remove([id for id in ids if id in self._rows])
+
+        start = self._size
+        self._reserve(start + len(ids))
+        self._embeds[start:start + len(ids)] = embeds
+        if self.is_trained:
+            self._lists[start:start + len(ids)] = np.argmax(embeds @ self._centroids.T, axis=1)
+        for i, id in enumerate(ids):
+            self._rows[id] = start + i
+        self._ids.extend(ids)
+        self._size += len(ids)
+
+    def remove(self, ids: List):
+        """
+        Removes embeddings from the index. Ids that are not in the index are ignored.
+        """
+        for id in ids:
+            row = self._rows.pop(id, None)
+            if row is None:
+                continue
+            self._reserve(self._size)
+
+            # Move the last embedding into the freed row
+            last = self._size - 1
+            if row != last:
+                last_id = self._ids[last]
+                self._embeds[row] = self._embeds[last]
+                self._lists[row] = self._lists[last]
+                self._ids[row] = last_id
+                self._rows[last_id] = row
+            self._ids.pop()
+            self._size -= 1
+
+    def train(self, n_lists: Optional[int] = None, n_iter=10, seed=0):
+        """
+        Partitions the embeddings currently in the index with spherical k-means, enabling
+        approximate search. Embeddings added later are assigned to the closest existing list;
+        train again once the index has grown a lot.
+
+        :param n_lists: the number of lists. Defaults to the square root of the index size.
+        """
+        embeds = self._embeds[:self._size]
+        n_lists = n_lists or max(1, int(np.sqrt(self._size)))
+        if self._size < n_lists:
+            raise ValueError("Need at least %d embeddings to train %d lists" % (n_lists, n_lists))
+
+        rng = np.random.default_rng(seed)
+        centroids = embeds[rng.choice(self._size, n_lists, replace=False)]
+        for _ in range(n_iter):
+            assignments = np.argmax(embeds @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            lists, starts = np.unique(assignments[order], return_index=True)
+            # Lists that end up empty keep their previous centroid
+            sums = centroids.copy()
+            sums[lists] = np.add.reduceat(embeds[order], starts, axis=0)
+            centroids = self._normalize(sums)
+
+        self._centroids = centroids
+        self._reserve(self._size)
+        self._lists[:self._size] = np.argmax(embeds @ centroids.T, axis=1)
+
+    def search(self, queries: np.ndarray, k=5, n_probe: Optional[int] = None):
+        """
+        Finds the stored embeddings closest to each query.
+
+        :param queries: the query embeddings as a numpy array of shape (Q, dim) or (dim,)
+        :param k: the number of neighbours to return per query
+        :param n_probe: if the index is trained, the number of lists to search per query. None
+        searches all embeddings exactly.
+        :return: the ids of the neighbours as a list of Q lists of up to k ids, and their cosine
+        similarities as a numpy array of shape (Q, k), both sorted by decreasing similarity.
+        Missing neighbours (if the index or the probed lists hold fewer than k embeddings) have
+        an id of None and a similarity of -inf.
+        """
+        queries = self._normalize(queries)
+        embeds = self._embeds[:self._size]
+
+        if n_probe is None or not self.is_trained or n_probe >= len(self._centroids):
+            candidates = None
+            scores = queries @ embeds.T
+        else:
+            # Score only the embeddings in the lists probed by at least one query, and hide from
+            # each query those in lists it did not probe itself
+            probes = np.argpartition(-(queries @ self._centroids.T), n_probe - 1, axis=1)
+            probes = probes[:, :n_probe]
+            probed = np.zeros((len(queries), len(self._centroids)), dtype=bool)
+            np.put_along_axis(probed, probes, True, axis=1)
+            candidates = np.flatnonzero(np.any(probed, axis=0)[self._lists[:self._size]])
+            scores = queries @ embeds[candidates].T
+            scores[~probed[:, self._lists[candidates]]] = -np.inf
+
+        k_found = min(k, scores.shape[1])
+        if k_found < scores.shape[1]:
+            top = np.argpartition(scores, -k_found, axis=1)[:, -k_found:]
+        else:
+            top = np.broadcast_to(np.arange(k_found), (len(queries), k_found))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if candidates is not None:
+            top = candidates[top]
+
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_scores[:, :k_found] = top_scores
+        out_ids = [[self._ids[row] if score > -np.inf else None
+                    for row, score in zip(rows, row_scores)] + [None] * (k - k_found)
+                   for rows, row_scores in zip(top, top_scores)]
+        return out_ids, out_scores
+
+    def save(self, dirpath: Path):
+        """
+        Saves the index to a directory, in a format that load() can memory-map.
+        """
+        dirpath = Path(dirpath)
+        dirpath.mkdir(parents=True, exist_ok=True)
+        np.save(dirpath.joinpath("embeds.npy"), self._embeds[:self._size])
+        np.save(dirpath.joinpath("lists.npy"), self._lists[:self._size])
+        np.save(dirpath.joinpath("ids.npy"), np.array(self._ids), allow_pickle=False)
+        # Don't leave the centroids of a previous trained index behind for load() to find
+        centroids_fpath = dirpath.joinpath("centroids.npy")
+        if self.is_trained:
+            np.save(centroids_fpath, self._centroids)
+        elif centroids_fpath.exists():
+            centroids_fpath.unlink()
+
+    @classmethod
+    def load(cls, dirpath: Path, mmap=True) -> "SpeakerIndex":
+        """
+        Loads an index saved with save(). With mmap, the embeddings are memory-mapped rather than
+        read into memory; they are copied into memory on the first modification of the index.
+        """
+        dirpath = Path(dirpath)
+        mmap_mode = "r" if mmap else None
+        embeds = np.load(dirpath.joinpath("embeds.npy"), mmap_mode=mmap_mode)
+        index = cls(embeds.shape[1])
+        index._embeds = embeds
+        index._lists = np.load(dirpath.joinpath("lists.npy"), mmap_mode=mmap_mode)
+        index._ids = np.load(dirpath.joinpath("ids.npy")).tolist()
+        index._rows = {id: row for row, id in enumerate(index._ids)}
+        index._size = len(index._ids)
+        centroids_fpath = dirpath.joinpath("centroids.npy")
+        if centroids_fpath.exists():
+            index._centroids = np.load(centroids_fpath)
+        return index
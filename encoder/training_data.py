@@ -0,0 +1,172 @@
+"""
+Training data for fine-tuning the speaker encoder with the GE2E loss.
+
+precompute_speaker_shards() computes the mel spectrograms of a corpus once, into one
+memory-mapped shard per speaker. speaker_batch_loader() then samples batches of
+speakers_per_batch speakers x utterances_per_speaker utterances, each a random crop of
+partials_n_frames frames read straight from the shards, in background workers.
+
+Usage:
+    python -m encoder.training_data <corpus_dir> <shards_dir>
+
+    for inputs in speaker_batch_loader(Path(shards_dir)):
+        embeds = model(inputs.to(device))
+        embeds = embeds.view((speakers_per_batch, utterances_per_speaker, -1))
+        loss, eer = model.loss(embeds.to(loss_device))
+
+The corpus is expected to hold one directory of audio files per speaker.
+"""
+from encoder import audio
+from encoder.params_data import *
+from encoder.params_model import speakers_per_batch, utterances_per_speaker
+from pathlib import Path
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+from typing import List, Optional
+from utils.audio_ingest import AudioDecodeError, find_audio_files
+import argparse
+import json
+import multiprocessing
+import numpy as np
+import os
+import soundfile as sf
+import sys
+import torch
+
+
+def _compute_mel(fpath: Path):
+    # Runs in a worker process. Returns the mel spectrogram, or None and why the file is skipped.
+    # Files that can't be decoded are skipped, other errors are raised in the parent process.
+    try:
+        wav = audio.preprocess_wav(fpath)
+    except (sf.SoundFileError, AudioDecodeError) as e:
+        return None, "%s: %s" % (type(e).__name__, e)
+    if len(wav) == 0:
+        return None, "no speech detected"
+    return audio.wav_to_mel_spectrogram(wav), None
+
+
+def read_speakers(shards_dir: Path) -> List[dict]:
+    """
+    Reads the list of speakers of a shards directory. A last line left incomplete by an
+    interruption is removed from the file, so that the speakers appended next start on a line of
+    their own.
+    """
+    index_fpath = Path(shards_dir).joinpath("speakers.jsonl")
+    if not index_fpath.exists():
+        return []
+    with index_fpath.open("rb+") as f:
+        content = f.read()
+        complete = content[:content.rfind(b"\n") + 1]
+        if len(complete) != len(content):
+            f.truncate(len(complete))
+    return [json.loads(line) for line in complete.splitlines()]
+
+
+def precompute_speaker_shards(corpus_dir: Path, shards_dir: Path, n_workers=None):
+    """
+    Computes the mel spectrograms (see audio.wav_to_mel_spectrogram()) of all utterances of each
+    speaker directory in corpus_dir, and writes them concatenated along time to one shard per
+    speaker. Utterances shorter than partials_n_frames after preprocessing are skipped. Speakers
+    already in shards_dir are skipped, so an interrupted run can be resumed.
+    """
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    done = {s["speaker"] for s in read_speakers(shards_dir)}
+    speaker_dirs = [d for d in sorted(corpus_dir.iterdir()) if d.is_dir() and d.name not in done]
+    n_shards = len(done)
+
+    with multiprocessing.get_context("spawn").Pool(n_workers or os.cpu_count()) as pool:
+        for speaker_dir in speaker_dirs:
+            fpaths = find_audio_files(speaker_dir)
+            mels = []
+            for fpath, (mel, error) in zip(fpaths, pool.imap(_compute_mel, fpaths, chunksize=4)):
+                if error is not None:
+                    print("Skipping %s: %s" % (fpath, error), file=sys.stderr)
+                elif len(mel) >= partials_n_frames:
+                    mels.append(mel)
+            if not mels:
+                print("Skipping speaker %s: no usable utterance" % speaker_dir.name)
+                continue
+
+            lengths = np.array([len(m) for m in mels])
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            fname = "speaker_%05d.npy" % n_shards
+            np.save(shards_dir.joinpath(fname), np.concatenate(mels))
+            with shards_dir.joinpath("speakers.jsonl").open("a") as f:
+                f.write(json.dumps({"speaker": speaker_dir.name, "file": fname,
+                                    "starts": starts.tolist(), "lengths": lengths.tolist()}) + "\n")
+            n_shards += 1
+            print("Speaker %s: %d utterances" % (speaker_dir.name, len(mels)))
+
+
+class SpeakerBatches(IterableDataset):
+    """
+    An endless stream of GE2E batches, as float32 tensors of shape (speakers_per_batch *
+    utterances_per_speaker, partials_n_frames, mel_n_channels), grouped by speaker. Only speakers
+    with at least utterances_per_speaker utterances are sampled.
+    """
+    def __init__(self, shards_dir: Path, speakers_per_batch=speakers_per_batch,
+                 utterances_per_speaker=utterances_per_speaker, n_frames=partials_n_frames,
+                 seed: Optional[int] = None):
+        self.shards_dir = Path(shards_dir)
+        self.speakers_per_batch = speakers_per_batch
+        self.utterances_per_speaker = utterances_per_speaker
+        self.n_frames = n_frames
+        self.seed = seed
+        self.speakers = [s for s in read_speakers(self.shards_dir)
+                         if len(s["lengths"]) >= utterances_per_speaker]
+        if len(self.speakers) < speakers_per_batch:
+            raise ValueError("Need at least %d speakers with %d utterances, got %d" %
+                             (speakers_per_batch, utterances_per_speaker, len(self.speakers)))
+
+    def __iter__(self):
+        # Each worker memory-maps the shards itself and draws from its own random stream
+        worker = get_worker_info()
+        seed = self.seed if self.seed is not None else torch.initial_seed()
+        rng = np.random.default_rng([seed % 2 ** 32, worker.id if worker else 0])
+        shards = [np.load(self.shards_dir.joinpath(s["file"]), mmap_mode="r")
+                  for s in self.speakers]
+        starts = [np.array(s["starts"]) for s in self.speakers]
+        lengths = [np.array(s["lengths"]) for s in self.speakers]
+        frame_offsets = np.arange(self.n_frames)
+
+        while True:
+            batch = np.empty((self.speakers_per_batch, self.utterances_per_speaker, self.n_frames,
+                              mel_n_channels), dtype=np.float32)
+            speakers = rng.choice(len(self.speakers), self.speakers_per_batch, replace=False)
+            for i, speaker in enumerate(speakers):
+                utterances = rng.choice(len(lengths[speaker]), self.utterances_per_speaker,
+                                        replace=False)
+                # A random crop of each utterance, gathered from the shard in one read
+                crop_starts = starts[speaker][utterances] + rng.integers(
+                    0, lengths[speaker][utterances] - self.n_frames + 1)
+                batch[i] = shards[speaker][crop_starts[:, None] + frame_offsets]
+            yield torch.from_numpy(batch.reshape(-1, self.n_frames, mel_n_channels))
+
+
+def speaker_batch_loader(shards_dir: Path, speakers_per_batch=speakers_per_batch,
+                         utterances_per_speaker=utterances_per_speaker, num_workers=4,
+                         prefetch_factor=4, pin_memory=None, seed: Optional[int] = None):
+    """
+    Returns an endless DataLoader of GE2E batches (see SpeakerBatches) sampled by num_workers
+    background processes, each keeping up to prefetch_factor batches ready.
+
+    :param pin_memory: pins the batches for faster transfers to the GPU. Defaults to True when
+    CUDA is available.
+    """
+    dataset = SpeakerBatches(shards_dir, speakers_per_batch, utterances_per_speaker, seed=seed)
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    return DataLoader(dataset, batch_size=None, num_workers=num_workers,
+                      prefetch_factor=prefetch_factor if num_workers > 0 else None,
+                      pin_memory=pin_memory, persistent_workers=num_workers > 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute the mel spectrograms of a corpus for fine-tuning the encoder.")
+    parser.add_argument("corpus_dir", type=Path, help="Directory with one directory of audio "
+                                                      "files per speaker.")
+    parser.add_argument("shards_dir", type=Path, help="Output directory for the shards.")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    precompute_speaker_shards(args.corpus_dir, args.shards_dir, args.workers)
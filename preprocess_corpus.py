@@ -0,0 +1,263 @@
+"""
+Bulk preprocessing of a voice corpus into synthesizer mel spectrograms and speaker embeddings.
+
+Audio decoding and DSP run in a pool of worker processes. The parent batches the encoder
+inference over the partial utterances of many files at once and writes the results into shards:
+    mels_<k>.npy    the mel spectrograms of the shard, concatenated along time, of shape
+                    (total_frames, num_mels)
+    embeds_<k>.npy  the utterance embeddings, of shape (n_utterances, model_embedding_size)
+and appends one line per utterance to index.jsonl once its shard is complete. Running the
+command again resumes after the last complete shard.
+
+Usage:
+    python preprocess_corpus.py --corpus data/voices --out data/voices_preprocessed
+
+    corpus = PreprocessedCorpus(Path("data/voices_preprocessed"))
+    mel, embed = corpus[0]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import List
+import sys
+
+import numpy as np
+import soundfile as sf
+
+from encoder import audio as encoder_audio
+from encoder import inference as encoder_infer
+from encoder.params_data import sampling_rate as encoder_sampling_rate
+from synthesizer import audio as synthesizer_audio
+from synthesizer.hparams import hparams
+from synthesizer.inference import Synthesizer
+from utils.audio_ingest import AudioDecodeError, find_audio_files, load_audio, resample
+from utils.model_registry import registry
+
+
+def _process_file(fpath: Path):
+    """
+    Decodes an audio file and computes everything but the embedding. Runs in a worker process.
+
+    :return: the path, the duration of the audio in seconds, the encoder partial utterances and
+    the synthesizer mel spectrogram of shape (frames, num_mels), or the path, None and the error
+    message if the file can't be decoded or has no speech. Other errors are raised in the parent
+    process.
+    """
+    try:
+        wav, sr = load_audio(fpath, encoder_sampling_rate)
+    except (sf.SoundFileError, AudioDecodeError) as e:
+        return fpath, None, "%s: %s" % (type(e).__name__, e)
+    duration = len(wav) / sr
+
+    encoder_wav = encoder_audio.preprocess_wav(wav, sr)
+    if len(encoder_wav) == 0:
+        return fpath, None, "no speech detected"
+    partials, _ = encoder_infer.compute_partial_frames(encoder_wav)
+
+    synthesizer_wav = Synthesizer.preprocess_wav(resample(wav, sr, hparams.sample_rate))
+    mel = synthesizer_audio.melspectrogram(synthesizer_wav, hparams).astype(np.float32)
+    return fpath, duration, np.ascontiguousarray(partials), np.ascontiguousarray(mel.T)
+
+
+def read_index(out_dir: Path) -> List[dict]:
+    """
+    Reads the index of a preprocessed corpus. A last line left incomplete by an interruption is
+    removed from the file.
+    """
+    index_fpath = out_dir.joinpath("index.jsonl")
+    if not index_fpath.exists():
+        return []
+    with index_fpath.open("rb+") as f:
+        content = f.read()
+        complete = content[:content.rfind(b"\n") + 1]
+        if len(complete) != len(content):
+            f.truncate(len(complete))
+    return [json.loads(line) for line in complete.splitlines()]
+
+
+class ShardWriter:
+    def __init__(self, out_dir: Path, shard_size: int, first_shard: int):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.shard = first_shard
+        self._items = []    # (relative path, duration, mel, embed)
+
+    def add(self, path: str, duration: float, mel: np.ndarray, embed: np.ndarray):
+        self._items.append((path, duration, mel, embed))
+        if len(self._items) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self._items:
+            return
+        paths, durations, mels, embeds = zip(*self._items)
+        lengths = np.array([len(mel) for mel in mels])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        # Write the shard before indexing it, so the index never points to incomplete data
+        mels_out = np.lib.format.open_memmap(
+            self.out_dir.joinpath("mels_%05d.npy" % self.shard), mode="w+", dtype=np.float32,
+            shape=(int(lengths.sum()), mels[0].shape[1]))
+        for start, mel in zip(starts, mels):
+            mels_out[start:start + len(mel)] = mel
+        mels_out.flush()
+        del mels_out
+        np.save(self.out_dir.joinpath("embeds_%05d.npy" % self.shard), np.stack(embeds))
+
+        with self.out_dir.joinpath("index.jsonl").open("a") as f:
+            for i, (path, duration) in enumerate(zip(paths, durations)):
+                f.write(json.dumps({"path": path, "duration": round(duration, 3),
+                                    "shard": self.shard, "row": i, "mel_start": int(starts[i]),
+                                    "mel_frames": int(lengths[i])}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.shard += 1
+        self._items = []
+
+
+class PreprocessedCorpus:
+    """
+    Read access to the output of preprocess_corpus(). Shards are memory-mapped on first access.
+    """
+    def __init__(self, out_dir: Path):
+        self.out_dir = Path(out_dir)
+        self.index = read_index(self.out_dir)
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def _shard(self, shard):
+        if shard not in self._shards:
+            self._shards[shard] = (
+                np.load(self.out_dir.joinpath("mels_%05d.npy" % shard), mmap_mode="r"),
+                np.load(self.out_dir.joinpath("embeds_%05d.npy" % shard), mmap_mode="r"))
+        return self._shards[shard]
+
+    def __getitem__(self, i):
+        """
+        :return: the mel spectrogram of shape (num_mels, frames), as Synthesizer.make_spectrogram()
+        returns it, and the speaker embedding of the i-th utterance. Both are read-only views.
+        """
+        entry = self.index[i]
+        mels, embeds = self._shard(entry["shard"])
+        start = entry["mel_start"]
+        return mels[start:start + entry["mel_frames"]].T, embeds[entry["row"]]
+
+
+def preprocess_corpus(corpus_dir: Path, out_dir: Path, encoder_fpath: Path, n_workers=None,
+                      shard_size=512, max_batch_size=64, device=None):
+    """
+    Computes the mel spectrograms and speaker embeddings of all audio files under corpus_dir,
+    skipping those already in the index of out_dir.
+    """
+    if not encoder_fpath.exists():
+        raise RuntimeError(f"Encoder checkpoint not found: {encoder_fpath}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index = read_index(out_dir)
+    done = {entry["path"] for entry in index}
+    fpaths = [p for p in find_audio_files(corpus_dir)
+              if p.relative_to(corpus_dir).as_posix() not in done]
+    print("%d audio files to process, %d already done" % (len(fpaths), len(done)))
+    if not fpaths:
+        return
+
+    writer = ShardWriter(out_dir, shard_size, max((e["shard"] for e in index), default=-1) + 1)
+    n_workers = n_workers or os.cpu_count()
+    # Spawn rather than fork, as the parent runs torch
+    with multiprocessing.get_context("spawn").Pool(n_workers) as pool:
+        registry.encoder(encoder_fpath, device)
+
+        start_time = perf_counter()
+        total_duration, n_done, n_failed = 0., 0, 0
+        pending, n_pending_partials = [], 0
+
+        def embed_pending():
+            embeds = encoder_infer.embed_partial_frames([p[2] for p in pending], max_batch_size)
+            for (fpath, duration, _, mel), embed in zip(pending, embeds):
+                writer.add(fpath.relative_to(corpus_dir).as_posix(), duration, mel, embed)
+            pending.clear()
+
+        for result in pool.imap_unordered(_process_file, fpaths, chunksize=4):
+            if result[1] is None:
+                n_failed += 1
+                print("Skipping %s: %s" % (result[0], result[2]), file=sys.stderr)
+                continue
+            pending.append(result)
+            n_pending_partials += len(result[2])
+            total_duration += result[1]
+            n_done += 1
+
+            # Wait for enough partials to fill a few batches before running the encoder
+            if n_pending_partials >= 4 * max_batch_size:
+                embed_pending()
+                n_pending_partials = 0
+            if n_done % 100 == 0:
+                minutes = (perf_counter() - start_time) / 60
+                print("%d/%d files, %.2f hours of audio per minute" %
+                      (n_done, len(fpaths), total_duration / 3600 / minutes))
+
+        if pending:
+            embed_pending()
+        writer.flush()
+
+    minutes = (perf_counter() - start_time) / 60
+    print("Done: %d files (%.2f hours of audio) in %.1f minutes, %.2f hours of audio per minute. "
+          "%d files failed." % (n_done, total_duration / 3600, minutes,
+                                total_duration / 3600 / max(minutes, 1e-9), n_failed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compute the synthesizer mel spectrograms and speaker embeddings of a voice corpus."
+        )
+    )
+    parser.add_argument(
+        "--corpus",
+        required=True,
+        type=Path,
+        help=("Directory of audio files, searched recursively."),
+    )
+    parser.add_argument(
+        "--out",
+        required=True,
+        type=Path,
+        help=("Output directory. Processing resumes if it already holds an index."),
+    )
+    parser.add_argument(
+        "--encoder",
+        type=Path,
+        default=Path("models/default/encoder.pt"),
+        help=("Path to the speaker encoder checkpoint."),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=("Number of worker processes. Defaults to the number of CPUs."),
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=512,
+        help=("Number of utterances per shard."),
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help=("Maximum number of partial utterances per encoder forward pass."),
+    )
+    args = parser.parse_args(argv)
+
+    preprocess_corpus(args.corpus, args.out, args.encoder, args.workers, args.shard_size,
+                      args.batch_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,165 +1,346 @@
-import torch
-from synthesizer import audio
-from synthesizer.hparams import hparams
-from synthesizer.models.tacotron import Tacotron
-from synthesizer.utils.symbols import symbols
-from synthesizer.utils.text import text_to_sequence
-from vocoder.display import simple_table
-from pathlib import Path
-from typing import Union, List
-import numpy as np
-import librosa
-
-
-class Synthesizer:
-    sample_rate = hparams.sample_rate
-    hparams = hparams
-
-    def __init__(self, model_fpath: Path, verbose=True):
-        """
-        The model isn't instantiated and loaded in memory until needed or until load() is called.
-
-        :param model_fpath: path to the trained model file
-        :param verbose: if False, prints less information when using the model
-        """
-        self.model_fpath = model_fpath
-        self.verbose = verbose
-
-        # Check for GPU
-        if torch.cuda.is_available():
-            self.device = torch.device("cuda")
-        else:
-            self.device = torch.device("cpu")
-        if self.verbose:
-            print("Synthesizer using device:", self.device)
-
-        # Tacotron model will be instantiated later on first use.
-        self._model = None
-
-    def is_loaded(self):
-        """
-        Whether the model is loaded in memory.
-        """
-        return self._model is not None
-
-    def load(self):
-        """
-        Instantiates and loads the model given the weights file that was passed in the constructor.
-        """
-        self._model = Tacotron(embed_dims=hparams.tts_embed_dims,
-                               num_chars=len(symbols),
-                               encoder_dims=hparams.tts_encoder_dims,
-                               decoder_dims=hparams.tts_decoder_dims,
-                               n_mels=hparams.num_mels,
-                               fft_bins=hparams.num_mels,
-                               postnet_dims=hparams.tts_postnet_dims,
-                               encoder_K=hparams.tts_encoder_K,
-                               lstm_dims=hparams.tts_lstm_dims,
-                               postnet_K=hparams.tts_postnet_K,
-                               num_highways=hparams.tts_num_highways,
-                               dropout=hparams.tts_dropout,
-                               stop_threshold=hparams.tts_stop_threshold,
-                               speaker_embedding_size=hparams.speaker_embedding_size).to(self.device)
-
-        self._model.load(self.model_fpath)
-        self._model.eval()
-
-        if self.verbose:
-            print("Loaded synthesizer \"%s\" trained to step %d" % (self.model_fpath.name, self._model.state_dict()["step"]))
-
-    def synthesize_spectrograms(self, texts: List[str],
-                                embeddings: Union[np.ndarray, List[np.ndarray]],
-                                return_alignments=False):
-        """
-        Synthesizes mel spectrograms from texts and speaker embeddings.
-
-        :param texts: a list of N text prompts to be synthesized
-        :param embeddings: a numpy array or list of speaker embeddings of shape (N, 256)
-        :param return_alignments: if True, a matrix representing the alignments between the
-        characters
-        and each decoder output step will be returned for each spectrogram
-        :return: a list of N melspectrograms as numpy arrays of shape (80, Mi), where Mi is the
-        sequence length of spectrogram i, and possibly the alignments.
-        """
-        # Load the model on the first request.
-        if not self.is_loaded():
-            self.load()
-
-        # Preprocess text inputs
-        inputs = [text_to_sequence(text.strip(), hparams.tts_cleaner_names) for text in texts]
-        if not isinstance(embeddings, list):
-            embeddings = [embeddings]
-
-        # Batch inputs
-        batched_inputs = [inputs[i:i+hparams.synthesis_batch_size]
-                             for i in range(0, len(inputs), hparams.synthesis_batch_size)]
-        batched_embeds = [embeddings[i:i+hparams.synthesis_batch_size]
-                             for i in range(0, len(embeddings), hparams.synthesis_batch_size)]
-
-        specs = []
-        for i, batch in enumerate(batched_inputs, 1):
-            if self.verbose:
-                print(f"\n| Generating {i}/{len(batched_inputs)}")
-
-            # Pad texts so they are all the same length
-            text_lens = [len(text) for text in batch]
-            max_text_len = max(text_lens)
-            chars = [pad1d(text, max_text_len) for text in batch]
-            chars = np.stack(chars)
-
-            # Stack speaker embeddings into 2D array for batch processing
-            speaker_embeds = np.stack(batched_embeds[i-1])
-
-            # Convert to tensor
-            chars = torch.tensor(chars).long().to(self.device)
-            speaker_embeddings = torch.tensor(speaker_embeds).float().to(self.device)
-
-            # Inference
-            _, mels, alignments = self._model.generate(chars, speaker_embeddings)
-            mels = mels.detach().cpu().numpy()
-            for m in mels:
-                # Trim silence from end of each spectrogram
-                while np.max(m[:, -1]) < hparams.tts_stop_threshold:
-                    m = m[:, :-1]
-                specs.append(m)
-
-        if self.verbose:
-            print("\n\nDone.\n")
-        return (specs, alignments) if return_alignments else specs
-
-    @staticmethod
-    def load_preprocess_wav(fpath):
-        """
-        Loads and preprocesses an audio file under the same conditions the audio files were used to
-        train the synthesizer.
-        """
-        wav = librosa.load(str(fpath), hparams.sample_rate)[0]
-        if hparams.rescale:
-            wav = wav / np.abs(wav).max() * hparams.rescaling_max
-        return wav
-
-    @staticmethod
-    def make_spectrogram(fpath_or_wav: Union[str, Path, np.ndarray]):
-        """
-        Creates a mel spectrogram from an audio file in the same manner as the mel spectrograms that
-        were fed to the synthesizer when training.
-        """
-        if isinstance(fpath_or_wav, str) or isinstance(fpath_or_wav, Path):
-            wav = Synthesizer.load_preprocess_wav(fpath_or_wav)
-        else:
-            wav = fpath_or_wav
-
-        mel_spectrogram = audio.melspectrogram(wav, hparams).astype(np.float32)
-        return mel_spectrogram
-
-    @staticmethod
-    def griffin_lim(mel):
-        """
-        Inverts a mel spectrogram using Griffin-Lim. The mel spectrogram is expected to have been built
-        with the same parameters present in hparams.py.
-        """
-        return audio.inv_mel_spectrogram(mel, hparams)
-
-
-def pad1d(x, max_len, pad_value=0):
-    return np.pad(x, (0, max_len - len(x)), mode="constant", constant_values=pad_value)
+import torch
+from synthesizer import audio
+from synthesizer.hparams import hparams
+from synthesizer.models.tacotron import InferenceDecoder, PreNet, Tacotron
+from synthesizer.utils.symbols import symbols
+from synthesizer.utils.text import text_to_sequence_array
+from utils.audio_ingest import load_audio
+from vocoder.display import simple_table
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+from typing import Union, List
+import hashlib
+import inspect
+import numpy as np
+import os
+
+
+class Synthesizer:
+    sample_rate = hparams.sample_rate
+    hparams = hparams
+
+    def __init__(self, model_fpath: Path, verbose=True, device=None):
+        """
+        The model isn't instantiated and loaded in memory until needed or until load() is called.
+
+        :param model_fpath: path to the trained model file
+        :param verbose: if False, prints less information when using the model
+        :param device: either a torch device or the name of a torch device (e.g. "cpu", "cuda").
+        If None, will default to your GPU if it's available, otherwise your CPU.
+        """
+        self.model_fpath = model_fpath
+        self.verbose = verbose
+
+        # Check for GPU
+        if device is not None:
+            self.device = torch.device(device)
+        elif torch.cuda.is_available():
+            self.device = torch.device("cuda")
+        else:
+            self.device = torch.device("cpu")
+        if self.verbose:
+            print("Synthesizer using device:", self.device)
+
+        # Tacotron model will be instantiated later on first use.
+        self._model = None
+
+        # Encoder outputs of recent texts for the loaded checkpoint, by character ids
+        self._encoder_cache = OrderedDict()
+
+    def is_loaded(self):
+        """
+        Whether the model is loaded in memory.
+        """
+        return self._model is not None
+
+    def load(self):
+        """
+        Instantiates and loads the model given the weights file that was passed in the constructor.
+        """
+        self._model = Tacotron(embed_dims=hparams.tts_embed_dims,
+                               num_chars=len(symbols),
+                               encoder_dims=hparams.tts_encoder_dims,
+                               decoder_dims=hparams.tts_decoder_dims,
+                               n_mels=hparams.num_mels,
+                               fft_bins=hparams.num_mels,
+                               postnet_dims=hparams.tts_postnet_dims,
+                               encoder_K=hparams.tts_encoder_K,
+                               lstm_dims=hparams.tts_lstm_dims,
+                               postnet_K=hparams.tts_postnet_K,
+                               num_highways=hparams.tts_num_highways,
+                               dropout=hparams.tts_dropout,
+                               stop_threshold=hparams.tts_stop_threshold,
+                               speaker_embedding_size=hparams.speaker_embedding_size).to(self.device)
+
+        self._model.load(self.model_fpath)
+        self._encoder_cache.clear()
+        if hparams.tts_fuse_cbhg:
+            self._model.fuse_cbhgs()
+        if hparams.tts_script_decoder:
+            self._model.prepare_inference(self._scripted_decoder_fpath())
+        self._model.eval()
+
+        if self.verbose:
+            print("Loaded synthesizer \"%s\" trained to step %d" % (self.model_fpath.name, self._model.state_dict()["step"]))
+
+    def _scripted_decoder_fpath(self):
+        # The scripted decoder holds the weights of the checkpoint, and its code depends on the
+        # decoder modules and on the version of torch. Tacotron.prepare_inference() adds the
+        # reduction factor to the file name. It is cached outside of the models directory, which
+        # may be read-only.
+        stat = self.model_fpath.stat()
+        key = (str(self.model_fpath.resolve()), stat.st_size, stat.st_mtime_ns, self.device.type,
+               torch.__version__, inspect.getsource(InferenceDecoder), inspect.getsource(PreNet))
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()[:16]
+        return script_cache_dir().joinpath("%s.decoder-%s.pt" % (self.model_fpath.stem, digest))
+
+    def _encode(self, chars: np.ndarray):
+        """
+        Returns the encoder output for a single character sequence, from an LRU cache of
+        hparams.tts_encoder_cache_size texts. The encoder prenet applies dropout, so a text keeps
+        the same sample of its encoder output for as long as it stays in the cache.
+        """
+        key = chars.tobytes()
+        encoder_seq = self._encoder_cache.pop(key, None)
+        if encoder_seq is None:
+            encoder_seq = self._model.encode(torch.tensor(chars[None]).long().to(self.device))
+        self._encoder_cache[key] = encoder_seq
+        while len(self._encoder_cache) > hparams.tts_encoder_cache_size:
+            self._encoder_cache.popitem(last=False)
+        return encoder_seq
+
+    @staticmethod
+    def _decoding_kwargs():
+        # The attention window and the abort criteria of the decoder loop, from the hparams
+        return dict(attention_window=hparams.tts_attention_window,
+                    max_frames_per_char=hparams.tts_max_frames_per_char,
+                    stall_frames=hparams.tts_attention_stall_frames,
+                    max_backtrack=hparams.tts_attention_max_backtrack)
+
+    def synthesize_spectrograms(self, texts: Union[str, List[str]],
+                                embeddings: Union[np.ndarray, List[np.ndarray]],
+                                return_alignments=False, return_stats=False):
+        """
+        Synthesizes mel spectrograms from texts and speaker embeddings.
+
+        Texts are batched by length rather than in the order they are given, so that a batch
+        doesn't pay for the padding and decoder steps of a single long text. Decoder steps grow
+        with the text length, so batching by text length also groups similar numbers of steps.
+        When all texts of a batch are the same, for instance when a single text is given for
+        several embeddings, the text is encoded once, or taken from the encoder cache, and
+        shared by the whole batch.
+
+        :param texts: a list of N text prompts to be synthesized, or a single text to synthesize
+        in the voice of each embedding
+        :param embeddings: a numpy array or list of speaker embeddings of shape (N, 256)
+        :param return_alignments: if True, a matrix representing the alignments between the
+        characters
+        and each decoder output step will be returned for each spectrogram
+        :param return_stats: if True, a dict of statistics on the batches is also returned, see
+        below
+        :return: a list of N melspectrograms as numpy arrays of shape (80, Mi), where Mi is the
+        sequence length of spectrogram i, possibly the list of N alignments as numpy arrays of
+        shape (decoder_steps_i, text_length_i), and possibly the stats. The stats hold the
+        fraction of padding in the text batches ("padding_waste"), the total time in seconds
+        ("time"), the total number of frames trimmed as end silence ("trimmed_frames"), the
+        indices of the texts whose synthesis was aborted because their attention failed or they
+        ran out of frames ("aborted"), which may be worth retrying or splitting up, and, for each
+        batch in "batches", its size, longest text length, padding waste, whether its items
+        share the same text ("shared_text"), total number of frames decoded for its items
+        ("decoder_frames"), number of those frames trimmed ("trimmed_frames"), number of aborted
+        items ("aborted") and generation time. The spectrograms are views on the batch outputs.
+        """
+        # Load the model on the first request.
+        if not self.is_loaded():
+            self.load()
+        start_time = perf_counter()
+
+        # Preprocess text inputs
+        if isinstance(texts, str):
+            texts = [texts]
+        inputs = [text_to_sequence_array(text.strip(), hparams.tts_cleaner_names)
+                  for text in texts]
+        if isinstance(embeddings, np.ndarray):
+            embeddings = list(np.atleast_2d(embeddings))
+        if len(inputs) == 1 and len(embeddings) > 1:
+            inputs = inputs * len(embeddings)
+        if len(embeddings) != len(inputs):
+            raise ValueError("Got %d speaker embeddings for %d texts" %
+                             (len(embeddings), len(inputs)))
+
+        # Batch inputs of similar lengths together. The sort is stable, so texts of equal lengths
+        # keep their order.
+        order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]))
+        batches = [order[i:i + hparams.synthesis_batch_size]
+                   for i in range(0, len(order), hparams.synthesis_batch_size)]
+
+        specs = [None] * len(inputs)
+        alignments = [None] * len(inputs)
+        batch_stats = []
+        aborted = []
+        for i, batch in enumerate(batches, 1):
+            if self.verbose:
+                print(f"\n| Generating {i}/{len(batches)}")
+            batch_start_time = perf_counter()
+
+            # Pad texts so they are all the same length, unless they are all the same text
+            text_lens = [len(inputs[j]) for j in batch]
+            max_text_len = max(text_lens)
+            shared_text = all(np.array_equal(inputs[j], inputs[batch[0]]) for j in batch)
+            if shared_text:
+                encoder_seq = self._encode(inputs[batch[0]])
+                chars = inputs[batch[0]][None]
+            else:
+                encoder_seq = None
+                chars = np.stack([pad1d(inputs[j], max_text_len) for j in batch])
+
+            # Stack speaker embeddings into 2D array for batch processing
+            speaker_embeds = np.stack([embeddings[j] for j in batch])
+
+            # Convert to tensor
+            chars = torch.tensor(chars).long().to(self.device)
+            speaker_embeddings = torch.tensor(speaker_embeds).float().to(self.device)
+
+            # Inference
+            _, mels, batch_alignments, info = self._model.generate(
+                chars, speaker_embeddings, return_info=True, encoder_seq=encoder_seq,
+                **self._decoding_kwargs())
+            mels = mels.detach().cpu().numpy()
+            batch_alignments = batch_alignments.detach().cpu().numpy()
+            r = self._model.r
+            trimmed_frames = 0
+            for j, m, alignment, text_len, length in zip(batch, mels, batch_alignments, text_lens,
+                                                         info["lengths"]):
+                # Trim silence from end of each spectrogram
+                specs[j] = trim_end_silence(m[:, :length], hparams.tts_stop_threshold)
+                trimmed_frames += length - specs[j].shape[1]
+                alignments[j] = alignment[:length // r, :text_len]
+            aborted.extend(j for j, item_aborted in zip(batch, info["aborted"]) if item_aborted)
+
+            batch_stats.append({
+                "size": len(batch),
+                "max_text_len": max_text_len,
+                "padding_waste": 1 - sum(text_lens) / (len(batch) * max_text_len),
+                "shared_text": shared_text,
+                "decoder_frames": sum(info["lengths"]),
+                "trimmed_frames": trimmed_frames,
+                "aborted": sum(info["aborted"]),
+                "time": perf_counter() - batch_start_time,
+            })
+
+        if self.verbose:
+            print("\n\nDone.\n")
+        stats = {
+            "padding_waste": 1 - sum(len(x) for x in inputs) /
+                             max(1, sum(b["size"] * b["max_text_len"] for b in batch_stats)),
+            "trimmed_frames": sum(b["trimmed_frames"] for b in batch_stats),
+            "aborted": sorted(aborted),
+            "time": perf_counter() - start_time,
+            "batches": batch_stats,
+        }
+        outputs = (specs,) + ((alignments,) if return_alignments else ()) + \
+                  ((stats,) if return_stats else ())
+        return outputs if len(outputs) > 1 else specs
+
+    def synthesize_spectrogram_stream(self, text: str, embedding: np.ndarray, **stream_kwargs):
+        """
+        Synthesizes the mel spectrogram of a single text chunk by chunk, see
+        Tacotron.generate_stream(). Frames below the stop threshold are held back until a louder
+        frame follows them, so the end silence is trimmed as in synthesize_spectrograms().
+
+        :param text: a text
+        :param embedding: a speaker embedding as a numpy array of shape (speaker_embedding_size,)
+        :param stream_kwargs: the parameters passed to Tacotron.generate_stream(). Those of the
+        attention window and the abort criteria default to the hparams.
+        :return: a generator of mel spectrogram chunks as numpy arrays of shape (n_mels, frames)
+        """
+        # Load the model on the first request.
+        if not self.is_loaded():
+            self.load()
+
+        chars = text_to_sequence_array(text.strip(), hparams.tts_cleaner_names)
+        chars = torch.tensor(chars[None]).long().to(self.device)
+        speaker_embedding = torch.tensor(embedding[None]).float().to(self.device)
+
+        held_back = None
+        stream_kwargs = {**self._decoding_kwargs(), **stream_kwargs}
+        for chunk in self._model.generate_stream(chars, speaker_embedding, **stream_kwargs):
+            chunk = chunk[0].detach().cpu().numpy()
+            if held_back is not None:
+                chunk = np.concatenate((held_back, chunk), axis=1)
+            spoken = trim_end_silence(chunk, hparams.tts_stop_threshold)
+            held_back = chunk[:, spoken.shape[1]:]
+            if spoken.shape[1]:
+                yield spoken
+
+    @staticmethod
+    def load_preprocess_wav(fpath):
+        """
+        Loads and preprocesses an audio file under the same conditions the audio files were used to
+        train the synthesizer.
+        """
+        wav = load_audio(fpath, hparams.sample_rate)[0]
+        return Synthesizer.preprocess_wav(wav)
+
+    @staticmethod
+    def preprocess_wav(wav: np.ndarray):
+        """
+        Applies the preprocessing of load_preprocess_wav() to a waveform already at the sampling
+        rate of the synthesizer.
+        """
+        if hparams.rescale:
+            wav = wav / np.abs(wav).max() * hparams.rescaling_max
+        return wav
+
+    @staticmethod
+    def make_spectrogram(fpath_or_wav: Union[str, Path, np.ndarray]):
+        """
+        Creates a mel spectrogram from an audio file in the same manner as the mel spectrograms that
+        were fed to the synthesizer when training.
+        """
+        if isinstance(fpath_or_wav, str) or isinstance(fpath_or_wav, Path):
+            wav = Synthesizer.load_preprocess_wav(fpath_or_wav)
+        else:
+            wav = fpath_or_wav
+
+        mel_spectrogram = audio.melspectrogram(wav, hparams).astype(np.float32)
+        return mel_spectrogram
+
+    @staticmethod
+    def griffin_lim(mel):
+        """
+        Inverts a mel spectrogram using Griffin-Lim. The mel spectrogram is expected to have been built
+        with the same parameters present in hparams.py.
+        """
+        return audio.inv_mel_spectrogram(mel, hparams)
+
+
+def script_cache_dir():
+    """
+    Returns the directory where scripted decoders are cached. It is under $RTVC_CACHE_DIR if set,
+    otherwise under a "rtvc" directory in the user cache directory (%LOCALAPPDATA% on Windows,
+    $XDG_CACHE_HOME or ~/.cache elsewhere).
+    """
+    if os.environ.get("RTVC_CACHE_DIR"):
+        return Path(os.environ["RTVC_CACHE_DIR"], "synthesizer")
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        root = Path(os.environ["LOCALAPPDATA"])
+    else:
+        root = Path(os.environ.get("XDG_CACHE_HOME") or Path.home().joinpath(".cache"))
+    return root.joinpath("rtvc", "synthesizer")
+
+
+def trim_end_silence(mel, threshold):
+    """
+    Removes the frames at the end of a mel spectrogram whose values are all below the threshold.
+
+    :param mel: a mel spectrogram as a numpy array of shape (n_mels, frames)
+    :return: a view on the mel spectrogram
+    """
+    loud_frames = np.flatnonzero(mel.max(axis=0) >= threshold)
+    return mel[:, :loud_frames[-1] + 1 if len(loud_frames) else 0]
+
+
+def pad1d(x, max_len, pad_value=0):
+    return np.pad(x, (0, max_len - len(x)), mode="constant", constant_values=pad_value)
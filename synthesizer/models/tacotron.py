@@ -1,519 +1,1177 @@
-import os
-import numpy as np
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
-from pathlib import Path
-from typing import Union
-
-
-class HighwayNetwork(nn.Module):
-    def __init__(self, size):
-        super().__init__()
-        self.W1 = nn.Linear(size, size)
-        self.W2 = nn.Linear(size, size)
-        self.W1.bias.data.fill_(0.)
-
-    def forward(self, x):
-        x1 = self.W1(x)
-        x2 = self.W2(x)
-        g = torch.sigmoid(x2)
-        y = g * F.relu(x1) + (1. - g) * x
-        return y
-
-
-class Encoder(nn.Module):
-    def __init__(self, embed_dims, num_chars, encoder_dims, K, num_highways, dropout):
-        super().__init__()
-        prenet_dims = (encoder_dims, encoder_dims)
-        cbhg_channels = encoder_dims
-        self.embedding = nn.Embedding(num_chars, embed_dims)
-        self.pre_net = PreNet(embed_dims, fc1_dims=prenet_dims[0], fc2_dims=prenet_dims[1],
-                              dropout=dropout)
-        self.cbhg = CBHG(K=K, in_channels=cbhg_channels, channels=cbhg_channels,
-                         proj_channels=[cbhg_channels, cbhg_channels],
-                         num_highways=num_highways)
-
-    def forward(self, x, speaker_embedding=None):
-        x = self.embedding(x)
-        x = self.pre_net(x)
-        x.transpose_(1, 2)
-        x = self.cbhg(x)
-        if speaker_embedding is not None:
-            x = self.add_speaker_embedding(x, speaker_embedding)
-        return x
-
-    def add_speaker_embedding(self, x, speaker_embedding):
-        # SV2TTS
-        # The input x is the encoder output and is a 3D tensor with size (batch_size, num_chars, tts_embed_dims)
-        # When training, speaker_embedding is also a 2D tensor with size (batch_size, speaker_embedding_size)
-        #     (for inference, speaker_embedding is a 1D tensor with size (speaker_embedding_size))
-        # This concats the speaker embedding for each char in the encoder output
-
-        # Save the dimensions as human-readable names
-        batch_size = x.size()[0]
-        num_chars = x.size()[1]
-
-        if speaker_embedding.dim() == 1:
-            idx = 0
-        else:
-            idx = 1
-
-        # Start by making a copy of each speaker embedding to match the input text length
-        # The output of this has size (batch_size, num_chars * tts_embed_dims)
-        speaker_embedding_size = speaker_embedding.size()[idx]
-        e = speaker_embedding.repeat_interleave(num_chars, dim=idx)
-
-        # Reshape it and transpose
-        e = e.reshape(batch_size, speaker_embedding_size, num_chars)
-        e = e.transpose(1, 2)
-
-        # Concatenate the tiled speaker embedding with the encoder output
-        x = torch.cat((x, e), 2)
-        return x
-
-
-class BatchNormConv(nn.Module):
-    def __init__(self, in_channels, out_channels, kernel, relu=True):
-        super().__init__()
-        self.conv = nn.Conv1d(in_channels, out_channels, kernel, stride=1, padding=kernel // 2, bias=False)
-        self.bnorm = nn.BatchNorm1d(out_channels)
-        self.relu = relu
-
-    def forward(self, x):
-        x = self.conv(x)
-        x = F.relu(x) if self.relu is True else x
-        return self.bnorm(x)
-
-
-class CBHG(nn.Module):
-    def __init__(self, K, in_channels, channels, proj_channels, num_highways):
-        super().__init__()
-
-        # List of all rnns to call `flatten_parameters()` on
-        self._to_flatten = []
-
-        self.bank_kernels = [i for i in range(1, K + 1)]
-        self.conv1d_bank = nn.ModuleList()
-        for k in self.bank_kernels:
-            conv = BatchNormConv(in_channels, channels, k)
-            self.conv1d_bank.append(conv)
-
-        self.maxpool = nn.MaxPool1d(kernel_size=2, stride=1, padding=1)
-
-        self.conv_project1 = BatchNormConv(len(self.bank_kernels) * channels, proj_channels[0], 3)
-        self.conv_project2 = BatchNormConv(proj_channels[0], proj_channels[1], 3, relu=False)
-
-        # Fix the highway input if necessary
-        if proj_channels[-1] != channels:
-            self.highway_mismatch = True
-            self.pre_highway = nn.Linear(proj_channels[-1], channels, bias=False)
-        else:
-            self.highway_mismatch = False
-
-        self.highways = nn.ModuleList()
-        for i in range(num_highways):
-            hn = HighwayNetwork(channels)
-            self.highways.append(hn)
-
-        self.rnn = nn.GRU(channels, channels // 2, batch_first=True, bidirectional=True)
-        self._to_flatten.append(self.rnn)
-
-        # Avoid fragmentation of RNN parameters and associated warning
-        self._flatten_parameters()
-
-    def forward(self, x):
-        # Although we `_flatten_parameters()` on init, when using DataParallel
-        # the model gets replicated, making it no longer guaranteed that the
-        # weights are contiguous in GPU memory. Hence, we must call it again
-        self._flatten_parameters()
-
-        # Save these for later
-        residual = x
-        seq_len = x.size(-1)
-        conv_bank = []
-
-        # Convolution Bank
-        for conv in self.conv1d_bank:
-            c = conv(x) # Convolution
-            conv_bank.append(c[:, :, :seq_len])
-
-        # Stack along the channel axis
-        conv_bank = torch.cat(conv_bank, dim=1)
-
-        # dump the last padding to fit residual
-        x = self.maxpool(conv_bank)[:, :, :seq_len]
-
-        # Conv1d projections
-        x = self.conv_project1(x)
-        x = self.conv_project2(x)
-
-        # Residual Connect
-        x = x + residual
-
-        # Through the highways
-        x = x.transpose(1, 2)
-        if self.highway_mismatch is True:
-            x = self.pre_highway(x)
-        for h in self.highways: x = h(x)
-
-        # And then the RNN
-        x, _ = self.rnn(x)
-        return x
-
-    def _flatten_parameters(self):
-        """Calls `flatten_parameters` on all the rnns used by the WaveRNN. Used
-        to improve efficiency and avoid PyTorch yelling at us."""
-        [m.flatten_parameters() for m in self._to_flatten]
-
-class PreNet(nn.Module):
-    def __init__(self, in_dims, fc1_dims=256, fc2_dims=128, dropout=0.5):
-        super().__init__()
-        self.fc1 = nn.Linear(in_dims, fc1_dims)
-        self.fc2 = nn.Linear(fc1_dims, fc2_dims)
-        self.p = dropout
-
-    def forward(self, x):
-        x = self.fc1(x)
-        x = F.relu(x)
-        x = F.dropout(x, self.p, training=True)
-        x = self.fc2(x)
-        x = F.relu(x)
-        x = F.dropout(x, self.p, training=True)
-        return x
-
-
-class Attention(nn.Module):
-    def __init__(self, attn_dims):
-        super().__init__()
-        self.W = nn.Linear(attn_dims, attn_dims, bias=False)
-        self.v = nn.Linear(attn_dims, 1, bias=False)
-
-    def forward(self, encoder_seq_proj, query, t):
-
-        # print(encoder_seq_proj.shape)
-        # Transform the query vector
-        query_proj = self.W(query).unsqueeze(1)
-
-        # Compute the scores
-        u = self.v(torch.tanh(encoder_seq_proj + query_proj))
-        scores = F.softmax(u, dim=1)
-
-        return scores.transpose(1, 2)
-
-
-class LSA(nn.Module):
-    def __init__(self, attn_dim, kernel_size=31, filters=32):
-        super().__init__()
-        self.conv = nn.Conv1d(1, filters, padding=(kernel_size - 1) // 2, kernel_size=kernel_size, bias=True)
-        self.L = nn.Linear(filters, attn_dim, bias=False)
-        self.W = nn.Linear(attn_dim, attn_dim, bias=True) # Include the attention bias in this term
-        self.v = nn.Linear(attn_dim, 1, bias=False)
-        self.cumulative = None
-        self.attention = None
-
-    def init_attention(self, encoder_seq_proj):
-        device = next(self.parameters()).device  # use same device as parameters
-        b, t, c = encoder_seq_proj.size()
-        self.cumulative = torch.zeros(b, t, device=device)
-        self.attention = torch.zeros(b, t, device=device)
-
-    def forward(self, encoder_seq_proj, query, t, chars):
-
-        if t == 0: self.init_attention(encoder_seq_proj)
-
-        processed_query = self.W(query).unsqueeze(1)
-
-        location = self.cumulative.unsqueeze(1)
-        processed_loc = self.L(self.conv(location).transpose(1, 2))
-
-        u = self.v(torch.tanh(processed_query + encoder_seq_proj + processed_loc))
-        u = u.squeeze(-1)
-
-        # Mask zero padding chars
-        u = u * (chars != 0).float()
-
-        # Smooth Attention
-        # scores = torch.sigmoid(u) / torch.sigmoid(u).sum(dim=1, keepdim=True)
-        scores = F.softmax(u, dim=1)
-        self.attention = scores
-        self.cumulative = self.cumulative + self.attention
-
-        return scores.unsqueeze(-1).transpose(1, 2)
-
-
-class Decoder(nn.Module):
-    # Class variable because its value doesn't change between classes
-    # yet ought to be scoped by class because its a property of a Decoder
-    max_r = 20
-    def __init__(self, n_mels, encoder_dims, decoder_dims, lstm_dims,
-                 dropout, speaker_embedding_size):
-        super().__init__()
-        self.register_buffer("r", torch.tensor(1, dtype=torch.int))
-        self.n_mels = n_mels
-        prenet_dims = (decoder_dims * 2, decoder_dims * 2)
-        self.prenet = PreNet(n_mels, fc1_dims=prenet_dims[0], fc2_dims=prenet_dims[1],
-                             dropout=dropout)
-        self.attn_net = LSA(decoder_dims)
-        self.attn_rnn = nn.GRUCell(encoder_dims + prenet_dims[1] + speaker_embedding_size, decoder_dims)
-        self.rnn_input = nn.Linear(encoder_dims + decoder_dims + speaker_embedding_size, lstm_dims)
-        self.res_rnn1 = nn.LSTMCell(lstm_dims, lstm_dims)
-        self.res_rnn2 = nn.LSTMCell(lstm_dims, lstm_dims)
-        self.mel_proj = nn.Linear(lstm_dims, n_mels * self.max_r, bias=False)
-        self.stop_proj = nn.Linear(encoder_dims + speaker_embedding_size + lstm_dims, 1)
-
-    def zoneout(self, prev, current, p=0.1):
-        device = next(self.parameters()).device  # Use same device as parameters
-        mask = torch.zeros(prev.size(), device=device).bernoulli_(p)
-        return prev * mask + current * (1 - mask)
-
-    def forward(self, encoder_seq, encoder_seq_proj, prenet_in,
-                hidden_states, cell_states, context_vec, t, chars):
-
-        # Need this for reshaping mels
-        batch_size = encoder_seq.size(0)
-
-        # Unpack the hidden and cell states
-        attn_hidden, rnn1_hidden, rnn2_hidden = hidden_states
-        rnn1_cell, rnn2_cell = cell_states
-
-        # PreNet for the Attention RNN
-        prenet_out = self.prenet(prenet_in)
-
-        # Compute the Attention RNN hidden state
-        attn_rnn_in = torch.cat([context_vec, prenet_out], dim=-1)
-        attn_hidden = self.attn_rnn(attn_rnn_in.squeeze(1), attn_hidden)
-
-        # Compute the attention scores
-        scores = self.attn_net(encoder_seq_proj, attn_hidden, t, chars)
-
-        # Dot product to create the context vector
-        context_vec = scores @ encoder_seq
-        context_vec = context_vec.squeeze(1)
-
-        # Concat Attention RNN output w. Context Vector & project
-        x = torch.cat([context_vec, attn_hidden], dim=1)
-        x = self.rnn_input(x)
-
-        # Compute first Residual RNN
-        rnn1_hidden_next, rnn1_cell = self.res_rnn1(x, (rnn1_hidden, rnn1_cell))
-        if self.training:
-            rnn1_hidden = self.zoneout(rnn1_hidden, rnn1_hidden_next)
-        else:
-            rnn1_hidden = rnn1_hidden_next
-        x = x + rnn1_hidden
-
-        # Compute second Residual RNN
-        rnn2_hidden_next, rnn2_cell = self.res_rnn2(x, (rnn2_hidden, rnn2_cell))
-        if self.training:
-            rnn2_hidden = self.zoneout(rnn2_hidden, rnn2_hidden_next)
-        else:
-            rnn2_hidden = rnn2_hidden_next
-        x = x + rnn2_hidden
-
-        # Project Mels
-        mels = self.mel_proj(x)
-        mels = mels.view(batch_size, self.n_mels, self.max_r)[:, :, :self.r]
-        hidden_states = (attn_hidden, rnn1_hidden, rnn2_hidden)
-        cell_states = (rnn1_cell, rnn2_cell)
-
-        # Stop token prediction
-        s = torch.cat((x, context_vec), dim=1)
-        s = self.stop_proj(s)
-        stop_tokens = torch.sigmoid(s)
-
-        return mels, scores, hidden_states, cell_states, context_vec, stop_tokens
-
-
-class Tacotron(nn.Module):
-    def __init__(self, embed_dims, num_chars, encoder_dims, decoder_dims, n_mels, 
-                 fft_bins, postnet_dims, encoder_K, lstm_dims, postnet_K, num_highways,
-                 dropout, stop_threshold, speaker_embedding_size):
-        super().__init__()
-        self.n_mels = n_mels
-        self.lstm_dims = lstm_dims
-        self.encoder_dims = encoder_dims
-        self.decoder_dims = decoder_dims
-        self.speaker_embedding_size = speaker_embedding_size
-        self.encoder = Encoder(embed_dims, num_chars, encoder_dims,
-                               encoder_K, num_highways, dropout)
-        self.encoder_proj = nn.Linear(encoder_dims + speaker_embedding_size, decoder_dims, bias=False)
-        self.decoder = Decoder(n_mels, encoder_dims, decoder_dims, lstm_dims,
-                               dropout, speaker_embedding_size)
-        self.postnet = CBHG(postnet_K, n_mels, postnet_dims,
-                            [postnet_dims, fft_bins], num_highways)
-        self.post_proj = nn.Linear(postnet_dims, fft_bins, bias=False)
-
-        self.init_model()
-        self.num_params()
-
-        self.register_buffer("step", torch.zeros(1, dtype=torch.long))
-        self.register_buffer("stop_threshold", torch.tensor(stop_threshold, dtype=torch.float32))
-
-    @property
-    def r(self):
-        return self.decoder.r.item()
-
-    @r.setter
-    def r(self, value):
-        self.decoder.r = self.decoder.r.new_tensor(value, requires_grad=False)
-
-    def forward(self, x, m, speaker_embedding):
-        device = next(self.parameters()).device  # use same device as parameters
-
-        self.step += 1
-        batch_size, _, steps  = m.size()
-
-        # Initialise all hidden states and pack into tuple
-        attn_hidden = torch.zeros(batch_size, self.decoder_dims, device=device)
-        rnn1_hidden = torch.zeros(batch_size, self.lstm_dims, device=device)
-        rnn2_hidden = torch.zeros(batch_size, self.lstm_dims, device=device)
-        hidden_states = (attn_hidden, rnn1_hidden, rnn2_hidden)
-
-        # Initialise all lstm cell states and pack into tuple
-        rnn1_cell = torch.zeros(batch_size, self.lstm_dims, device=device)
-        rnn2_cell = torch.zeros(batch_size, self.lstm_dims, device=device)
-        cell_states = (rnn1_cell, rnn2_cell)
-
-        # <GO> Frame for start of decoder loop
-        go_frame = torch.zeros(batch_size, self.n_mels, device=device)
-
-        # Need an initial context vector
-        context_vec = torch.zeros(batch_size, self.encoder_dims + self.speaker_embedding_size, device=device)
-
-        # SV2TTS: Run the encoder with the speaker embedding
-        # The projection avoids unnecessary matmuls in the decoder loop
-        encoder_seq = self.encoder(x, speaker_embedding)
-        encoder_seq_proj = self.encoder_proj(encoder_seq)
-
-        # Need a couple of lists for outputs
-        mel_outputs, attn_scores, stop_outputs = [], [], []
-
-        # Run the decoder loop
-        for t in range(0, steps, self.r):
-            prenet_in = m[:, :, t - 1] if t > 0 else go_frame
-            mel_frames, scores, hidden_states, cell_states, context_vec, stop_tokens = \
-                self.decoder(encoder_seq, encoder_seq_proj, prenet_in,
-                             hidden_states, cell_states, context_vec, t, x)
-            mel_outputs.append(mel_frames)
-            attn_scores.append(scores)
-            stop_outputs.extend([stop_tokens] * self.r)
-
-        # Concat the mel outputs into sequence
-        mel_outputs = torch.cat(mel_outputs, dim=2)
-
-        # Post-Process for Linear Spectrograms
-        postnet_out = self.postnet(mel_outputs)
-        linear = self.post_proj(postnet_out)
-        linear = linear.transpose(1, 2)
-
-        # For easy visualisation
-        attn_scores = torch.cat(attn_scores, 1)
-        # attn_scores = attn_scores.cpu().data.numpy()
-        stop_outputs = torch.cat(stop_outputs, 1)
-
-        return mel_outputs, linear, attn_scores, stop_outputs
-
-    def generate(self, x, speaker_embedding=None, steps=2000):
-        self.eval()
-        device = next(self.parameters()).device  # use same device as parameters
-
-        batch_size, _  = x.size()
-
-        # Need to initialise all hidden states and pack into tuple for tidyness
-        attn_hidden = torch.zeros(batch_size, self.decoder_dims, device=device)
-        rnn1_hidden = torch.zeros(batch_size, self.lstm_dims, device=device)
-        rnn2_hidden = torch.zeros(batch_size, self.lstm_dims, device=device)
-        hidden_states = (attn_hidden, rnn1_hidden, rnn2_hidden)
-
-        # Need to initialise all lstm cell states and pack into tuple for tidyness
-        rnn1_cell = torch.zeros(batch_size, self.lstm_dims, device=device)
-        rnn2_cell = torch.zeros(batch_size, self.lstm_dims, device=device)
-        cell_states = (rnn1_cell, rnn2_cell)
-
-        # Need a <GO> Frame for start of decoder loop
-        go_frame = torch.zeros(batch_size, self.n_mels, device=device)
-
-        # Need an initial context vector
-        context_vec = torch.zeros(batch_size, self.encoder_dims + self.speaker_embedding_size, device=device)
-
-        # SV2TTS: Run the encoder with the speaker embedding
-        # The projection avoids unnecessary matmuls in the decoder loop
-        encoder_seq = self.encoder(x, speaker_embedding)
-        encoder_seq_proj = self.encoder_proj(encoder_seq)
-
-        # Need a couple of lists for outputs
-        mel_outputs, attn_scores, stop_outputs = [], [], []
-
-        # Run the decoder loop
-        for t in range(0, steps, self.r):
-            prenet_in = mel_outputs[-1][:, :, -1] if t > 0 else go_frame
-            mel_frames, scores, hidden_states, cell_states, context_vec, stop_tokens = \
-            self.decoder(encoder_seq, encoder_seq_proj, prenet_in,
-                         hidden_states, cell_states, context_vec, t, x)
-            mel_outputs.append(mel_frames)
-            attn_scores.append(scores)
-            stop_outputs.extend([stop_tokens] * self.r)
-            # Stop the loop when all stop tokens in batch exceed threshold
-            if (stop_tokens > 0.5).all() and t > 10: break
-
-        # Concat the mel outputs into sequence
-        mel_outputs = torch.cat(mel_outputs, dim=2)
-
-        # Post-Process for Linear Spectrograms
-        postnet_out = self.postnet(mel_outputs)
-        linear = self.post_proj(postnet_out)
-
-
-        linear = linear.transpose(1, 2)
-
-        # For easy visualisation
-        attn_scores = torch.cat(attn_scores, 1)
-        stop_outputs = torch.cat(stop_outputs, 1)
-
-        self.train()
-
-        return mel_outputs, linear, attn_scores
-
-    def init_model(self):
-        for p in self.parameters():
-            if p.dim() > 1: nn.init.xavier_uniform_(p)
-
-    def get_step(self):
-        return self.step.data.item()
-
-    def reset_step(self):
-        # assignment to parameters or buffers is overloaded, updates internal dict entry
-        self.step = self.step.data.new_tensor(1)
-
-    def log(self, path, msg):
-        with open(path, "a") as f:
-            print(msg, file=f)
-
-    def load(self, path, optimizer=None):
-        # Use device of model params as location for loaded state
-        device = next(self.parameters()).device
-        checkpoint = torch.load(str(path), map_location=device)
-        self.load_state_dict(checkpoint["model_state"])
-
-        if "optimizer_state" in checkpoint and optimizer is not None:
-            optimizer.load_state_dict(checkpoint["optimizer_state"])
-
-    def save(self, path, optimizer=None):
-        if optimizer is not None:
-            torch.save({
-                "model_state": self.state_dict(),
-                "optimizer_state": optimizer.state_dict(),
-            }, str(path))
-        else:
-            torch.save({
-                "model_state": self.state_dict(),
-            }, str(path))
-
-
-    def num_params(self, print_out=True):
-        parameters = filter(lambda p: p.requires_grad, self.parameters())
-        parameters = sum([np.prod(p.size()) for p in parameters]) / 1_000_000
-        if print_out:
-            print("Trainable Parameters: %.3fM" % parameters)
-        return parameters
+import os
+import numpy as np
+import warnings
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from pathlib import Path
+from typing import List, Tuple, Union
+
+
+class HighwayNetwork(nn.Module):
+    def __init__(self, size):
+        super().__init__()
+        self.W1 = nn.Linear(size, size)
+        self.W2 = nn.Linear(size, size)
+        self.W1.bias.data.fill_(0.)
+
+    def forward(self, x):
+        x1 = self.W1(x)
+        x2 = self.W2(x)
+        g = torch.sigmoid(x2)
+        y = g * F.relu(x1) + (1. - g) * x
+        return y
+
+
+class Encoder(nn.Module):
+    def __init__(self, embed_dims, num_chars, encoder_dims, K, num_highways, dropout):
+        super().__init__()
+        prenet_dims = (encoder_dims, encoder_dims)
+        cbhg_channels = encoder_dims
+        self.embedding = nn.Embedding(num_chars, embed_dims)
+        self.pre_net = PreNet(embed_dims, fc1_dims=prenet_dims[0], fc2_dims=prenet_dims[1],
+                              dropout=dropout)
+        self.cbhg = CBHG(K=K, in_channels=cbhg_channels, channels=cbhg_channels,
+                         proj_channels=[cbhg_channels, cbhg_channels],
+                         num_highways=num_highways)
+
+    def forward(self, x, speaker_embedding=None):
+        x = self.embedding(x)
+        x = self.pre_net(x)
+        x.transpose_(1, 2)
+        x = self.cbhg(x)
+        if speaker_embedding is not None:
+            x = self.add_speaker_embedding(x, speaker_embedding)
+        return x
+
+    def add_speaker_embedding(self, x, speaker_embedding):
+        # SV2TTS
+        # The input x is the encoder output and is a 3D tensor with size (batch_size, num_chars, tts_embed_dims)
+        # When training, speaker_embedding is also a 2D tensor with size (batch_size, speaker_embedding_size)
+        #     (for inference, speaker_embedding is a 1D tensor with size (speaker_embedding_size))
+        # This concats the speaker embedding for each char in the encoder output
+
+        # Save the dimensions as human-readable names
+        batch_size = x.size()[0]
+        num_chars = x.size()[1]
+
+        if speaker_embedding.dim() == 1:
+            idx = 0
+        else:
+            idx = 1
+
+        # Start by making a copy of each speaker embedding to match the input text length
+        # The output of this has size (batch_size, num_chars * tts_embed_dims)
+        speaker_embedding_size = speaker_embedding.size()[idx]
+        e = speaker_embedding.repeat_interleave(num_chars, dim=idx)
+
+        # Reshape it and transpose
+        e = e.reshape(batch_size, speaker_embedding_size, num_chars)
+        e = e.transpose(1, 2)
+
+        # Concatenate the tiled speaker embedding with the encoder output
+        x = torch.cat((x, e), 2)
+        return x
+
+
+class BatchNormConv(nn.Module):
+    def __init__(self, in_channels, out_channels, kernel, relu=True):
+        super().__init__()
+        self.conv = nn.Conv1d(in_channels, out_channels, kernel, stride=1, padding=kernel // 2, bias=False)
+        self.bnorm = nn.BatchNorm1d(out_channels)
+        self.relu = relu
+
+    def forward(self, x):
+        x = self.conv(x)
+        x = F.relu(x) if self.relu is True else x
+        return self.bnorm(x)
+
+
+class CBHG(nn.Module):
+    def __init__(self, K, in_channels, channels, proj_channels, num_highways):
+        super().__init__()
+
+        # List of all rnns to call `flatten_parameters()` on
+        self._to_flatten = []
+
+        self.bank_kernels = [i for i in range(1, K + 1)]
+        self.conv1d_bank = nn.ModuleList()
+        for k in self.bank_kernels:
+            conv = BatchNormConv(in_channels, channels, k)
+            self.conv1d_bank.append(conv)
+
+        self.maxpool = nn.MaxPool1d(kernel_size=2, stride=1, padding=1)
+
+        self.conv_project1 = BatchNormConv(len(self.bank_kernels) * channels, proj_channels[0], 3)
+        self.conv_project2 = BatchNormConv(proj_channels[0], proj_channels[1], 3, relu=False)
+
+        # Fix the highway input if necessary
+        if proj_channels[-1] != channels:
+            self.highway_mismatch = True
+            self.pre_highway = nn.Linear(proj_channels[-1], channels, bias=False)
+        else:
+            self.highway_mismatch = False
+
+        self.highways = nn.ModuleList()
+        for i in range(num_highways):
+            hn = HighwayNetwork(channels)
+            self.highways.append(hn)
+
+        self.rnn = nn.GRU(channels, channels // 2, batch_first=True, bidirectional=True)
+        self._to_flatten.append(self.rnn)
+
+        # Avoid fragmentation of RNN parameters and associated warning
+        self._flatten_parameters()
+
+    def forward(self, x):
+        # Although we `_flatten_parameters()` on init, when using DataParallel
+        # the model gets replicated, making it no longer guaranteed that the
+        # weights are contiguous in GPU memory. Hence, we must call it again
+        self._flatten_parameters()
+
+        # Save these for later
+        residual = x
+        seq_len = x.size(-1)
+        conv_bank = []
+
+        # Convolution Bank
+        for conv in self.conv1d_bank:
+            c = conv(x) # Convolution
+            conv_bank.append(c[:, :, :seq_len])
+
+        # Stack along the channel axis
+        conv_bank = torch.cat(conv_bank, dim=1)
+
+        # dump the last padding to fit residual
+        x = self.maxpool(conv_bank)[:, :, :seq_len]
+
+        # Conv1d projections
+        x = self.conv_project1(x)
+        x = self.conv_project2(x)
+
+        # Residual Connect
+        x = x + residual
+
+        # Through the highways
+        x = x.transpose(1, 2)
+        if self.highway_mismatch is True:
+            x = self.pre_highway(x)
+        for h in self.highways: x = h(x)
+
+        # And then the RNN
+        x, _ = self.rnn(x)
+        return x
+
+    def _flatten_parameters(self):
+        """Calls `flatten_parameters` on all the rnns used by the WaveRNN. Used
+        to improve efficiency and avoid PyTorch yelling at us."""
+        [m.flatten_parameters() for m in self._to_flatten]
+
+
+def _batch_norm_affine(bnorm: nn.BatchNorm1d):
+    # The per-channel scale and shift that a batch norm layer applies in eval mode
+    scale = bnorm.weight / torch.sqrt(bnorm.running_var + bnorm.eps)
+    shift = bnorm.bias - bnorm.running_mean * scale
+    return scale, shift
+
+
+class InferenceCBHG(nn.Module):
+    """
+    The computation of a CBHG in eval mode with fewer operations, for inference only. The batch
+    norms are folded into per-channel affines, or into the convolution weights where no ReLU
+    comes in between, and the two linear layers of each highway run as a single matmul. The
+    convolutions, the RNN and the highway input projection are shared with the CBHG.
+
+    With merge_bank, the convolution bank runs as a single convolution whose kernel holds the
+    taps of every kernel of the bank, zero padded to the largest one: the bank pads kernel k by
+    k // 2 on both sides and keeps the first seq_len outputs, so the merged convolution pads its
+    input by K // 2 on the left and (K - 1) // 2 on the right. This saves kernel launches on a
+    GPU, but the zero taps make it slower than the separate convolutions on a CPU.
+    """
+    def __init__(self, cbhg: CBHG, merge_bank=False):
+        super().__init__()
+        self.bank = nn.ModuleList(bnconv.conv for bnconv in cbhg.conv1d_bank)
+        K = max(cbhg.bank_kernels)
+        self.bank_padding = (K // 2, (K - 1) // 2)
+        self.maxpool = cbhg.maxpool
+        self.pre_highway = cbhg.pre_highway if cbhg.highway_mismatch else None
+        self.rnn = cbhg.rnn
+
+        with torch.no_grad():
+            if merge_bank:
+                bank_weight = self.bank[0].weight.new_zeros(
+                    sum(conv.out_channels for conv in self.bank), self.bank[0].in_channels, K)
+                row = 0
+                for k, conv in zip(cbhg.bank_kernels, self.bank):
+                    start = K // 2 - k // 2
+                    bank_weight[row:row + conv.out_channels, :, start:start + k] = conv.weight
+                    row += conv.out_channels
+                self.register_buffer("bank_weight", bank_weight)
+            else:
+                self.register_buffer("bank_weight", None)
+            bank_affine = [_batch_norm_affine(bnconv.bnorm) for bnconv in cbhg.conv1d_bank]
+            self.register_buffer("bank_scale", torch.cat([a[0] for a in bank_affine]).unsqueeze(1))
+            self.register_buffer("bank_shift", torch.cat([a[1] for a in bank_affine]).unsqueeze(1))
+
+            # The first projection has a ReLU before its batch norm, the second one has none
+            scale, shift = _batch_norm_affine(cbhg.conv_project1.bnorm)
+            self.register_buffer("project1_weight", cbhg.conv_project1.conv.weight.clone())
+            self.register_buffer("project1_scale", scale.unsqueeze(1))
+            self.register_buffer("project1_shift", shift.unsqueeze(1))
+            scale, shift = _batch_norm_affine(cbhg.conv_project2.bnorm)
+            self.register_buffer("project2_weight",
+                                 cbhg.conv_project2.conv.weight * scale[:, None, None])
+            self.register_buffer("project2_bias", shift)
+
+            self.register_buffer("highway_weights", torch.stack(
+                [torch.cat((h.W1.weight, h.W2.weight)) for h in cbhg.highways]))
+            self.register_buffer("highway_biases", torch.stack(
+                [torch.cat((h.W1.bias, h.W2.bias)) for h in cbhg.highways]))
+
+    def forward(self, x):
+        residual = x
+        seq_len = x.size(-1)
+
+        # Convolution Bank
+        if self.bank_weight is not None:
+            x = F.conv1d(F.pad(x, self.bank_padding), self.bank_weight)
+        else:
+            x = torch.cat([conv(x)[:, :, :seq_len] for conv in self.bank], dim=1)
+        x = torch.addcmul(self.bank_shift, F.relu(x), self.bank_scale)
+        x = self.maxpool(x)[:, :, :seq_len]
+
+        # Conv1d projections
+        x = F.conv1d(x, self.project1_weight, padding=self.project1_weight.size(2) // 2)
+        x = torch.addcmul(self.project1_shift, F.relu(x), self.project1_scale)
+        x = F.conv1d(x, self.project2_weight, self.project2_bias,
+                     padding=self.project2_weight.size(2) // 2)
+
+        # Residual Connect
+        x = x + residual
+
+        # Through the highways
+        x = x.transpose(1, 2)
+        if self.pre_highway is not None:
+            x = self.pre_highway(x)
+        for weight, bias in zip(self.highway_weights, self.highway_biases):
+            x1, x2 = F.linear(x, weight, bias).chunk(2, dim=-1)
+            g = torch.sigmoid(x2)
+            x = g * F.relu(x1) + (1. - g) * x
+
+        # And then the RNN
+        x, _ = self.rnn(x)
+        return x
+
+
+class PreNet(nn.Module):
+    def __init__(self, in_dims, fc1_dims=256, fc2_dims=128, dropout=0.5):
+        super().__init__()
+        self.fc1 = nn.Linear(in_dims, fc1_dims)
+        self.fc2 = nn.Linear(fc1_dims, fc2_dims)
+        self.p = dropout
+
+    def forward(self, x):
+        x = self.fc1(x)
+        x = F.relu(x)
+        x = F.dropout(x, self.p, training=True)
+        x = self.fc2(x)
+        x = F.relu(x)
+        x = F.dropout(x, self.p, training=True)
+        return x
+
+
+class Attention(nn.Module):
+    def __init__(self, attn_dims):
+        super().__init__()
+        self.W = nn.Linear(attn_dims, attn_dims, bias=False)
+        self.v = nn.Linear(attn_dims, 1, bias=False)
+
+    def forward(self, encoder_seq_proj, query, t):
+
+        # print(encoder_seq_proj.shape)
+        # Transform the query vector
+        query_proj = self.W(query).unsqueeze(1)
+
+        # Compute the scores
+        u = self.v(torch.tanh(encoder_seq_proj + query_proj))
+        scores = F.softmax(u, dim=1)
+
+        return scores.transpose(1, 2)
+
+
+class LSA(nn.Module):
+    def __init__(self, attn_dim, kernel_size=31, filters=32):
+        super().__init__()
+        self.conv = nn.Conv1d(1, filters, padding=(kernel_size - 1) // 2, kernel_size=kernel_size, bias=True)
+        self.L = nn.Linear(filters, attn_dim, bias=False)
+        self.W = nn.Linear(attn_dim, attn_dim, bias=True) # Include the attention bias in this term
+        self.v = nn.Linear(attn_dim, 1, bias=False)
+        self.cumulative = None
+        self.attention = None
+
+    def init_attention(self, encoder_seq_proj):
+        b, t, c = encoder_seq_proj.size()
+        self.cumulative = torch.zeros(b, t, device=encoder_seq_proj.device)
+        self.attention = torch.zeros(b, t, device=encoder_seq_proj.device)
+
+    def forward(self, encoder_seq_proj, query, t, chars):
+
+        if t == 0: self.init_attention(encoder_seq_proj)
+
+        processed_query = self.W(query).unsqueeze(1)
+
+        location = self.cumulative.unsqueeze(1)
+        processed_loc = self.L(self.conv(location).transpose(1, 2))
+
+        u = self.v(torch.tanh(processed_query + encoder_seq_proj + processed_loc))
+        u = u.squeeze(-1)
+
+        # Mask zero padding chars
+        u = u * (chars != 0).float()
+
+        # Smooth Attention
+        # scores = torch.sigmoid(u) / torch.sigmoid(u).sum(dim=1, keepdim=True)
+        scores = F.softmax(u, dim=1)
+        self.attention = scores
+        self.cumulative = self.cumulative + self.attention
+
+        return scores.unsqueeze(-1).transpose(1, 2)
+
+
+class Decoder(nn.Module):
+    # Class variable because its value doesn't change between classes
+    # yet ought to be scoped by class because its a property of a Decoder
+    max_r = 20
+    def __init__(self, n_mels, encoder_dims, decoder_dims, lstm_dims,
+                 dropout, speaker_embedding_size):
+        super().__init__()
+        self.register_buffer("r", torch.tensor(1, dtype=torch.int))
+        self.n_mels = n_mels
+        prenet_dims = (decoder_dims * 2, decoder_dims * 2)
+        self.prenet = PreNet(n_mels, fc1_dims=prenet_dims[0], fc2_dims=prenet_dims[1],
+                             dropout=dropout)
+        self.attn_net = LSA(decoder_dims)
+        self.attn_rnn = nn.GRUCell(encoder_dims + prenet_dims[1] + speaker_embedding_size, decoder_dims)
+        self.rnn_input = nn.Linear(encoder_dims + decoder_dims + speaker_embedding_size, lstm_dims)
+        self.res_rnn1 = nn.LSTMCell(lstm_dims, lstm_dims)
+        self.res_rnn2 = nn.LSTMCell(lstm_dims, lstm_dims)
+        self.mel_proj = nn.Linear(lstm_dims, n_mels * self.max_r, bias=False)
+        self.stop_proj = nn.Linear(encoder_dims + speaker_embedding_size + lstm_dims, 1)
+
+    def zoneout(self, prev, current, p=0.1):
+        mask = torch.zeros(prev.size(), device=prev.device).bernoulli_(p)
+        return prev * mask + current * (1 - mask)
+
+    def forward(self, encoder_seq, encoder_seq_proj, prenet_in,
+                hidden_states, cell_states, context_vec, t, chars):
+
+        # Need this for reshaping mels
+        batch_size = encoder_seq.size(0)
+
+        # Unpack the hidden and cell states
+        attn_hidden, rnn1_hidden, rnn2_hidden = hidden_states
+        rnn1_cell, rnn2_cell = cell_states
+
+        # PreNet for the Attention RNN
+        prenet_out = self.prenet(prenet_in)
+
+        # Compute the Attention RNN hidden state
+        attn_rnn_in = torch.cat([context_vec, prenet_out], dim=-1)
+        attn_hidden = self.attn_rnn(attn_rnn_in.squeeze(1), attn_hidden)
+
+        # Compute the attention scores
+        scores = self.attn_net(encoder_seq_proj, attn_hidden, t, chars)
+
+        # Dot product to create the context vector
+        context_vec = scores @ encoder_seq
+        context_vec = context_vec.squeeze(1)
+
+        # Concat Attention RNN output w. Context Vector & project
+        x = torch.cat([context_vec, attn_hidden], dim=1)
+        x = self.rnn_input(x)
+
+        # Compute first Residual RNN
+        rnn1_hidden_next, rnn1_cell = self.res_rnn1(x, (rnn1_hidden, rnn1_cell))
+        if self.training:
+            rnn1_hidden = self.zoneout(rnn1_hidden, rnn1_hidden_next)
+        else:
+            rnn1_hidden = rnn1_hidden_next
+        x = x + rnn1_hidden
+
+        # Compute second Residual RNN
+        rnn2_hidden_next, rnn2_cell = self.res_rnn2(x, (rnn2_hidden, rnn2_cell))
+        if self.training:
+            rnn2_hidden = self.zoneout(rnn2_hidden, rnn2_hidden_next)
+        else:
+            rnn2_hidden = rnn2_hidden_next
+        x = x + rnn2_hidden
+
+        # Project Mels
+        mels = self.mel_proj(x)
+        mels = mels.view(batch_size, self.n_mels, self.max_r)[:, :, :self.r]
+        hidden_states = (attn_hidden, rnn1_hidden, rnn2_hidden)
+        cell_states = (rnn1_cell, rnn2_cell)
+
+        # Stop token prediction
+        s = torch.cat((x, context_vec), dim=1)
+        s = self.stop_proj(s)
+        stop_tokens = torch.sigmoid(s)
+
+        return mels, scores, hidden_states, cell_states, context_vec, stop_tokens
+
+
+class InferenceDecoder(nn.Module):
+    """
+    The decoder loop of Tacotron.generate() for the current weights and reduction factor of a
+    Decoder. It shares the modules of the decoder, but only keeps the mel projection weights of
+    the first r frames, so that each step does not project max_r frames to discard most of them.
+
+    The speaker embedding is the same for every character of the encoder output and the
+    attention scores sum to one, so the speaker part of the context vector is the speaker
+    embedding itself, except for the initial context vector which is zero. Its contributions to
+    the encoder projection, the attention RNN, the RNN input and the stop token projection are
+    computed once per request as biases, and the decoder steps only see the encoder part of the
+    context vector. The encoder output is thus independent of the speaker, and a single encoded
+    text can be decoded with a batch of speaker embeddings. This module can be compiled with
+    torch.jit.script().
+    """
+    def __init__(self, decoder: Decoder, encoder_proj: nn.Linear, encoder_dims: int):
+        super().__init__()
+        self.r = decoder.r.item()
+        self.n_mels = decoder.n_mels
+        self.prenet = decoder.prenet
+        self.attn_conv = decoder.attn_net.conv
+        self.attn_conv_padding = (decoder.attn_net.conv.kernel_size[0] - 1) // 2
+        self.attn_L = decoder.attn_net.L
+        self.attn_W = decoder.attn_net.W
+        self.attn_v = decoder.attn_net.v
+        self.res_rnn1 = decoder.res_rnn1
+        self.res_rnn2 = decoder.res_rnn2
+
+        with torch.no_grad():
+            mel_proj = decoder.mel_proj.weight.view(self.n_mels, decoder.max_r, -1)[:, :self.r]
+            self.register_buffer("mel_proj", mel_proj.reshape(self.n_mels * self.r, -1).clone())
+
+            # Split the weights applied to the speaker part of the context vector, which comes
+            # right after its encoder part, from the others
+            lstm_dims = decoder.rnn_input.out_features
+            for name, weight, start in (
+                    ("encoder_proj", encoder_proj.weight, encoder_dims),
+                    ("attn_rnn_ih", decoder.attn_rnn.weight_ih, encoder_dims),
+                    ("rnn_input", decoder.rnn_input.weight, encoder_dims),
+                    ("stop_proj", decoder.stop_proj.weight, lstm_dims + encoder_dims)):
+                end = start + encoder_proj.in_features - encoder_dims
+                self.register_buffer(name, torch.cat((weight[:, :start], weight[:, end:]), 1))
+                self.register_buffer("speaker_" + name, weight[:, start:end].clone())
+
+            self.register_buffer("attn_rnn_hh", decoder.attn_rnn.weight_hh.clone())
+            self.register_buffer("attn_rnn_ih_bias", decoder.attn_rnn.bias_ih.clone())
+            self.register_buffer("attn_rnn_hh_bias", decoder.attn_rnn.bias_hh.clone())
+            self.register_buffer("rnn_input_bias", decoder.rnn_input.bias.clone())
+            self.register_buffer("stop_proj_bias", decoder.stop_proj.bias.clone())
+
+    @torch.jit.export
+    def project(self, encoder_seq: torch.Tensor, speaker_embedding: torch.Tensor) \
+            -> Tuple[torch.Tensor, List[torch.Tensor]]:
+        """
+        Computes what the decoder steps need from the encoder output and the speaker embedding.
+
+        :param encoder_seq: the encoder output without the speaker embedding, of shape
+        (batch_size, num_chars, encoder_dims), or (1, num_chars, encoder_dims) to use the same
+        text for the whole batch
+        :param speaker_embedding: the speaker embeddings of shape (batch_size,
+        speaker_embedding_size)
+        :return: the projected encoder output, and the speaker terms of the attention query (its
+        share of the encoder projection), of the attention RNN input gates, of the RNN input and
+        of the stop token projection
+        """
+        encoder_seq_proj = F.linear(encoder_seq, self.encoder_proj)
+        speaker_terms = [
+            F.linear(speaker_embedding, self.speaker_encoder_proj, self.attn_W.bias),
+            F.linear(speaker_embedding, self.speaker_attn_rnn_ih, self.attn_rnn_ih_bias),
+            F.linear(speaker_embedding, self.speaker_rnn_input, self.rnn_input_bias),
+            F.linear(speaker_embedding, self.speaker_stop_proj, self.stop_proj_bias),
+        ]
+        return encoder_seq_proj, speaker_terms
+
+    @torch.jit.export
+    def init_state(self, encoder_seq: torch.Tensor, batch_size: int) -> List[torch.Tensor]:
+        """
+        Returns the decoder state before the first step: the <GO> frame, the hidden and cell
+        states of the RNNs, the encoder part of the context vector, the cumulative attention, the
+        bias of the attention RNN input gates, which has no speaker term yet, the position of the
+        attention peak and the furthest position it has reached once tracked, see step().
+        """
+        _, num_chars, encoder_dims = encoder_seq.size()
+        device = encoder_seq.device
+        go_frame = torch.zeros(batch_size, self.n_mels, device=device)
+        attn_hidden = torch.zeros(batch_size, self.attn_rnn_hh.size(1), device=device)
+        rnn1_hidden = torch.zeros(batch_size, self.res_rnn1.hidden_size, device=device)
+        rnn2_hidden = torch.zeros(batch_size, self.res_rnn2.hidden_size, device=device)
+        rnn1_cell = torch.zeros(batch_size, self.res_rnn1.hidden_size, device=device)
+        rnn2_cell = torch.zeros(batch_size, self.res_rnn2.hidden_size, device=device)
+        context_vec = torch.zeros(batch_size, encoder_dims, device=device)
+        cumulative = torch.zeros(batch_size, num_chars, device=device)
+        attn_rnn_bias = self.attn_rnn_ih_bias.expand(batch_size, -1)
+        attn_peak = torch.zeros(batch_size, dtype=torch.long, device=device)
+        attn_furthest = torch.zeros(batch_size, dtype=torch.long, device=device)
+        return [go_frame, attn_hidden, rnn1_hidden, rnn2_hidden, rnn1_cell, rnn2_cell,
+                context_vec, cumulative, attn_rnn_bias, attn_peak, attn_furthest]
+
+    def _full_attention(self, encoder_seq: torch.Tensor, encoder_seq_proj: torch.Tensor,
+                        char_mask: torch.Tensor, processed_query: torch.Tensor,
+                        cumulative: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        # Location sensitive attention over the whole text, see LSA. Returns the scores and the
+        # encoder part of the context vector.
+        location = cumulative.unsqueeze(1)
+        processed_loc = self.attn_L(self.attn_conv(location).transpose(1, 2))
+        u = self.attn_v(torch.tanh(processed_query + encoder_seq_proj + processed_loc))
+        u = u.squeeze(-1) * char_mask
+        scores = F.softmax(u, dim=1)
+        context_vec = scores.unsqueeze(-1).transpose(1, 2) @ encoder_seq
+        return scores, context_vec.squeeze(1)
+
+    def _windowed_attention(self, encoder_seq: torch.Tensor, encoder_seq_proj: torch.Tensor,
+                            char_mask: torch.Tensor, processed_query: torch.Tensor,
+                            cumulative: torch.Tensor, start: torch.Tensor, window: int) \
+            -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        # Location sensitive attention over the characters [start, start + window) of each item,
+        # as if the characters outside had an attention score of zero. Returns the scores and
+        # positions of the window, and the encoder part of the context vector.
+        batch_size = processed_query.size(0)
+        positions = start.unsqueeze(1) + torch.arange(window, device=start.device)
+
+        # The location features of the window depend on the cumulative attention around it
+        pad = self.attn_conv_padding
+        location = F.pad(cumulative, (pad, pad))
+        location = location.gather(1, start.unsqueeze(1) +
+                                   torch.arange(window + 2 * pad, device=start.device))
+        location = F.conv1d(location.unsqueeze(1), self.attn_conv.weight, self.attn_conv.bias)
+        processed_loc = self.attn_L(location.transpose(1, 2))
+
+        # Gather the encoder outputs of the window, which may be shared by the whole batch
+        proj_positions = positions.unsqueeze(2).expand(-1, -1, encoder_seq_proj.size(2))
+        window_seq_proj = encoder_seq_proj.expand(batch_size, -1, -1).gather(1, proj_positions)
+        seq_positions = positions.unsqueeze(2).expand(-1, -1, encoder_seq.size(2))
+        window_seq = encoder_seq.expand(batch_size, -1, -1).gather(1, seq_positions)
+        window_mask = char_mask.expand(batch_size, -1).gather(1, positions)
+
+        u = self.attn_v(torch.tanh(processed_query + window_seq_proj + processed_loc))
+        u = u.squeeze(-1) * window_mask
+        scores = F.softmax(u, dim=1)
+        context_vec = scores.unsqueeze(-1).transpose(1, 2) @ window_seq
+        return scores, positions, context_vec.squeeze(1)
+
+    @torch.jit.export
+    def step(self, encoder_seq: torch.Tensor, encoder_seq_proj: torch.Tensor,
+             char_mask: torch.Tensor, speaker_terms: List[torch.Tensor],
+             state: List[torch.Tensor], attention_window: int = 0,
+             track_furthest: bool = True) \
+            -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, List[torch.Tensor]]:
+        """
+        Runs one decoder step, as Decoder.forward() does in eval mode.
+
+        :param attention_window: if positive and shorter than the text, the attention only
+        considers this many characters around the previous attention peak. If the new peak falls
+        on the edge of that window, the step falls back to attending to the whole text.
+        :param track_furthest: whether the new attention peak updates the furthest position
+        reached, see attention_failed(). The decoder loops only track it once the attention has
+        settled, so that noisy peaks of the first steps are not taken for backtracks.
+        :return: the mel frames of shape (batch_size, n_mels, r), the attention scores of shape
+        (batch_size, num_chars), the stop tokens of shape (batch_size,) and the next state
+        """
+        prenet_in, attn_hidden, rnn1_hidden, rnn2_hidden, rnn1_cell, rnn2_cell, context_vec, \
+            cumulative, attn_rnn_bias, attn_peak, attn_furthest = state
+        query_speaker, attn_rnn_speaker, rnn_input_speaker, stop_proj_speaker = speaker_terms
+        batch_size = prenet_in.size(0)
+
+        # PreNet and Attention RNN, a GRU cell
+        prenet_out = self.prenet(prenet_in)
+        attn_rnn_in = torch.cat([context_vec, prenet_out], dim=-1)
+        gates_i = torch.addmm(attn_rnn_bias, attn_rnn_in, self.attn_rnn_ih.t())
+        gates_h = torch.addmm(self.attn_rnn_hh_bias, attn_hidden, self.attn_rnn_hh.t())
+        i_r, i_z, i_n = gates_i.chunk(3, 1)
+        h_r, h_z, h_n = gates_h.chunk(3, 1)
+        reset_gate = torch.sigmoid(i_r + h_r)
+        update_gate = torch.sigmoid(i_z + h_z)
+        new_gate = torch.tanh(i_n + reset_gate * h_n)
+        attn_hidden = (attn_hidden - new_gate) * update_gate + new_gate
+
+        # Location sensitive attention, see LSA
+        processed_query = torch.addmm(query_speaker, attn_hidden, self.attn_W.weight.t())
+        processed_query = processed_query.unsqueeze(1)
+        num_chars = cumulative.size(1)
+        if 0 < attention_window < num_chars:
+            start = (attn_peak - attention_window // 2).clamp(0, num_chars - attention_window)
+            window_scores, positions, context_vec = self._windowed_attention(
+                encoder_seq, encoder_seq_proj, char_mask, processed_query, cumulative, start,
+                attention_window)
+
+            # Fall back to the whole text if the peak may have moved out of the window
+            window_peak = window_scores.argmax(dim=1)
+            escaped = ((window_peak == 0) & (start > 0)) | \
+                      ((window_peak == attention_window - 1) &
+                       (start < num_chars - attention_window))
+            if bool(escaped.any()):
+                scores, context_vec = self._full_attention(
+                    encoder_seq, encoder_seq_proj, char_mask, processed_query, cumulative)
+            else:
+                scores = torch.zeros_like(cumulative).scatter_(1, positions, window_scores)
+        else:
+            scores, context_vec = self._full_attention(
+                encoder_seq, encoder_seq_proj, char_mask, processed_query, cumulative)
+        cumulative = cumulative + scores
+        attn_peak = scores.argmax(dim=1)
+        if track_furthest:
+            attn_furthest = torch.maximum(attn_furthest, attn_peak)
+
+        # Residual RNNs
+        x = torch.cat([context_vec, attn_hidden], dim=1)
+        x = torch.addmm(rnn_input_speaker, x, self.rnn_input.t())
+        rnn1_hidden, rnn1_cell = self.res_rnn1(x, (rnn1_hidden, rnn1_cell))
+        x = x + rnn1_hidden
+        rnn2_hidden, rnn2_cell = self.res_rnn2(x, (rnn2_hidden, rnn2_cell))
+        x = x + rnn2_hidden
+
+        # Mels and stop token
+        mels = F.linear(x, self.mel_proj).view(batch_size, self.n_mels, self.r)
+        s = torch.cat((x, context_vec), dim=1)
+        stop_tokens = torch.sigmoid(torch.addmm(stop_proj_speaker, s, self.stop_proj.t()))
+
+        state = [mels[:, :, -1], attn_hidden, rnn1_hidden, rnn2_hidden, rnn1_cell, rnn2_cell,
+                 context_vec, cumulative, attn_rnn_speaker, attn_peak, attn_furthest]
+        return mels, scores, stop_tokens.squeeze(1), state
+
+    @torch.jit.export
+    def attention_failed(self, state: List[torch.Tensor], text_lengths: torch.Tensor,
+                         stall_steps: float, max_backtrack: int) -> torch.Tensor:
+        """
+        Tells which items of the batch have lost their alignment with the text: those whose
+        attention peak has gathered more than stall_steps decoder steps of attention on a
+        character before the last two of their text (the final symbol and the end of sequence
+        token, where the attention rests until the stop token), and those whose attention peak
+        has jumped back more than max_backtrack characters from the furthest one it reached.
+        Either check is disabled if its threshold is not positive.
+
+        :param text_lengths: the number of characters of each item, without the padding
+        :return: a boolean tensor of shape (batch_size,)
+        """
+        cumulative, attn_peak, attn_furthest = state[7], state[9], state[10]
+        failed = torch.zeros_like(attn_peak, dtype=torch.bool)
+        if stall_steps > 0:
+            peak_attention = cumulative.gather(1, attn_peak.unsqueeze(1)).squeeze(1)
+            failed = failed | ((peak_attention > stall_steps) & (attn_peak < text_lengths - 2))
+        if max_backtrack > 0:
+            failed = failed | (attn_peak < attn_furthest - max_backtrack)
+        return failed
+
+    def forward(self, encoder_seq: torch.Tensor, speaker_embedding: torch.Tensor,
+                chars: torch.Tensor, steps: int, attention_window: int = 0,
+                max_frames_per_char: float = 0., stall_frames: int = 0, max_backtrack: int = 0) \
+            -> Tuple[torch.Tensor, torch.Tensor, List[int], List[bool]]:
+        """
+        Decodes a batch until each item's stop token exceeds 0.5 past the tenth step, or for
+        steps frames. Items that have ended are removed from the batch. Items are aborted if
+        they reach max_frames_per_char frames per character of their text, or if their attention
+        fails past the tenth step, see attention_failed().
+
+        :param encoder_seq: the encoder output without the speaker embedding. It and chars may
+        have a batch size of 1 to use the same text for all speaker embeddings.
+        :param attention_window: see step()
+        :param max_frames_per_char: the frame budget per character, or 0 for no budget
+        :param stall_frames: the number of frames after which the attention has stalled on a
+        character, or 0 to disable the check
+        :param max_backtrack: the number of characters after which a backward jump of the
+        attention fails, or 0 to disable the check
+        :return: the mel spectrograms of shape (batch_size, n_mels, max_length), the attention
+        scores of shape (batch_size, decoder_steps, num_chars), the length of each item and
+        whether each item was aborted rather than ended by its stop token
+        """
+        batch_size = speaker_embedding.size(0)
+        num_chars = chars.size(1)
+        r = self.r
+        device = encoder_seq.device
+        encoder_seq_proj, speaker_terms = self.project(encoder_seq, speaker_embedding)
+        state = self.init_state(encoder_seq, batch_size)
+        char_mask = (chars != 0).float()
+        text_lengths = (chars != 0).sum(dim=1)
+
+        # Items run out of frames at their budget, and the loop ends at the largest one
+        if max_frames_per_char > 0:
+            frame_budgets = torch.ceil(text_lengths * max_frames_per_char)
+            steps = min(steps, int(frame_budgets.max()))
+        else:
+            frame_budgets = torch.full((1,), float(steps), device=device)
+
+        # Outputs are written in place, at the rows of the items still being decoded
+        n_steps = (steps + r - 1) // r
+        mel_outputs = torch.zeros(batch_size, self.n_mels, n_steps * r, device=device)
+        attn_scores = torch.zeros(batch_size, n_steps, num_chars, device=device)
+        lengths = [n_steps * r] * batch_size
+        aborted = [True] * batch_size
+        active = torch.arange(batch_size, device=device)
+
+        for i in range(n_steps):
+            t = i * r
+            mel_frames, scores, stop_tokens, state = \
+                self.step(encoder_seq, encoder_seq_proj, char_mask, speaker_terms, state,
+                          attention_window, t > 10)
+            if active.size(0) == batch_size:
+                mel_outputs[:, :, t:t + r] = mel_frames
+                attn_scores[:, i] = scores
+            else:
+                mel_outputs[active, :, t:t + r] = mel_frames
+                attn_scores[active, i] = scores
+
+            # Items end when their stop token exceeds the threshold, and are aborted when they
+            # run out of frames or their attention fails
+            stopped = torch.zeros_like(stop_tokens, dtype=torch.bool)
+            ended = (t + r >= frame_budgets).expand_as(stopped)
+            if t > 10:
+                stopped = stop_tokens > 0.5
+                ended = ended | stopped | self.attention_failed(
+                    state, text_lengths, stall_frames / r, max_backtrack)
+            if bool(ended.any()):
+                ended_rows: List[int] = active[ended].tolist()
+                stopped_rows: List[int] = active[stopped].tolist()
+                for row in ended_rows:
+                    lengths[row] = t + r
+                for row in stopped_rows:
+                    aborted[row] = False
+                if bool(ended.all()):
+                    break
+
+                # Remove the ended items from the batch. Tensors with a batch dimension of 1
+                # are broadcast over the batch and are left as they are.
+                keep = torch.nonzero(~ended).squeeze(1)
+                active = active[keep]
+                state = [x[keep] for x in state]
+                speaker_terms = [x[keep] for x in speaker_terms]
+                if encoder_seq.size(0) != 1:
+                    encoder_seq = encoder_seq[keep]
+                    encoder_seq_proj = encoder_seq_proj[keep]
+                    char_mask = char_mask[keep]
+                    text_lengths = text_lengths[keep]
+                if frame_budgets.size(0) != 1:
+                    frame_budgets = frame_budgets[keep]
+
+        max_length = max(lengths)
+        mel_outputs = mel_outputs[:, :, :max_length]
+        attn_scores = attn_scores[:, :(max_length + r - 1) // r]
+        return mel_outputs, attn_scores, lengths, aborted
+
+
+@torch.inference_mode()
+def cbhg_max_abs_diff(cbhg: CBHG, inference_cbhg: InferenceCBHG, batch_size=2, seq_len=64):
+    """
+    Returns the largest absolute difference between the outputs of a CBHG in eval mode and of
+    an InferenceCBHG built from it, on a random input. The CBHG is left in eval mode.
+    """
+    in_channels = cbhg.conv1d_bank[0].conv.in_channels
+    device = inference_cbhg.bank_scale.device
+    generator = torch.Generator(device=device).manual_seed(0)
+    x = torch.randn(batch_size, in_channels, seq_len, generator=generator, device=device)
+    cbhg.eval()
+    return (cbhg(x) - inference_cbhg(x)).abs().max().item()
+
+
+class Tacotron(nn.Module):
+    def __init__(self, embed_dims, num_chars, encoder_dims, decoder_dims, n_mels, 
+                 fft_bins, postnet_dims, encoder_K, lstm_dims, postnet_K, num_highways,
+                 dropout, stop_threshold, speaker_embedding_size):
+        super().__init__()
+        self.n_mels = n_mels
+        self.lstm_dims = lstm_dims
+        self.encoder_dims = encoder_dims
+        self.decoder_dims = decoder_dims
+        self.speaker_embedding_size = speaker_embedding_size
+        self.encoder = Encoder(embed_dims, num_chars, encoder_dims,
+                               encoder_K, num_highways, dropout)
+        self.encoder_proj = nn.Linear(encoder_dims + speaker_embedding_size, decoder_dims, bias=False)
+        self.decoder = Decoder(n_mels, encoder_dims, decoder_dims, lstm_dims,
+                               dropout, speaker_embedding_size)
+        self.postnet = CBHG(postnet_K, n_mels, postnet_dims,
+                            [postnet_dims, fft_bins], num_highways)
+        self.post_proj = nn.Linear(postnet_dims, fft_bins, bias=False)
+
+        self.init_model()
+        self.num_params()
+
+        self.register_buffer("step", torch.zeros(1, dtype=torch.long))
+        self.register_buffer("stop_threshold", torch.tensor(stop_threshold, dtype=torch.float32))
+        self._inference_decoder = None
+        self._script_cache_fpath = None
+
+    @property
+    def r(self):
+        return self.decoder.r.item()
+
+    @r.setter
+    def r(self, value):
+        self.decoder.r = self.decoder.r.new_tensor(value, requires_grad=False)
+        self.prepare_inference(self._script_cache_fpath)
+
+    def forward(self, x, m, speaker_embedding):
+        device = next(self.parameters()).device  # use same device as parameters
+
+        self.step += 1
+        batch_size, _, steps  = m.size()
+        hidden_states, cell_states, go_frame, context_vec = \
+            self._init_decoder_states(batch_size, device)
+
+        # SV2TTS: Run the encoder with the speaker embedding
+        # The projection avoids unnecessary matmuls in the decoder loop
+        encoder_seq = self.encoder(x, speaker_embedding)
+        encoder_seq_proj = self.encoder_proj(encoder_seq)
+
+        # Need a couple of lists for outputs
+        mel_outputs, attn_scores, stop_outputs = [], [], []
+
+        # Run the decoder loop
+        for t in range(0, steps, self.r):
+            prenet_in = m[:, :, t - 1] if t > 0 else go_frame
+            mel_frames, scores, hidden_states, cell_states, context_vec, stop_tokens = \
+                self.decoder(encoder_seq, encoder_seq_proj, prenet_in,
+                             hidden_states, cell_states, context_vec, t, x)
+            mel_outputs.append(mel_frames)
+            attn_scores.append(scores)
+            stop_outputs.extend([stop_tokens] * self.r)
+
+        # Concat the mel outputs into sequence
+        mel_outputs = torch.cat(mel_outputs, dim=2)
+
+        # Post-Process for Linear Spectrograms
+        postnet_out = self.postnet(mel_outputs)
+        linear = self.post_proj(postnet_out)
+        linear = linear.transpose(1, 2)
+
+        # For easy visualisation
+        attn_scores = torch.cat(attn_scores, 1)
+        # attn_scores = attn_scores.cpu().data.numpy()
+        stop_outputs = torch.cat(stop_outputs, 1)
+
+        return mel_outputs, linear, attn_scores, stop_outputs
+
+    @torch.inference_mode()
+    def encode(self, x):
+        """
+        Runs the text encoder on a batch of character sequences. Its output does not depend on
+        the speaker and can be passed to generate(). The encoder prenet applies dropout, so the
+        output is a random sample.
+
+        :param x: the character ids as a tensor of shape (batch_size, num_chars)
+        :return: the encoder output as a tensor of shape (batch_size, num_chars, encoder_dims)
+        """
+        self.eval()
+        encoder_seq = self.encoder(x)
+        self.train()
+        return encoder_seq
+
+    @torch.inference_mode()
+    def generate(self, x, speaker_embedding=None, steps=2000, return_info=False,
+                 encoder_seq=None, attention_window=0, max_frames_per_char=0., stall_frames=0,
+                 max_backtrack=0):
+        """
+        Generates the mel spectrograms of a batch of character sequences.
+
+        Each item ends at the first decoder step past the tenth whose stop token exceeds 0.5.
+        Items that have ended are removed from the batch, so the decoder only keeps running on
+        the items still being decoded, and the postnet runs over each item's own length. An item
+        whose attention never reaches the end of its text would otherwise run for all the steps:
+        it is aborted when it runs out of its budget of frames per character, or when its
+        attention stalls or jumps back, see InferenceDecoder.attention_failed(). This runs in
+        inference mode, so the outputs cannot be used to compute gradients.
+
+        :param x: the character ids as a tensor of shape (batch_size, num_chars), or (1,
+        num_chars) to synthesize the same text for all speaker embeddings. The text is then
+        encoded once and shared by all items of the batch.
+        :param speaker_embedding: the speaker embeddings as a tensor of shape (batch_size,
+        speaker_embedding_size)
+        :param steps: the maximum number of frames to generate
+        :param return_info: if True, also returns a dict with the number of frames of each item
+        as a list of ints under "lengths", and whether each item was aborted rather than ended
+        by its stop token as a list of bools under "aborted"
+        :param encoder_seq: the output of encode() for x, if already computed
+        :param attention_window: if positive, texts longer than this many characters are
+        decoded with windowed attention, see InferenceDecoder.step()
+        :param max_frames_per_char: if positive, the maximum number of frames to generate per
+        character of each text
+        :param stall_frames: if positive, the number of frames of attention on a character after
+        which the attention has stalled
+        :param max_backtrack: if positive, the number of characters the attention may jump back
+        :return: the decoder and postnet mel spectrograms as tensors of shape (batch_size, n_mels,
+        max_length), and the attention scores as a tensor of shape (batch_size, decoder_steps,
+        num_chars). Outputs past the end of an item are zeros.
+        """
+        self.eval()
+        device = next(self.parameters()).device  # use same device as parameters
+        batch_size = speaker_embedding.size(0)
+
+        # SV2TTS: The decoder adds the speaker embedding to the encoder output
+        if encoder_seq is None:
+            encoder_seq = self.encoder(x)
+
+        # Run the decoder loop
+        mel_outputs, attn_scores, lengths, aborted = self.inference_decoder()(
+            encoder_seq, speaker_embedding, x, steps, attention_window, float(max_frames_per_char),
+            stall_frames, max_backtrack)
+        max_length = max(lengths)
+
+        # Post-Process for Linear Spectrograms, over each item's length. Items of the same length
+        # are processed together.
+        linear = torch.zeros(batch_size, self.post_proj.out_features, max_length, device=device)
+        for length in set(lengths):
+            rows = [row for row in range(batch_size) if lengths[row] == length]
+            postnet_out = self.postnet(mel_outputs[rows, :, :length])
+            linear[rows, :, :length] = self.post_proj(postnet_out).transpose(1, 2)
+
+        self.train()
+
+        if return_info:
+            return mel_outputs, linear, attn_scores, {"lengths": lengths, "aborted": aborted}
+        return mel_outputs, linear, attn_scores
+
+    @torch.inference_mode()
+    def generate_stream(self, x, speaker_embedding=None, steps=2000, chunk_steps=20,
+                        left_context=20, right_context=20, crossfade=10, attention_window=0,
+                        max_frames_per_char=0., stall_frames=0, max_backtrack=0):
+        """
+        Generates the mel spectrogram of a single character sequence chunk by chunk, so that
+        vocoding can start before the whole spectrogram is decoded.
+
+        The decoder runs as in generate(). Every chunk_steps decoder steps, once right_context
+        frames past the end of the chunk are available, the postnet runs over the chunk with up
+        to left_context frames before it and right_context frames after it. The first crossfade
+        frames of each chunk are cross-faded with the postnet output of the previous window over
+        the same frames. The postnet is bidirectional, so the chunks only approximate the
+        output of generate().
+
+        :param x: the character ids as a tensor of shape (1, num_chars)
+        :param speaker_embedding: the speaker embedding as a tensor of shape (1,
+        speaker_embedding_size)
+        :param steps: the maximum number of frames to generate
+        :param chunk_steps: the number of decoder steps per chunk
+        :param left_context: the number of frames before a chunk given to the postnet
+        :param right_context: the number of frames after a chunk given to the postnet. Must be
+        at least crossfade.
+        :param crossfade: the number of frames over which consecutive chunks are cross-faded
+        :param attention_window: see generate()
+        :param max_frames_per_char: see generate()
+        :param stall_frames: see generate()
+        :param max_backtrack: see generate()
+        :return: a generator of postnet mel spectrogram chunks as tensors of shape (1, n_mels,
+        frames). Their concatenation is the full spectrogram.
+        """
+        if x.size(0) != 1:
+            raise ValueError("generate_stream() synthesizes a single sequence, got a batch of %d" %
+                             x.size(0))
+        if crossfade > right_context:
+            raise ValueError("The crossfade (%d frames) cannot be longer than the right context "
+                             "(%d frames)" % (crossfade, right_context))
+
+        self.eval()
+        try:
+            device = next(self.parameters()).device  # use same device as parameters
+            r = self.r
+            decoder = self.inference_decoder()
+
+            # SV2TTS: The decoder adds the speaker embedding to the encoder output
+            encoder_seq = self.encoder(x)
+            encoder_seq_proj, speaker_terms = decoder.project(encoder_seq, speaker_embedding)
+            state = decoder.init_state(encoder_seq, 1)
+            char_mask = (x != 0).float()
+            text_lengths = (x != 0).sum(dim=1)
+            if max_frames_per_char > 0:
+                steps = min(steps, int(np.ceil(text_lengths.item() * max_frames_per_char)))
+
+            n_steps = (steps + r - 1) // r
+            mel_outputs = torch.zeros(1, self.n_mels, n_steps * r, device=device)
+            chunk_size = chunk_steps * r
+            fade_in = (torch.arange(crossfade, device=device) + 0.5) / crossfade
+            emitted = 0
+            fade_tail = None
+
+            for t in range(0, steps, r):
+                mel_frames, _, stop_tokens, state = \
+                    decoder.step(encoder_seq, encoder_seq_proj, char_mask, speaker_terms, state,
+                                 attention_window, t > 10)
+                mel_outputs[:, :, t:t + r] = mel_frames
+                length = t + r
+                done = length >= n_steps * r
+                if t > 10 and not done:
+                    done = stop_tokens.item() > 0.5 or bool(decoder.attention_failed(
+                        state, text_lengths, stall_frames / r, max_backtrack))
+
+                # Emit every chunk whose right context has been decoded, and what is left at the end
+                while done or length >= emitted + chunk_size + right_context:
+                    # A generate() call on this model between two chunks leaves it in train mode
+                    self.eval()
+                    end = length if done else emitted + chunk_size
+                    start = max(0, emitted - left_context)
+                    stop = min(length, end + right_context)
+                    postnet_out = self.postnet(mel_outputs[:, :, start:stop])
+                    linear = self.post_proj(postnet_out).transpose(1, 2)[:, :, emitted - start:]
+
+                    chunk = linear[:, :, :end - emitted]
+                    if fade_tail is not None:
+                        n_fade = min(crossfade, chunk.size(2))
+                        w = fade_in[:n_fade]
+                        chunk[:, :, :n_fade] = fade_tail[:, :, :n_fade] * (1 - w) + \
+                                               chunk[:, :, :n_fade] * w
+                    fade_tail = linear[:, :, end - emitted:end - emitted + crossfade]
+                    emitted = end
+                    yield chunk
+                    if done:
+                        return
+        finally:
+            self.train()
+
+    def _init_decoder_states(self, batch_size, device):
+        # Need to initialise all hidden states and pack into tuple for tidyness
+        attn_hidden = torch.zeros(batch_size, self.decoder_dims, device=device)
+        rnn1_hidden = torch.zeros(batch_size, self.lstm_dims, device=device)
+        rnn2_hidden = torch.zeros(batch_size, self.lstm_dims, device=device)
+        hidden_states = (attn_hidden, rnn1_hidden, rnn2_hidden)
+
+        # Need to initialise all lstm cell states and pack into tuple for tidyness
+        rnn1_cell = torch.zeros(batch_size, self.lstm_dims, device=device)
+        rnn2_cell = torch.zeros(batch_size, self.lstm_dims, device=device)
+        cell_states = (rnn1_cell, rnn2_cell)
+
+        # Need a <GO> Frame for start of decoder loop
+        go_frame = torch.zeros(batch_size, self.n_mels, device=device)
+
+        # Need an initial context vector
+        context_vec = torch.zeros(batch_size, self.encoder_dims + self.speaker_embedding_size, device=device)
+
+        return hidden_states, cell_states, go_frame, context_vec
+
+    def prepare_inference(self, script_cache_fpath: Path = None):
+        """
+        Sets up the decoder loop of generate() and generate_stream() for the current weights and
+        reduction factor. It is set up again if they change later on: when r is set, in the same
+        mode, and when the weights change, in eager mode.
+
+        :param script_cache_fpath: if given, the decoder loop is compiled with TorchScript. The
+        compiled loop is loaded from this file, with the reduction factor appended to its name,
+        if it exists, otherwise it is saved there. If compiling or loading fails, the loop runs in
+        eager mode.
+        """
+        self._script_cache_fpath = script_cache_fpath
+        decoder = InferenceDecoder(self.decoder, self.encoder_proj, self.encoder_dims)
+        if script_cache_fpath is not None:
+            script_cache_fpath = Path(script_cache_fpath)
+            script_cache_fpath = script_cache_fpath.with_name("%s.r%d%s" % (
+                script_cache_fpath.stem, self.r, script_cache_fpath.suffix))
+            device = next(self.parameters()).device
+            try:
+                # TorchScript is deprecated in recent versions of torch, but still supported
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", FutureWarning)
+                    decoder = self._load_scripted_decoder(decoder, script_cache_fpath, device)
+            except Exception as e:
+                print("Could not script the decoder, running it in eager mode: %s" % e)
+        self._inference_decoder = (self._inference_key(), decoder)
+
+    def fuse_cbhgs(self, merge_bank=None, tolerance=1e-4):
+        """
+        Replaces the CBHGs of the encoder and of the postnet by InferenceCBHGs, which compute the
+        same outputs in eval mode with fewer operations. Each replacement is first checked
+        against the CBHG it replaces on a random input, and is skipped if their outputs differ
+        by more than the tolerance. The model should only be used for inference afterwards, and
+        checkpoints cannot be loaded into it anymore.
+
+        :param merge_bank: whether to merge the convolution banks into single convolutions, see
+        InferenceCBHG. Defaults to True on a GPU and to False on a CPU.
+        :return: the largest absolute difference between the outputs of each CBHG and its
+        replacement, as a dict keyed by "encoder" and "postnet"
+        """
+        if merge_bank is None:
+            merge_bank = next(self.parameters()).is_cuda
+        training = self.training
+        self.eval()
+        diffs = {}
+        for name, parent, attr in (("encoder", self.encoder, "cbhg"),
+                                   ("postnet", self, "postnet")):
+            cbhg = getattr(parent, attr)
+            if not isinstance(cbhg, CBHG):
+                continue
+            inference_cbhg = InferenceCBHG(cbhg, merge_bank)
+            diffs[name] = cbhg_max_abs_diff(cbhg, inference_cbhg)
+            if diffs[name] > tolerance:
+                print("The optimized %s CBHG differs from the original by %.1e, keeping the "
+                      "original" % (name, diffs[name]))
+            else:
+                setattr(parent, attr, inference_cbhg)
+        self.train(training)
+        return diffs
+
+    @staticmethod
+    def _load_scripted_decoder(decoder, script_cache_fpath, device):
+        if script_cache_fpath.exists():
+            return torch.jit.load(str(script_cache_fpath), map_location=device)
+        decoder = torch.jit.script(decoder)
+        try:
+            script_cache_fpath.parent.mkdir(parents=True, exist_ok=True)
+            torch.jit.save(decoder, str(script_cache_fpath))
+        except OSError as e:
+            print("Could not cache the scripted decoder in %s: %s" % (script_cache_fpath, e))
+        return decoder
+
+    def inference_decoder(self):
+        """
+        Returns the decoder loop used at inference, see prepare_inference().
+        """
+        if self._inference_decoder is None or \
+                self._inference_decoder[0] != self._inference_key():
+            self.prepare_inference()
+        return self._inference_decoder[1]
+
+    def _inference_key(self):
+        # Changes whenever the decoder weights or r are updated or moved
+        tensors = [self.decoder.r, *self.decoder.parameters(), *self.encoder_proj.parameters()]
+        return tuple((x._version, x.data_ptr()) for x in tensors)
+
+    def init_model(self):
+        for p in self.parameters():
+            if p.dim() > 1: nn.init.xavier_uniform_(p)
+
+    def get_step(self):
+        return self.step.data.item()
+
+    def reset_step(self):
+        # assignment to parameters or buffers is overloaded, updates internal dict entry
+        self.step = self.step.data.new_tensor(1)
+
+    def log(self, path, msg):
+        with open(path, "a") as f:
+            print(msg, file=f)
+
+    def load(self, path, optimizer=None):
+        # Use device of model params as location for loaded state
+        device = next(self.parameters()).device
+        checkpoint = torch.load(str(path), map_location=device)
+        self.load_state_dict(checkpoint["model_state"])
+        self.prepare_inference()
+
+        if "optimizer_state" in checkpoint and optimizer is not None:
+            optimizer.load_state_dict(checkpoint["optimizer_state"])
+
+    def save(self, path, optimizer=None):
+        if optimizer is not None:
+            torch.save({
+                "model_state": self.state_dict(),
+                "optimizer_state": optimizer.state_dict(),
+            }, str(path))
+        else:
+            torch.save({
+                "model_state": self.state_dict(),
+            }, str(path))
+
+
+    def num_params(self, print_out=True):
+        parameters = filter(lambda p: p.requires_grad, self.parameters())
+        parameters = sum([np.prod(p.size()) for p in parameters]) / 1_000_000
+        if print_out:
+            print("Trainable Parameters: %.3fM" % parameters)
+        return parameters
@@ -1,69 +1,157 @@
-import re
-import inflect
-
-
-_inflect = inflect.engine()
-_comma_number_re = re.compile(r"([0-9][0-9\,]+[0-9])")
-_decimal_number_re = re.compile(r"([0-9]+\.[0-9]+)")
-_pounds_re = re.compile(r"£([0-9\,]*[0-9]+)")
-_dollars_re = re.compile(r"\$([0-9\.\,]*[0-9]+)")
-_ordinal_re = re.compile(r"[0-9]+(st|nd|rd|th)")
-_number_re = re.compile(r"[0-9]+")
-
-
-def _remove_commas(m):
-    return m.group(1).replace(",", "")
-
-
-def _expand_decimal_point(m):
-    return m.group(1).replace(".", " point ")
-
-
-def _expand_dollars(m):
-    match = m.group(1)
-    parts = match.split(".")
-    if len(parts) > 2:
-        return match + " dollars"  # Unexpected format
-    dollars = int(parts[0]) if parts[0] else 0
-    cents = int(parts[1]) if len(parts) > 1 and parts[1] else 0
-    if dollars and cents:
-        dollar_unit = "dollar" if dollars == 1 else "dollars"
-        cent_unit = "cent" if cents == 1 else "cents"
-        return "%s %s, %s %s" % (dollars, dollar_unit, cents, cent_unit)
-    elif dollars:
-        dollar_unit = "dollar" if dollars == 1 else "dollars"
-        return "%s %s" % (dollars, dollar_unit)
-    elif cents:
-        cent_unit = "cent" if cents == 1 else "cents"
-        return "%s %s" % (cents, cent_unit)
-    else:
-        return "zero dollars"
-
-
-def _expand_ordinal(m):
-    return _inflect.number_to_words(m.group(0))
-
-
-def _expand_number(m):
-    num = int(m.group(0))
-    if num > 1000 and num < 3000:
-        if num == 2000:
-            return "two thousand"
-        elif num > 2000 and num < 2010:
-            return "two thousand " + _inflect.number_to_words(num % 100)
-        elif num % 100 == 0:
-            return _inflect.number_to_words(num // 100) + " hundred"
-        else:
-            return _inflect.number_to_words(num, andword="", zero="oh", group=2).replace(", ", " ")
-    else:
-        return _inflect.number_to_words(num, andword="")
-
-
-def normalize_numbers(text):
-    text = re.sub(_comma_number_re, _remove_commas, text)
-    text = re.sub(_pounds_re, r"\1 pounds", text)
-    text = re.sub(_dollars_re, _expand_dollars, text)
-    text = re.sub(_decimal_number_re, _expand_decimal_point, text)
-    text = re.sub(_ordinal_re, _expand_ordinal, text)
-    text = re.sub(_number_re, _expand_number, text)
-    return text
+import re
+
+
+_inflect = None
+_comma_number_re = re.compile(r"([0-9][0-9\,]+[0-9])")
+_decimal_number_re = re.compile(r"([0-9]+\.[0-9]+)")
+_pounds_re = re.compile(r"£([0-9\,]*[0-9]+)")
+_dollars_re = re.compile(r"\$([0-9\.\,]*[0-9]+)")
+_ordinal_re = re.compile(r"[0-9]+(st|nd|rd|th)")
+_number_re = re.compile(r"[0-9]+")
+
+# Words used to spell out numbers, as in inflect:
+_units = ["", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+_teens = ["ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen",
+          "eighteen", "nineteen"]
+_tens = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_scales = ["", "thousand", "million", "billion", "trillion", "quadrillion", "quintillion",
+           "sextillion", "septillion", "octillion", "nonillion", "decillion"]
+_ordinal_suffixes = {"ty": "tieth", "one": "first", "two": "second", "three": "third",
+                     "five": "fifth", "eight": "eighth", "nine": "ninth", "twelve": "twelfth"}
+_ordinal_suffix_re = re.compile(r"(%s)\Z" % "|".join(_ordinal_suffixes))
+
+
+def _inflect_engine():
+    # Only needed for numbers too large for number_to_words()
+    global _inflect
+    if _inflect is None:
+        import inflect
+        _inflect = inflect.engine()
+    return _inflect
+
+
+def _two_digits_to_words(num):
+    if num < 10:
+        return _units[num]
+    if num < 20:
+        return _teens[num - 10]
+    tens, units = divmod(num, 10)
+    return _tens[tens] + ("-" + _units[units] if units else "")
+
+
+def number_to_words(num, andword="and"):
+    """
+    Spells out a non-negative integer exactly as inflect's number_to_words() does, e.g.
+    1234567 -> "one million, two hundred and thirty-four thousand, five hundred and sixty-seven"
+    """
+    if num == 0:
+        return "zero"
+    if num >= 1000 ** len(_scales):
+        return _inflect_engine().number_to_words(num, andword=andword)
+
+    # Spell out each non-zero group of three digits, from the most significant one
+    groups = []
+    scale = 0
+    while num:
+        num, group = divmod(num, 1000)
+        if group:
+            groups.append((scale, group))
+        scale += 1
+    words = []
+    for scale, group in reversed(groups):
+        hundreds, rest = divmod(group, 100)
+        parts = []
+        if hundreds:
+            parts += [_units[hundreds], "hundred"]
+            if rest and andword:
+                parts.append(andword)
+        if rest:
+            parts.append(_two_digits_to_words(rest))
+        if scale:
+            parts.append(_scales[scale])
+        words.append(" ".join(parts))
+
+    # Groups are separated by commas, except for a last group below one hundred which is joined
+    # with the andword ("one thousand and seven")
+    last_scale, last_group = groups[0]
+    if len(words) > 1 and last_scale == 0 and last_group < 100:
+        joiner = " %s " % andword if andword else " "
+        return ", ".join(words[:-1]) + joiner + words[-1]
+    return ", ".join(words)
+
+
+def ordinal_to_words(num):
+    """
+    Spells out a non-negative integer as an ordinal, e.g. 101 -> "one hundred and first"
+    """
+    words = number_to_words(num)
+    ordinal = _ordinal_suffix_re.sub(lambda m: _ordinal_suffixes[m.group(1)], words)
+    return ordinal if ordinal != words else words + "th"
+
+
+def year_to_words(num):
+    """
+    Spells out a year as two pairs of digits, e.g. 1984 -> "nineteen eighty-four",
+    1905 -> "nineteen oh five". The last two digits must not both be zero.
+    """
+    high, low = divmod(num, 100)
+    return _two_digits_to_words(high) + " " + \
+        (_two_digits_to_words(low) if low >= 10 else "oh " + _units[low])
+
+
+def _remove_commas(m):
+    return m.group(1).replace(",", "")
+
+
+def _expand_decimal_point(m):
+    return m.group(1).replace(".", " point ")
+
+
+def _expand_dollars(m):
+    match = m.group(1)
+    parts = match.split(".")
+    if len(parts) > 2:
+        return match + " dollars"  # Unexpected format
+    dollars = int(parts[0]) if parts[0] else 0
+    cents = int(parts[1]) if len(parts) > 1 and parts[1] else 0
+    if dollars and cents:
+        dollar_unit = "dollar" if dollars == 1 else "dollars"
+        cent_unit = "cent" if cents == 1 else "cents"
+        return "%s %s, %s %s" % (dollars, dollar_unit, cents, cent_unit)
+    elif dollars:
+        dollar_unit = "dollar" if dollars == 1 else "dollars"
+        return "%s %s" % (dollars, dollar_unit)
+    elif cents:
+        cent_unit = "cent" if cents == 1 else "cents"
+        return "%s %s" % (cents, cent_unit)
+    else:
+        return "zero dollars"
+
+
+def _expand_ordinal(m):
+    return ordinal_to_words(int(m.group(0)[:-2]))
+
+
+def _expand_number(m):
+    num = int(m.group(0))
+    if num > 1000 and num < 3000:
+        if num == 2000:
+            return "two thousand"
+        elif num > 2000 and num < 2010:
+            return "two thousand " + number_to_words(num % 100)
+        elif num % 100 == 0:
+            return number_to_words(num // 100) + " hundred"
+        else:
+            return year_to_words(num)
+    else:
+        return number_to_words(num, andword="")
+
+
+def normalize_numbers(text):
+    text = re.sub(_comma_number_re, _remove_commas, text)
+    text = re.sub(_pounds_re, r"\1 pounds", text)
+    text = re.sub(_dollars_re, _expand_dollars, text)
+    text = re.sub(_decimal_number_re, _expand_decimal_point, text)
+    text = re.sub(_ordinal_re, _expand_ordinal, text)
+    text = re.sub(_number_re, _expand_number, text)
+    return text
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+# The tests import the packages of the repository from its root, as its scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def random_tacotron():
+    # A synthesizer model with the architecture of the hparams and random weights
+    from synthesizer.hparams import hparams
+    from synthesizer.models.tacotron import Tacotron
+    from synthesizer.utils.symbols import symbols
+    torch.manual_seed(0)
+    return Tacotron(embed_dims=hparams.tts_embed_dims,
+                    num_chars=len(symbols),
+                    encoder_dims=hparams.tts_encoder_dims,
+                    decoder_dims=hparams.tts_decoder_dims,
+                    n_mels=hparams.num_mels,
+                    fft_bins=hparams.num_mels,
+                    postnet_dims=hparams.tts_postnet_dims,
+                    encoder_K=hparams.tts_encoder_K,
+                    lstm_dims=hparams.tts_lstm_dims,
+                    postnet_K=hparams.tts_postnet_K,
+                    num_highways=hparams.tts_num_highways,
+                    dropout=hparams.tts_dropout,
+                    stop_threshold=hparams.tts_stop_threshold,
+                    speaker_embedding_size=hparams.speaker_embedding_size).eval()
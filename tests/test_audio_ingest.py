@@ -0,0 +1,16 @@
+from utils import audio_ingest
+from utils.audio_ingest import AudioDecodeError, load_audio
+import pytest
+
+
+def _which(*found):
+    return lambda name: "/bin/false" if name in found else None
+
+
+@pytest.mark.parametrize("found", [(), ("ffmpeg",)])
+def test_missing_decoder_raises_decode_error(monkeypatch, found):
+    # Bytes soundfile can't read, without ffmpeg, or with ffmpeg but without ffprobe to find
+    # their sampling rate
+    monkeypatch.setattr(audio_ingest.shutil, "which", _which(*found))
+    with pytest.raises(AudioDecodeError):
+        load_audio(b"not audio" * 100)
@@ -0,0 +1,27 @@
+from encoder import audio
+from encoder.params_data import sampling_rate, vad_window_length
+import numpy as np
+import pytest
+
+
+def _backend(name):
+    if name == "webrtc":
+        pytest.importorskip("webrtcvad")
+    return name
+
+
+@pytest.mark.parametrize("backend", ["numpy", "webrtc"])
+@pytest.mark.parametrize("n_samples", [0, 1, (vad_window_length * sampling_rate) // 1000 - 1])
+def test_shorter_than_a_window(backend, n_samples):
+    wav = np.random.default_rng(0).uniform(-0.1, 0.1, n_samples).astype(np.float32)
+    voice_flags = audio.compute_voice_flags(wav, _backend(backend))
+    assert voice_flags.dtype == bool and voice_flags.shape == (0,)
+    assert audio.trim_long_silences(wav, backend).shape == (0,)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "webrtc"])
+def test_one_flag_per_window(backend):
+    samples_per_window = (vad_window_length * sampling_rate) // 1000
+    wav = np.random.default_rng(0).uniform(-0.1, 0.1, 5 * samples_per_window + 3)
+    voice_flags = audio.compute_voice_flags(wav.astype(np.float32), _backend(backend))
+    assert voice_flags.dtype == bool and voice_flags.shape == (5,)
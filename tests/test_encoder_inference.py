@@ -0,0 +1,71 @@
+from encoder import inference as encoder
+from encoder.model import SpeakerEncoder
+from encoder.params_data import sampling_rate
+from encoder.params_model import model_embedding_size
+import numpy as np
+import pytest
+import torch
+
+
+@pytest.fixture
+def random_encoder():
+    model, device = encoder._model, encoder._device
+    torch.manual_seed(0)
+    cpu = torch.device("cpu")
+    encoder.set_model(SpeakerEncoder(cpu, cpu).eval(), cpu)
+    yield
+    encoder.set_model(model, device)
+
+
+def _speech_like(seconds=8, seed=0):
+    # Bursts of harmonics with a varying pitch, separated by silences of various lengths
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sampling_rate
+    wav = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 0.4 * t) > -0.3) * (np.sin(2 * np.pi * 0.13 * t) > -0.6)
+    wav = 0.2 * wav * envelope + 1e-4 * rng.standard_normal(len(t))
+    return wav.astype(np.float32)
+
+
+def _stream(wav, chunk_size, **kwargs):
+    embedder = encoder.StreamingSpeakerEmbedder(**kwargs)
+    for i in range(0, len(wav), chunk_size):
+        embedder.push(wav[i:i + chunk_size])
+    return embedder, embedder.finish()
+
+
+@pytest.mark.parametrize("chunk_size", [160, 1000, 4801, 10 ** 6])
+def test_streaming_embedding_without_trimming_is_exact(random_encoder, chunk_size):
+    wav = _speech_like()
+    embedder, embed = _stream(wav, chunk_size, normalize=False, trim_silence=False)
+    expected, partials, _ = encoder.embed_utterance(wav, return_partials=True)
+    assert embedder.n_partials == len(partials)
+    np.testing.assert_allclose(embed, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("vad", ["webrtc", "numpy"])
+@pytest.mark.parametrize("chunk_size", [160, 1000, 4801, 10 ** 6])
+def test_streaming_embedding_with_trimming_is_close(random_encoder, vad, chunk_size):
+    # The VAD only sees a limited history of the stream, so the trimmed audio may differ
+    if vad == "webrtc":
+        pytest.importorskip("webrtcvad")
+    wav = _speech_like()
+    _, embed = _stream(wav, chunk_size, normalize=False, trim_silence=True, vad=vad)
+    preprocessed = encoder.preprocess_wav(wav, normalize=False, trim_silence=True, vad=vad)
+    assert len(preprocessed) < len(wav)
+    assert np.dot(embed, encoder.embed_utterance(preprocessed)) > 0.99
+
+
+def test_until_converged_without_tolerance_uses_all_partials(monkeypatch):
+    # Identical partial embeddings, chosen so that the dot product of two consecutive normalized
+    # sums rounds above 1
+    partial_embed = np.random.default_rng(137).random(model_embedding_size).astype(np.float32)
+    monkeypatch.setattr(encoder, "embed_frames_batch",
+                        lambda frames_batch: np.tile(partial_embed, (len(frames_batch), 1)))
+    wav = _speech_like()
+    embed, partial_embeds, _ = encoder.embed_utterance(wav, return_partials=True)
+    converged_embed, n_partials = encoder.embed_utterance_until_converged(wav, tolerance=0)
+    assert n_partials == len(partial_embeds) > 8
+    np.testing.assert_allclose(converged_embed, embed, atol=1e-6)
@@ -0,0 +1,53 @@
+from encoder.speaker_index import SpeakerIndex
+import numpy as np
+
+
+def _embeds(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_add_repeated_ids_keeps_the_last_embedding():
+    index = SpeakerIndex(dim=8)
+    embeds = _embeds(3)
+    index.add(["a", "b", "a"], embeds)
+    assert len(index) == 2 and sorted(index.ids) == ["a", "b"]
+
+    ids, scores = index.search(embeds[2], k=3)
+    assert ids[0] == ["a", "b", None]
+    np.testing.assert_allclose(scores[0, 0], 1, rtol=1e-5)
+
+    index.remove(["a"])
+    assert len(index) == 1 and index.ids == ["b"]
+    ids, scores = index.search(embeds[1], k=2)
+    assert ids[0] == ["b", None]
+    np.testing.assert_allclose(scores[0, 0], 1, rtol=1e-5)
+
+
+def test_add_repeated_ids_matches_separate_adds():
+    embeds = _embeds(4)
+    batched, separate = SpeakerIndex(dim=8), SpeakerIndex(dim=8)
+    batched.add(["a", "b", "a", "c"], embeds)
+    for id, embed in zip(["a", "b", "a", "c"], embeds):
+        separate.add([id], embed[None])
+    queries = _embeds(5, seed=1)
+    batched_ids, batched_scores = batched.search(queries, k=3)
+    separate_ids, separate_scores = separate.search(queries, k=3)
+    assert batched_ids == separate_ids
+    np.testing.assert_allclose(batched_scores, separate_scores, rtol=1e-6)
+
+
+def test_save_untrained_over_trained_index(tmp_path):
+    index = SpeakerIndex(dim=8)
+    index.add([str(i) for i in range(16)], _embeds(16))
+    index.train(n_lists=4)
+    index.save(tmp_path)
+    assert SpeakerIndex.load(tmp_path).is_trained
+
+    untrained = SpeakerIndex(dim=8)
+    untrained.add(["x", "y"], _embeds(2, seed=1))
+    untrained.save(tmp_path)
+    loaded = SpeakerIndex.load(tmp_path)
+    assert not loaded.is_trained
+    assert loaded.ids == ["x", "y"]
+    ids, _ = loaded.search(_embeds(1, seed=2), k=2, n_probe=1)
+    assert sorted(ids[0]) == ["x", "y"]
@@ -0,0 +1,70 @@
+from synthesizer import inference as synthesizer_infer
+from synthesizer.hparams import hparams
+from synthesizer.inference import Synthesizer
+from synthesizer.utils.text import text_to_sequence_array
+import numpy as np
+import pytest
+import torch
+
+
+@pytest.fixture
+def checkpoint(random_tacotron, tmp_path):
+    fpath = tmp_path.joinpath("models", "synthesizer.pt")
+    fpath.parent.mkdir()
+    random_tacotron.save(fpath)
+    return fpath
+
+
+def test_scripted_decoder_is_cached_outside_of_the_models_dir(checkpoint, tmp_path, monkeypatch):
+    monkeypatch.setenv("RTVC_CACHE_DIR", str(tmp_path.joinpath("cache")))
+    synthesizer = Synthesizer(checkpoint, verbose=False, device="cpu")
+    synthesizer.load()
+    fpath = synthesizer._scripted_decoder_fpath()
+    assert fpath.parent == synthesizer_infer.script_cache_dir() == tmp_path.joinpath("cache", "synthesizer")
+    assert checkpoint.parent not in fpath.parents
+
+
+def test_unwritable_script_cache_falls_back(checkpoint, tmp_path, monkeypatch):
+    # A cache "directory" that is a file cannot be created, like one on a read-only filesystem
+    tmp_path.joinpath("cache").touch()
+    monkeypatch.setenv("RTVC_CACHE_DIR", str(tmp_path.joinpath("cache")))
+    monkeypatch.setattr(hparams, "tts_script_decoder", True)
+    synthesizer = Synthesizer(checkpoint, verbose=False, device="cpu")
+    synthesizer.load()
+    assert [f.name for f in checkpoint.parent.iterdir()] == [checkpoint.name]
+
+    embed = np.random.default_rng(0).standard_normal(hparams.speaker_embedding_size)
+    mels = synthesizer.synthesize_spectrograms(["Hello world."], [embed / np.linalg.norm(embed)])
+    assert mels[0].shape[0] == hparams.num_mels
+
+
+def test_default_frame_budget_stops_runaway_decoding(checkpoint):
+    synthesizer = Synthesizer(checkpoint, verbose=False, device="cpu")
+    synthesizer.load()
+    with torch.no_grad():
+        synthesizer._model.decoder.stop_proj.bias.fill_(-1e4)
+
+    text = "The stop token never fires."
+    chars = text_to_sequence_array(text, hparams.tts_cleaner_names)
+    embed = np.random.default_rng(0).standard_normal(hparams.speaker_embedding_size)
+    _, stats = synthesizer.synthesize_spectrograms(text, embed / np.linalg.norm(embed),
+                                                   return_stats=True)
+    budget = len(chars) * hparams.tts_max_frames_per_char
+    r = synthesizer._model.r
+    assert budget <= stats["batches"][0]["decoder_frames"] < budget + r
+    assert stats["aborted"] == [0] and stats["batches"][0]["aborted"] == 1
+
+
+def test_setting_r_keeps_the_scripted_decoder(checkpoint, tmp_path, monkeypatch):
+    monkeypatch.setenv("RTVC_CACHE_DIR", str(tmp_path.joinpath("cache")))
+    monkeypatch.setattr(hparams, "tts_script_decoder", True)
+    synthesizer = Synthesizer(checkpoint, verbose=False, device="cpu")
+    synthesizer.load()
+    model = synthesizer._model
+    assert isinstance(model.inference_decoder(), torch.jit.ScriptModule)
+
+    r = model.r
+    model.r = r + 1
+    decoder = model.inference_decoder()
+    assert isinstance(decoder, torch.jit.ScriptModule) and decoder.r == r + 1
+    assert len(list(synthesizer_infer.script_cache_dir().iterdir())) == 2
@@ -0,0 +1,113 @@
+from synthesizer.hparams import hparams
+from synthesizer.models.tacotron import InferenceCBHG
+import copy
+import pytest
+import torch
+
+
+def _inputs(num_chars=30, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    chars = torch.randint(1, 60, (1, num_chars), generator=generator)
+    embed = torch.nn.functional.normalize(
+        torch.randn(1, hparams.speaker_embedding_size, generator=generator), dim=1)
+    return chars, embed
+
+
+def _record_steps(decoder, monkeypatch):
+    # Records the attention peak and furthest position after each step of the decoder loop
+    peaks, furthest = [], []
+    step = decoder.step
+
+    def recording_step(*args):
+        mels, scores, stop_tokens, state = step(*args)
+        peaks.append(state[9].item())
+        furthest.append(state[10].item())
+        return mels, scores, stop_tokens, state
+    monkeypatch.setattr(decoder, "step", recording_step)
+    return peaks, furthest
+
+
+def test_furthest_peak_is_only_tracked_once_checks_are_active(random_tacotron, monkeypatch):
+    model = random_tacotron
+    with torch.no_grad():
+        model.decoder.stop_proj.bias.fill_(-1e4)
+    peaks, furthest = _record_steps(model.inference_decoder(), monkeypatch)
+    chars, embed = _inputs()
+    model.generate(chars, embed, steps=60)
+
+    r = model.r
+    assert len(peaks) == 60 // r
+    for i, reached in enumerate(furthest):
+        tracked = [peak for j, peak in enumerate(peaks[:i + 1]) if j * r > 10]
+        assert reached == max(tracked, default=0)
+
+
+def test_attention_failed(random_tacotron):
+    decoder = random_tacotron.inference_decoder()
+    encoder_seq = torch.zeros(1, 30, hparams.tts_encoder_dims)
+    state = decoder.init_state(encoder_seq, 3)
+    text_lengths = torch.tensor([30, 30, 30])
+    # A backtrack of 12 characters, an attention resting on a character for 8 steps, and one
+    # resting on the end of its text for as long
+    state[9] = torch.tensor([3, 10, 28])
+    state[10] = torch.tensor([15, 10, 28])
+    state[7][1, 10] = 8
+    state[7][2, 28] = 8
+
+    failed = decoder.attention_failed(state, text_lengths, 0., 0)
+    assert failed.tolist() == [False, False, False]
+    failed = decoder.attention_failed(state, text_lengths, 5., 10)
+    assert failed.tolist() == [True, True, False]
+    failed = decoder.attention_failed(state, text_lengths, 10., 12)
+    assert failed.tolist() == [False, False, False]
+
+
+def test_generate_between_stream_chunks(random_tacotron):
+    model = random_tacotron
+    with torch.no_grad():
+        model.decoder.stop_proj.bias.fill_(-1e4)
+    chars, embed = _inputs()
+    stream_kwargs = dict(steps=120, chunk_steps=10, left_context=10, right_context=10,
+                         crossfade=5)
+    torch.manual_seed(1)
+    clean_chunks = list(model.generate_stream(chars, embed, **stream_kwargs))
+
+    torch.manual_seed(1)
+    stream = model.generate_stream(chars, embed, **stream_kwargs)
+    chunks = [next(stream)]
+    rng_state = torch.get_rng_state()
+    model.generate(chars, embed, steps=40)
+    torch.set_rng_state(rng_state)
+    chunks.extend(stream)
+
+    assert len(chunks) == len(clean_chunks) > 2
+    for chunk, clean_chunk in zip(chunks, clean_chunks):
+        torch.testing.assert_close(chunk, clean_chunk)
+
+
+@pytest.mark.parametrize("merge_bank", [False, True])
+def test_fused_cbhgs_match_the_original(random_tacotron, merge_bank):
+    model = random_tacotron
+    generator = torch.Generator().manual_seed(0)
+    with torch.no_grad():
+        for module in model.modules():
+            if isinstance(module, torch.nn.BatchNorm1d):
+                shape = module.running_mean.shape
+                module.running_mean.copy_(torch.randn(shape, generator=generator))
+                module.running_var.copy_(0.5 + 1.5 * torch.rand(shape, generator=generator))
+                module.weight.copy_(1 + 0.5 * torch.randn(shape, generator=generator))
+                module.bias.copy_(0.5 * torch.randn(shape, generator=generator))
+    original = copy.deepcopy(model).eval()
+    model.fuse_cbhgs(merge_bank)
+    assert isinstance(model.encoder.cbhg, InferenceCBHG)
+    assert isinstance(model.postnet, InferenceCBHG)
+
+    chars, _ = _inputs()
+    mels = torch.randn(2, hparams.num_mels, 50, generator=generator)
+    outputs = []
+    for m in (original, model):
+        # The encoder prenet applies dropout
+        torch.manual_seed(0)
+        outputs.append((m.encoder(chars), m.post_proj(m.postnet(mels))))
+    for original_output, fused_output in zip(*outputs):
+        torch.testing.assert_close(fused_output, original_output, rtol=1e-4, atol=1e-4)
@@ -0,0 +1,35 @@
+from encoder.params_data import sampling_rate
+from encoder.training_data import precompute_speaker_shards, read_speakers
+import numpy as np
+import soundfile as sf
+
+
+def _write_corpus(corpus_dir, speakers, seconds=3):
+    # Harmonics with a varying pitch, enough for the VAD to keep them as speech
+    t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    for i, speaker in enumerate(speakers):
+        pitch = 100 + 20 * i + 30 * np.sin(2 * np.pi * 0.7 * t)
+        phase = 2 * np.pi * np.cumsum(pitch) / sampling_rate
+        wav = 0.2 * sum(np.sin(k * phase) / k for k in range(1, 6))
+        speaker_dir = corpus_dir.joinpath(speaker)
+        speaker_dir.mkdir(parents=True)
+        sf.write(str(speaker_dir.joinpath("utterance.wav")), wav.astype(np.float32), sampling_rate)
+
+
+def test_resume_after_truncated_line(tmp_path):
+    corpus_dir, shards_dir = tmp_path.joinpath("corpus"), tmp_path.joinpath("shards")
+    _write_corpus(corpus_dir, ["a", "b"])
+    precompute_speaker_shards(corpus_dir, shards_dir, n_workers=1)
+    index_fpath = shards_dir.joinpath("speakers.jsonl")
+    lines = index_fpath.read_bytes().splitlines(keepends=True)
+    assert [s["speaker"] for s in read_speakers(shards_dir)] == ["a", "b"]
+
+    # An interruption while speaker b was being appended
+    index_fpath.write_bytes(lines[0] + lines[1][:len(lines[1]) // 2])
+    assert [s["speaker"] for s in read_speakers(shards_dir)] == ["a"]
+    assert index_fpath.read_bytes() == lines[0]
+
+    _write_corpus(corpus_dir, ["c"])
+    precompute_speaker_shards(corpus_dir, shards_dir, n_workers=1)
+    assert [s["speaker"] for s in read_speakers(shards_dir)] == ["a", "b", "c"]
+    assert [s["speaker"] for s in read_speakers(shards_dir)] == ["a", "b", "c"]
@@ -0,0 +1,184 @@
+"""
+Audio decoding and resampling shared by the encoder and the synthesizer.
+
+Files are decoded with soundfile straight to float32, from a path, raw bytes or a file object
+(e.g. an upload, without writing it to a temporary file). Formats libsndfile can't read, such as
+M4A, are decoded by an ffmpeg subprocess, which the file is streamed to in blocks. Resampling is
+polyphase, with the low-pass filter of each rate conversion designed once and cached.
+"""
+from functools import lru_cache
+from io import BytesIO
+from math import gcd
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple, Union
+import shutil
+import subprocess
+import threading
+
+from scipy.signal import firwin, resample_poly
+import numpy as np
+import soundfile as sf
+
+
+AudioSource = Union[str, Path, bytes, bytearray, BinaryIO]
+
+audio_extensions = (".wav", ".flac", ".mp3", ".m4a", ".ogg")
+
+# Size of the blocks streamed to and from ffmpeg
+_pipe_block_size = 1 << 16
+
+
+class AudioDecodeError(RuntimeError):
+    """
+    Raised when an audio file can't be decoded, e.g. because it is corrupted, or because its
+    format requires ffmpeg and ffmpeg is not installed.
+    """
+
+
+def find_audio_files(root: Path) -> List[Path]:
+    """
+    Lists the audio files under a directory, recursively, in a deterministic order.
+    """
+    return sorted(p for p in Path(root).rglob("*") if p.suffix.lower() in audio_extensions)
+
+
+def load_audio(source: AudioSource, target_sr: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    Decodes an audio file to a mono float32 waveform.
+
+    :param source: a path to the file, its content as bytes, or a binary file object. File
+    objects are read from their start if they are seekable. Otherwise (e.g. a pipe or a socket)
+    they are streamed to ffmpeg if it is available and <target_sr> is given, and read into memory
+    first if not, since soundfile and ffprobe need to seek.
+    :param target_sr: if not None, the waveform is resampled to this sampling rate
+    :return: the waveform as a 1D numpy array of float32 and its sampling rate
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    elif isinstance(source, Path):
+        source = str(source)
+    elif not isinstance(source, str) and not _seekable(source):
+        if target_sr is not None and shutil.which("ffmpeg") is not None:
+            return _ffmpeg_decode(source, target_sr)
+        source = BytesIO(source.read())
+
+    try:
+        wav, sr = sf.read(source, dtype="float32", always_2d=False)
+    except sf.LibsndfileError as e:
+        if shutil.which("ffmpeg") is None:
+            message = "%s. ffmpeg may decode it, but was not found." % str(e).rstrip(".")
+            raise AudioDecodeError(message) from e
+        if not isinstance(source, str):
+            source.seek(0)
+        return _ffmpeg_decode(source, target_sr)
+
+    # Downmix to mono
+    if wav.ndim > 1:
+        wav = wav.mean(axis=1, dtype=np.float32)
+
+    if target_sr is not None and sr != target_sr:
+        wav = resample(wav, sr, target_sr)
+        sr = target_sr
+    return wav, sr
+
+
+def resample(wav: np.ndarray, source_sr: int, target_sr: int) -> np.ndarray:
+    """
+    Resamples a waveform with a polyphase filter. The output has the dtype of the input.
+    """
+    if source_sr == target_sr:
+        return wav
+    g = gcd(int(source_sr), int(target_sr))
+    up, down = int(target_sr) // g, int(source_sr) // g
+    dtype = wav.dtype if wav.dtype in (np.float32, np.float64) else np.float64
+    return resample_poly(wav, up, down, window=_lowpass_filter(up, down, np.dtype(dtype)))
+
+
+@lru_cache(maxsize=16)
+def _lowpass_filter(up: int, down: int, dtype: np.dtype) -> np.ndarray:
+    # The filter resample_poly() designs by default, which is most of its cost on short inputs.
+    # Its dtype matches the input's, otherwise the output would be upcast.
+    max_rate = max(up, down)
+    h = firwin(2 * 10 * max_rate + 1, 1. / max_rate, window=("kaiser", 5.0))
+    return h.astype(dtype)
+
+
+def _seekable(source: BinaryIO):
+    seekable = getattr(source, "seekable", None)
+    return seekable is not None and seekable()
+
+
+def _write_blocks(source: BinaryIO, pipe):
+    try:
+        for block in iter(lambda: source.read(_pipe_block_size), b""):
+            pipe.write(block)
+    except (BrokenPipeError, OSError):
+        # The process stopped reading its input, e.g. ffprobe once it found the stream info
+        pass
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def _run_piped(command: List[str], source: Optional[BinaryIO]):
+    """
+    Runs a command with <source>, if not None, streamed to its stdin in blocks while its stdout
+    is read in blocks, so that the input is never held in memory as a whole.
+
+    :return: the return code, the output as a bytearray and the error output as bytes
+    """
+    process = subprocess.Popen(
+        command, stdin=subprocess.DEVNULL if source is None else subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = []
+    threads = [threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)]
+    if source is not None:
+        threads.append(threading.Thread(target=_write_blocks, args=(source, process.stdin),
+                                        daemon=True))
+    for thread in threads:
+        thread.start()
+
+    stdout = bytearray()
+    for block in iter(lambda: process.stdout.read(_pipe_block_size), b""):
+        stdout += block
+    for thread in threads:
+        thread.join()
+    return process.wait(), stdout, b"".join(stderr)
+
+
+def _ffmpeg_decode(source: Union[str, BinaryIO], target_sr: Optional[int]):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise AudioDecodeError("This audio format can't be read by soundfile and requires "
+                               "ffmpeg, which was not found.")
+
+    # Without a target rate, decode at the rate of the file
+    sr = target_sr or _ffmpeg_sample_rate(source)
+    from_pipe = not isinstance(source, str)
+    command = [ffmpeg, "-nostdin", "-v", "error", "-i", "pipe:0" if from_pipe else source,
+               "-f", "f32le", "-ac", "1", "-ar", str(sr), "pipe:1"]
+    returncode, stdout, stderr = _run_piped(command, source if from_pipe else None)
+    if returncode != 0:
+        raise AudioDecodeError("ffmpeg failed to decode the audio: %s" %
+                               stderr.decode(errors="replace").strip())
+    # The waveform is a writable view on the bytearray, which it keeps alive
+    return np.frombuffer(stdout, dtype=np.float32), sr
+
+
+def _ffmpeg_sample_rate(source: Union[str, BinaryIO]):
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        raise AudioDecodeError("ffprobe is required to decode this format without a target "
+                               "rate, and was not found.")
+    from_pipe = not isinstance(source, str)
+    command = [ffprobe, "-v", "error", "-select_streams", "a:0", "-show_entries",
+               "stream=sample_rate", "-of", "csv=p=0", "pipe:0" if from_pipe else source]
+    returncode, stdout, stderr = _run_piped(command, source if from_pipe else None)
+    if from_pipe:
+        source.seek(0)
+    if returncode != 0:
+        raise AudioDecodeError("ffprobe failed to read the sampling rate: %s" %
+                               stderr.decode(errors="replace").strip())
+    return int(stdout.decode().strip())
@@ -0,0 +1,154 @@
+"""
+Process-wide registry of warm models.
+
+Deserializing the encoder, synthesizer and vocoder checkpoints takes far longer than a typical
+synthesis, so anything that synthesizes more than once (run_cli.synthesize, clone_my_voice.py,
+a long-running service) should get its models from here instead of loading them per request.
+Models are keyed by checkpoint path and device and stay in memory until evicted.
+
+Usage:
+    from utils.model_registry import registry
+    registry.warm(Path("models"))
+    synthesizer = registry.synthesizer(Path("models/default/synthesizer.pt"))
+"""
+from pathlib import Path
+from threading import RLock
+
+import torch
+
+from encoder import inference as encoder_infer
+from synthesizer.inference import Synthesizer
+from utils.default_models import ensure_default_models
+from vocoder import inference as vocoder_infer
+
+
+def default_model_paths(models_dir: Path):
+    """
+    Returns the paths of the default encoder, synthesizer and vocoder checkpoints in models_dir.
+    """
+    default_dir = models_dir / "default"
+    return default_dir / "encoder.pt", default_dir / "synthesizer.pt", default_dir / "vocoder.pt"
+
+
+def _resolve_device(device):
+    if device is None:
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return torch.device(device)
+
+
+class ModelRegistry:
+    def __init__(self):
+        # Guards loading and eviction. The encoder and vocoder inference modules hold a single
+        # active model each, so requests using different checkpoints of those should not run
+        # concurrently.
+        self._lock = RLock()
+        self._models = {}           # (kind, checkpoint path, device) -> loaded model
+        self._active = {}           # kind -> key of the model installed in its inference module
+        self._ensured_dirs = set()  # Models dirs already checked by ensure_default_models()
+
+    @staticmethod
+    def _key(kind, weights_fpath, device):
+        return kind, Path(weights_fpath).resolve(), _resolve_device(device)
+
+    def encoder(self, weights_fpath: Path, device=None):
+        """
+        Returns the speaker encoder for these weights, loading it on first use, and makes it the
+        model used by encoder.inference.
+        """
+        with self._lock:
+            key = self._key("encoder", weights_fpath, device)
+            model = self._models.get(key)
+            if model is None:
+                model = encoder_infer.load_model(Path(weights_fpath), key[2])
+                self._models[key] = model
+            encoder_infer.set_model(model, key[2])
+            self._active["encoder"] = key
+            return model
+
+    def synthesizer(self, weights_fpath: Path, device=None, verbose=True) -> Synthesizer:
+        """
+        Returns a loaded Synthesizer for these weights, loading it on first use.
+        """
+        with self._lock:
+            key = self._key("synthesizer", weights_fpath, device)
+            synthesizer = self._models.get(key)
+            if synthesizer is None:
+                synthesizer = Synthesizer(Path(weights_fpath), verbose=verbose, device=key[2])
+                synthesizer.load()
+                self._models[key] = synthesizer
+            return synthesizer
+
+    def vocoder(self, weights_fpath: Path, device=None, verbose=True):
+        """
+        Returns the vocoder for these weights, loading it on first use, and makes it the model used
+        by vocoder.inference.
+        """
+        with self._lock:
+            key = self._key("vocoder", weights_fpath, device)
+            model = self._models.get(key)
+            if model is None:
+                model = vocoder_infer.load_model(Path(weights_fpath), verbose, key[2])
+                self._models[key] = model
+            vocoder_infer.set_model(model, key[2])
+            self._active["vocoder"] = key
+            return model
+
+    def warm(self, models_dir: Path, device=None):
+        """
+        Downloads the default models into models_dir if needed and loads all three of them.
+
+        :return: the encoder, the synthesizer and the vocoder
+        :raises RuntimeError: if a checkpoint is still missing after the download attempt
+        """
+        with self._lock:
+            models_dir = Path(models_dir)
+            if models_dir.resolve() not in self._ensured_dirs:
+                ensure_default_models(models_dir)
+                self._ensured_dirs.add(models_dir.resolve())
+
+            enc_path, syn_path, voc_path = default_model_paths(models_dir)
+            for p in (enc_path, syn_path, voc_path):
+                if not p.exists():
+                    raise RuntimeError(
+                        f"Model file not found: {p}. If auto-download failed, "
+                        f"download manually."
+                    )
+
+            return (self.encoder(enc_path, device),
+                    self.synthesizer(syn_path, device),
+                    self.vocoder(voc_path, device))
+
+    def is_warm(self, kind: str, weights_fpath: Path, device=None):
+        return self._key(kind, weights_fpath, device) in self._models
+
+    def evict(self, kind: str = None, weights_fpath: Path = None, device=None):
+        """
+        Drops matching models from the registry. Arguments left to None match anything, so evict()
+        with no arguments empties the registry.
+
+        :return: the number of models evicted
+        """
+        with self._lock:
+            path = None if weights_fpath is None else Path(weights_fpath).resolve()
+            device = None if device is None else torch.device(device)
+            evicted = [key for key in self._models if
+                       (kind is None or key[0] == kind) and
+                       (path is None or key[1] == path) and
+                       (device is None or key[2] == device)]
+            for key in evicted:
+                del self._models[key]
+                # Don't leave the inference modules holding on to an evicted model
+                if self._active.get(key[0]) == key:
+                    del self._active[key[0]]
+                    if key[0] == "encoder":
+                        encoder_infer.set_model(None, None)
+                    else:
+                        vocoder_infer.set_model(None, None)
+
+            if evicted and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            return len(evicted)
+
+
+# The registry shared by the whole process
+registry = ModelRegistry()